@@ -0,0 +1,25 @@
+"""Add context_class to comment_analysis
+
+Revision ID: 7c1e2a9d4f10
+Revises: 4b6058396564
+Create Date: 2026-10-18 09:12:41.118204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '7c1e2a9d4f10'
+down_revision: Union[str, None] = '4b6058396564'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('comment_analysis', sa.Column('context_class', sa.String(length=64), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('comment_analysis', 'context_class')
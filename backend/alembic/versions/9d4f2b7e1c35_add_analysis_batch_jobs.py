@@ -0,0 +1,52 @@
+"""Add analysis_batch_jobs table
+
+Revision ID: 9d4f2b7e1c35
+Revises: c7e19a4d3b62
+Create Date: 2026-10-18 21:42:10.218734
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '9d4f2b7e1c35'
+down_revision: Union[str, None] = 'c7e19a4d3b62'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('analysis_batch_jobs',
+    sa.Column('id', sa.Uuid(), nullable=False),
+    sa.Column('user_id', sa.Uuid(), nullable=False),
+    sa.Column('connection_id', sa.Uuid(), nullable=False),
+    sa.Column('model', sa.String(length=100), nullable=False),
+    sa.Column('prompt_version', sa.String(length=50), nullable=False),
+    sa.Column('status', sa.String(length=50), nullable=False),
+    sa.Column('gemini_batch_name', sa.String(length=255), nullable=True),
+    sa.Column('gemini_state', sa.String(length=50), nullable=True),
+    sa.Column('manifest', sa.JSON(), nullable=True),
+    sa.Column('request_count', sa.Integer(), nullable=False),
+    sa.Column('comment_count', sa.Integer(), nullable=False),
+    sa.Column('comments_analyzed', sa.Integer(), nullable=False),
+    sa.Column('errors_count', sa.Integer(), nullable=False),
+    sa.Column('total_cost_usd', sa.Float(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('claimed_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('ingest_attempts', sa.Integer(), nullable=False),
+    sa.Column('completed_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.ForeignKeyConstraint(['connection_id'], ['social_connections.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_analysis_batch_jobs_status'), 'analysis_batch_jobs', ['status'], unique=False)
+    op.create_index(op.f('ix_analysis_batch_jobs_user_id'), 'analysis_batch_jobs', ['user_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_analysis_batch_jobs_user_id'), table_name='analysis_batch_jobs')
+    op.drop_index(op.f('ix_analysis_batch_jobs_status'), table_name='analysis_batch_jobs')
+    op.drop_table('analysis_batch_jobs')
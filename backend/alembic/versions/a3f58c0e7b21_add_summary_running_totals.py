@@ -0,0 +1,25 @@
+"""Add running_totals to post_analysis_summary
+
+Revision ID: a3f58c0e7b21
+Revises: 7c1e2a9d4f10
+Create Date: 2026-10-18 10:02:17.554310
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3f58c0e7b21'
+down_revision: Union[str, None] = '7c1e2a9d4f10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('post_analysis_summary', sa.Column('running_totals', sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('post_analysis_summary', 'running_totals')
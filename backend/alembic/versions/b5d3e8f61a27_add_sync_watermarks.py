@@ -0,0 +1,27 @@
+"""Add sync watermarks to posts and social_connections
+
+Revision ID: b5d3e8f61a27
+Revises: f2c6a81d9e57
+Create Date: 2026-10-18 16:42:11.208394
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'b5d3e8f61a27'
+down_revision: Union[str, None] = 'f2c6a81d9e57'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('posts', sa.Column('comment_watermark', sa.JSON(), nullable=True))
+    op.add_column('social_connections', sa.Column('sync_cursor', sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('social_connections', 'sync_cursor')
+    op.drop_column('posts', 'comment_watermark')
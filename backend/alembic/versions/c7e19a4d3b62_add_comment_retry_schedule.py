@@ -0,0 +1,31 @@
+"""Add analysis retry schedule to comments
+
+Revision ID: c7e19a4d3b62
+Revises: b5d3e8f61a27
+Create Date: 2026-10-18 19:05:37.514820
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'c7e19a4d3b62'
+down_revision: Union[str, None] = 'b5d3e8f61a27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('comments', sa.Column('analysis_attempts', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('comments', sa.Column('next_retry_at', sa.DateTime(timezone=True), nullable=True))
+    op.create_index(op.f('ix_comments_next_retry_at'), 'comments', ['next_retry_at'], unique=False)
+    # Comments already in "error" get one retry at the first sweep
+    op.execute("UPDATE comments SET next_retry_at = now() WHERE status = 'error'")
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_comments_next_retry_at'), table_name='comments')
+    op.drop_column('comments', 'next_retry_at')
+    op.drop_column('comments', 'analysis_attempts')
@@ -0,0 +1,45 @@
+"""Add latest_analysis_id pointer to comments
+
+Revision ID: d81b6e4c2f93
+Revises: a3f58c0e7b21
+Create Date: 2026-10-18 11:24:05.908131
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'd81b6e4c2f93'
+down_revision: Union[str, None] = 'a3f58c0e7b21'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('comments', sa.Column('latest_analysis_id', sa.Uuid(), nullable=True))
+    op.create_index(op.f('ix_comments_latest_analysis_id'), 'comments', ['latest_analysis_id'], unique=False)
+    op.create_foreign_key(
+        'comments_latest_analysis_id_fkey', 'comments', 'comment_analysis',
+        ['latest_analysis_id'], ['id'], ondelete='SET NULL',
+    )
+    # Backfill with the same "latest" rule the routers used to compute per request
+    op.execute(
+        """
+        UPDATE comments
+        SET latest_analysis_id = latest.id
+        FROM (
+            SELECT DISTINCT ON (comment_id) id, comment_id
+            FROM comment_analysis
+            ORDER BY comment_id, analyzed_at DESC NULLS LAST, id DESC
+        ) AS latest
+        WHERE latest.comment_id = comments.id
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_constraint('comments_latest_analysis_id_fkey', 'comments', type_='foreignkey')
+    op.drop_index(op.f('ix_comments_latest_analysis_id'), table_name='comments')
+    op.drop_column('comments', 'latest_analysis_id')
@@ -0,0 +1,109 @@
+"""Add connection_daily_stats rollup table
+
+Revision ID: e4a7c9b15d08
+Revises: d81b6e4c2f93
+Create Date: 2026-10-18 12:10:44.372915
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4a7c9b15d08'
+down_revision: Union[str, None] = 'd81b6e4c2f93'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('connection_daily_stats',
+    sa.Column('id', sa.Uuid(), nullable=False),
+    sa.Column('connection_id', sa.Uuid(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('total_comments', sa.Integer(), nullable=False),
+    sa.Column('analyzed_comments', sa.Integer(), nullable=False),
+    sa.Column('total_likes', sa.Integer(), nullable=False),
+    sa.Column('score_sum', sa.Float(), nullable=False),
+    sa.Column('score_count', sa.Integer(), nullable=False),
+    sa.Column('positive', sa.Integer(), nullable=False),
+    sa.Column('neutral', sa.Integer(), nullable=False),
+    sa.Column('negative', sa.Integer(), nullable=False),
+    sa.Column('emotions', sa.JSON(), nullable=True),
+    sa.Column('topics', sa.JSON(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=False),
+    sa.ForeignKeyConstraint(['connection_id'], ['social_connections.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('connection_id', 'day', name='uq_connection_daily_stats_day')
+    )
+    # Backfill from existing comments (UTC days, latest analysis per comment)
+    op.execute(
+        """
+        WITH base AS (
+            SELECT
+                c.connection_id,
+                (c.published_at AT TIME ZONE 'UTC')::date AS day,
+                c.like_count,
+                a.id AS analysis_id,
+                a.score_0_10 AS score,
+                a.emotions,
+                a.topics
+            FROM comments c
+            LEFT JOIN comment_analysis a ON a.id = c.latest_analysis_id
+            WHERE c.published_at IS NOT NULL
+        ),
+        labels AS (
+            SELECT connection_id, day, 'emotions' AS kind, value AS label
+            FROM base, json_array_elements_text(
+                CASE WHEN json_typeof(emotions) = 'array' THEN emotions END
+            )
+            UNION ALL
+            SELECT connection_id, day, 'topics', value
+            FROM base, json_array_elements_text(
+                CASE WHEN json_typeof(topics) = 'array' THEN topics END
+            )
+        ),
+        label_counts AS (
+            SELECT connection_id, day, kind, json_object_agg(label, n) AS counts
+            FROM (
+                SELECT connection_id, day, kind, label, count(*) AS n
+                FROM labels
+                GROUP BY connection_id, day, kind, label
+            ) grouped
+            GROUP BY connection_id, day, kind
+        ),
+        days AS (
+            SELECT
+                connection_id,
+                day,
+                count(*) AS total_comments,
+                count(analysis_id) AS analyzed_comments,
+                coalesce(sum(like_count), 0) AS total_likes,
+                coalesce(sum(score), 0) AS score_sum,
+                count(score) AS score_count,
+                count(*) FILTER (WHERE score > 6) AS positive,
+                count(*) FILTER (WHERE score BETWEEN 4 AND 6) AS neutral,
+                count(*) FILTER (WHERE score < 4) AS negative
+            FROM base
+            GROUP BY connection_id, day
+        )
+        INSERT INTO connection_daily_stats (
+            id, connection_id, day, total_comments, analyzed_comments, total_likes,
+            score_sum, score_count, positive, neutral, negative, emotions, topics, updated_at
+        )
+        SELECT
+            gen_random_uuid(), d.connection_id, d.day, d.total_comments, d.analyzed_comments,
+            d.total_likes, d.score_sum, d.score_count, d.positive, d.neutral, d.negative,
+            e.counts, t.counts, now()
+        FROM days d
+        LEFT JOIN label_counts e
+            ON e.connection_id = d.connection_id AND e.day = d.day AND e.kind = 'emotions'
+        LEFT JOIN label_counts t
+            ON t.connection_id = d.connection_id AND t.day = d.day AND t.kind = 'topics'
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('connection_daily_stats')
@@ -0,0 +1,27 @@
+"""Add comments_fetched_at to posts
+
+Revision ID: f2c6a81d9e57
+Revises: e4a7c9b15d08
+Create Date: 2026-10-18 14:03:29.640117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2c6a81d9e57'
+down_revision: Union[str, None] = 'e4a7c9b15d08'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('posts', sa.Column('comments_fetched_at', sa.DateTime(timezone=True), nullable=True))
+    # Every sync so far re-fetched comments along with the post
+    op.execute("UPDATE posts SET comments_fetched_at = fetched_at")
+
+
+def downgrade() -> None:
+    op.drop_column('posts', 'comments_fetched_at')
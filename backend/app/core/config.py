@@ -52,11 +52,40 @@ class Settings(BaseSettings):
     # Gemini LLM
     GEMINI_API_KEY: str = os.getenv("GEMINI_API_KEY", "")
     GEMINI_MODEL: str = os.getenv("GEMINI_MODEL", "gemini-2.0-flash")
+    # Per-model quota shared by all workers (see services/rate_limiter.py)
+    GEMINI_RPM: int = int(os.getenv("GEMINI_RPM", "1000"))
+    GEMINI_TPM: int = int(os.getenv("GEMINI_TPM", "1000000"))
+    # Context caching of the per-post prompt prefix (see services/context_cache.py);
+    # Gemini rejects caches below its minimum size (1024 tokens on Flash)
+    GEMINI_CONTEXT_CACHE: bool = os.getenv("GEMINI_CONTEXT_CACHE", "true").lower() == "true"
+    GEMINI_CACHE_TTL: int = int(os.getenv("GEMINI_CACHE_TTL", "900"))
+    GEMINI_CACHE_MIN_TOKENS: int = int(os.getenv("GEMINI_CACHE_MIN_TOKENS", "1024"))
 
     # Pipeline
     DEFAULT_MAX_COMMENTS: int = int(os.getenv("DEFAULT_MAX_COMMENTS", "500"))
-    DEFAULT_BATCH_SIZE: int = int(os.getenv("DEFAULT_BATCH_SIZE", "30"))
+    # Token budgets of one analysis request (see services/batching.py)
+    LLM_INPUT_TOKEN_BUDGET: int = int(os.getenv("LLM_INPUT_TOKEN_BUDGET", "6000"))
+    LLM_OUTPUT_TOKEN_BUDGET: int = int(os.getenv("LLM_OUTPUT_TOKEN_BUDGET", "4000"))
+    # Batches slower than this (seconds) shrink the budgets
+    LLM_BATCH_LATENCY_TARGET: float = float(os.getenv("LLM_BATCH_LATENCY_TARGET", "45"))
     PROMPT_VERSION: str = os.getenv("PROMPT_VERSION", "v1")
+    # Max LLM batches in flight per post (1 = sequential)
+    LLM_MAX_CONCURRENCY: int = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+    # Score emoji-only / one-word / tag-only / empty comments locally
+    # instead of sending them to Gemini (see services/preclassifier.py)
+    LOCAL_PRECLASSIFIER: bool = os.getenv("LOCAL_PRECLASSIFIER", "true").lower() == "true"
+    # Stream Gemini responses and store each result as soon as it is parsed
+    GEMINI_STREAMING: bool = os.getenv("GEMINI_STREAMING", "false").lower() == "true"
+    # LLM calls one comment may take part in per analysis run (re-requests
+    # of missing ids and batch bisection included)
+    LLM_MAX_COMMENT_ATTEMPTS: int = int(os.getenv("LLM_MAX_COMMENT_ATTEMPTS", "4"))
+    # Background retries of comments left in "error": delay doubles per sweep
+    ANALYSIS_RETRY_BASE_DELAY: int = int(os.getenv("ANALYSIS_RETRY_BASE_DELAY", "900"))
+    ANALYSIS_RETRY_MAX_SWEEPS: int = int(os.getenv("ANALYSIS_RETRY_MAX_SWEEPS", "5"))
+    ANALYSIS_SWEEP_INTERVAL: int = int(os.getenv("ANALYSIS_SWEEP_INTERVAL", "600"))
+    # Offline batch prediction for backfills (see services/batch_prediction_service.py)
+    GEMINI_BATCH_MAX_COMMENTS: int = int(os.getenv("GEMINI_BATCH_MAX_COMMENTS", "50000"))
+    GEMINI_BATCH_POLL_INTERVAL: int = int(os.getenv("GEMINI_BATCH_POLL_INTERVAL", "300"))
 
     # CORS
     CORS_ORIGINS: list[str] = [
@@ -0,0 +1,133 @@
+"""
+Process-wide pooled HTTP clients.
+
+Outbound calls go through a few long-lived httpx clients, one per upstream
+profile, instead of opening a connection (and TLS handshake) per request.
+Each profile has its own pool limits and timeouts, so a slow upstream
+cannot exhaust the connections of another. HTTP/2 is negotiated when the
+optional ``h2`` package is installed.
+
+Sync clients are shared by all threads of a process and re-created after a
+fork (Celery prefork). Async clients are bound to an event loop, so one is
+kept per profile and loop.
+"""
+
+import os
+import threading
+import weakref
+from asyncio import AbstractEventLoop, get_running_loop
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import AsyncIterator
+
+import httpx
+
+try:
+    import h2  # noqa: F401
+
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+BROWSER_USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+    "AppleWebKit/537.36 (KHTML, like Gecko) "
+    "Chrome/125.0.0.0 Safari/537.36"
+)
+
+
+@dataclass(frozen=True)
+class ClientProfile:
+    timeout: float = 30.0
+    connect_timeout: float = 10.0
+    max_connections: int = 20
+    max_keepalive: int = 10
+    follow_redirects: bool = False
+    headers: dict = field(default_factory=dict)
+
+
+PROFILES: dict[str, ClientProfile] = {
+    "default": ClientProfile(),
+    # Gemini: analysis batches run LLM_MAX_CONCURRENCY calls per post
+    "gemini": ClientProfile(timeout=120.0, max_connections=32, max_keepalive=16),
+    # XPoz MCP: long-polled jobs
+    "xpoz": ClientProfile(timeout=30.0, max_connections=16, max_keepalive=8),
+    "instagram_graph": ClientProfile(timeout=30.0),
+    "google": ClientProfile(timeout=10.0, max_connections=10, max_keepalive=5),
+    # CDN images (media cache, vision context)
+    "media": ClientProfile(
+        timeout=20.0,
+        max_connections=32,
+        max_keepalive=16,
+        follow_redirects=True,
+        headers={"User-Agent": BROWSER_USER_AGENT},
+    ),
+}
+
+_lock = threading.Lock()
+_clients: dict[str, httpx.Client] = {}
+_clients_pid = os.getpid()
+_async_clients: "weakref.WeakKeyDictionary[AbstractEventLoop, dict[str, httpx.AsyncClient]]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def _client_kwargs(profile: ClientProfile) -> dict:
+    return {
+        "timeout": httpx.Timeout(profile.timeout, connect=profile.connect_timeout),
+        "limits": httpx.Limits(
+            max_connections=profile.max_connections,
+            max_keepalive_connections=profile.max_keepalive,
+        ),
+        "follow_redirects": profile.follow_redirects,
+        "headers": profile.headers,
+        "http2": HTTP2_AVAILABLE,
+    }
+
+
+def get_http_client(name: str = "default") -> httpx.Client:
+    """Shared sync client for the ``name`` profile."""
+    global _clients_pid
+    client = _clients.get(name) if _clients_pid == os.getpid() else None
+    if client is not None:
+        return client
+    with _lock:
+        if _clients_pid != os.getpid():
+            # Forked: the parent's sockets must not be shared
+            _clients.clear()
+            _clients_pid = os.getpid()
+        if name not in _clients:
+            _clients[name] = httpx.Client(**_client_kwargs(PROFILES[name]))
+        return _clients[name]
+
+
+def get_async_http_client(name: str = "default") -> httpx.AsyncClient:
+    """Shared async client for the ``name`` profile on the running loop."""
+    loop = get_running_loop()
+    with _lock:
+        per_loop = _async_clients.setdefault(loop, {})
+        if name not in per_loop:
+            per_loop[name] = httpx.AsyncClient(**_client_kwargs(PROFILES[name]))
+        return per_loop[name]
+
+
+@asynccontextmanager
+async def shared_async_client(name: str = "default") -> AsyncIterator[httpx.AsyncClient]:
+    """``async with`` form of get_async_http_client (the client stays open)."""
+    yield get_async_http_client(name)
+
+
+def close_http_clients() -> None:
+    """Close the sync clients of this process (on shutdown)."""
+    with _lock:
+        for client in _clients.values():
+            client.close()
+        _clients.clear()
+
+
+async def aclose_http_clients() -> None:
+    """Close the async clients of the running loop."""
+    with _lock:
+        clients = _async_clients.pop(get_running_loop(), {})
+    for client in clients.values():
+        await client.aclose()
@@ -5,6 +5,7 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.core.config import settings
+from app.core.http import aclose_http_clients, close_http_clients
 from app.db.session import Base, engine
 import app.models  # noqa: F401 - ensure all models registered before create_all
 from app.routers import auth, connections, posts, dashboard, pipeline, comments, billing
@@ -26,6 +27,8 @@ async def lifespan(app: FastAPI):
                 "The API will start but database operations will fail."
             )
     yield
+    close_http_clients()
+    await aclose_http_clients()
 
 
 app = FastAPI(
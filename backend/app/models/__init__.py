@@ -4,6 +4,8 @@ from app.models.post import Post
 from app.models.comment import Comment
 from app.models.analysis import CommentAnalysis, PostAnalysisSummary
 from app.models.pipeline_run import PipelineRun
+from app.models.daily_stats import ConnectionDailyStats
+from app.models.analysis_batch_job import AnalysisBatchJob
 
 __all__ = [
     "User",
@@ -13,4 +15,6 @@ __all__ = [
     "CommentAnalysis",
     "PostAnalysisSummary",
     "PipelineRun",
+    "ConnectionDailyStats",
+    "AnalysisBatchJob",
 ]
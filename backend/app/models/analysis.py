@@ -31,6 +31,8 @@ class CommentAnalysis(Base):
     tokens_out: Mapped[int | None] = mapped_column(Integer, nullable=True)
     cost_estimate_usd: Mapped[float | None] = mapped_column(Float, nullable=True)
     raw_llm_response: Mapped[str | None] = mapped_column(Text, nullable=True)
+    # Persona hash the result was produced under (see analysis_service._context_class)
+    context_class: Mapped[str | None] = mapped_column(String(64), nullable=True)
     analyzed_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True), default=lambda: datetime.now(timezone.utc)
     )
@@ -40,7 +42,7 @@ class CommentAnalysis(Base):
     )
 
     # Relationships
-    comment = relationship("Comment", back_populates="analyses")
+    comment = relationship("Comment", back_populates="analyses", foreign_keys=[comment_id])
 
 
 class PostAnalysisSummary(Base):
@@ -63,6 +65,8 @@ class PostAnalysisSummary(Base):
     emotions_distribution: Mapped[dict | None] = mapped_column(JSON, nullable=True)
     topics_frequency: Mapped[dict | None] = mapped_column(JSON, nullable=True)
     sentiment_distribution: Mapped[dict | None] = mapped_column(JSON, nullable=True)
+    # Mergeable sums/counts/counters the fields above are derived from
+    running_totals: Mapped[dict | None] = mapped_column(JSON, nullable=True)
     generated_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True), default=lambda: datetime.now(timezone.utc)
     )
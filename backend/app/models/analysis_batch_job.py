@@ -0,0 +1,52 @@
+import uuid
+from datetime import datetime, timezone
+
+from sqlalchemy import String, Text, Integer, Float, DateTime, ForeignKey, Uuid, JSON
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.session import Base
+
+
+class AnalysisBatchJob(Base):
+    """One offline Gemini batch-prediction job (see batch_prediction_service).
+
+    ``manifest`` maps every request key of the job file to the post, the
+    context class and the comments the request carries, so the results can
+    be stored without keeping the job file around.
+    """
+
+    __tablename__ = "analysis_batch_jobs"
+
+    id: Mapped[uuid.UUID] = mapped_column(
+        Uuid, primary_key=True, default=uuid.uuid4
+    )
+    user_id: Mapped[uuid.UUID] = mapped_column(
+        Uuid, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True
+    )
+    connection_id: Mapped[uuid.UUID] = mapped_column(
+        Uuid, ForeignKey("social_connections.id", ondelete="CASCADE"), nullable=False
+    )
+    model: Mapped[str] = mapped_column(String(100), nullable=False)
+    prompt_version: Mapped[str] = mapped_column(String(50), nullable=False)
+    # submitted -> ingesting -> completed | failed
+    # (ingesting is a lease taken at claimed_at; an expired one is reclaimed)
+    status: Mapped[str] = mapped_column(String(50), default="submitted", index=True)
+    gemini_batch_name: Mapped[str | None] = mapped_column(String(255), nullable=True)
+    gemini_state: Mapped[str | None] = mapped_column(String(50), nullable=True)
+    manifest: Mapped[dict | None] = mapped_column(JSON, nullable=True)
+    request_count: Mapped[int] = mapped_column(Integer, default=0)
+    comment_count: Mapped[int] = mapped_column(Integer, default=0)
+    comments_analyzed: Mapped[int] = mapped_column(Integer, default=0)
+    errors_count: Mapped[int] = mapped_column(Integer, default=0)
+    total_cost_usd: Mapped[float] = mapped_column(Float, default=0.0)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), default=lambda: datetime.now(timezone.utc)
+    )
+    claimed_at: Mapped[datetime | None] = mapped_column(
+        DateTime(timezone=True), nullable=True
+    )
+    ingest_attempts: Mapped[int] = mapped_column(Integer, default=0)
+    completed_at: Mapped[datetime | None] = mapped_column(
+        DateTime(timezone=True), nullable=True
+    )
+    error: Mapped[str | None] = mapped_column(Text, nullable=True)
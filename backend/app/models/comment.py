@@ -40,6 +40,18 @@ class Comment(Base):
     raw_payload: Mapped[dict | None] = mapped_column(JSON, nullable=True)
     status: Mapped[str] = mapped_column(String(50), default="pending", index=True)
     last_error: Mapped[str | None] = mapped_column(Text, nullable=True)
+    # Failed analysis sweeps so far and when the sweeper retries next
+    # (NULL: not scheduled); see analysis_service.requeue_failed_comments
+    analysis_attempts: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
+    next_retry_at: Mapped[datetime | None] = mapped_column(
+        DateTime(timezone=True), nullable=True, index=True
+    )
+    # Most recently written analysis; maintained by analysis_service on write
+    latest_analysis_id: Mapped[uuid.UUID | None] = mapped_column(
+        Uuid,
+        ForeignKey("comment_analysis.id", ondelete="SET NULL", use_alter=True),
+        nullable=True, index=True,
+    )
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True), default=lambda: datetime.now(timezone.utc)
     )
@@ -52,4 +64,7 @@ class Comment(Base):
     post = relationship("Post", back_populates="comments")
     connection = relationship("SocialConnection", back_populates="comments")
     parent = relationship("Comment", remote_side="Comment.id", backref="replies")
-    analyses = relationship("CommentAnalysis", back_populates="comment", cascade="all, delete-orphan")
+    analyses = relationship(
+        "CommentAnalysis", back_populates="comment", cascade="all, delete-orphan",
+        foreign_keys="CommentAnalysis.comment_id",
+    )
@@ -0,0 +1,42 @@
+import uuid
+from datetime import date, datetime, timezone
+
+from sqlalchemy import Integer, Float, Date, DateTime, ForeignKey, UniqueConstraint, Uuid, JSON
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.session import Base
+
+
+class ConnectionDailyStats(Base):
+    """Per-connection, per-day rollup of comments and their latest analysis.
+
+    Days are UTC dates of ``Comment.published_at``. Maintained by
+    ``rollup_service`` and read by the dashboard trend endpoints.
+    """
+
+    __tablename__ = "connection_daily_stats"
+
+    id: Mapped[uuid.UUID] = mapped_column(
+        Uuid, primary_key=True, default=uuid.uuid4
+    )
+    connection_id: Mapped[uuid.UUID] = mapped_column(
+        Uuid, ForeignKey("social_connections.id", ondelete="CASCADE"), nullable=False
+    )
+    day: Mapped[date] = mapped_column(Date, nullable=False)
+    total_comments: Mapped[int] = mapped_column(Integer, default=0)
+    analyzed_comments: Mapped[int] = mapped_column(Integer, default=0)
+    total_likes: Mapped[int] = mapped_column(Integer, default=0)
+    score_sum: Mapped[float] = mapped_column(Float, default=0.0)
+    score_count: Mapped[int] = mapped_column(Integer, default=0)
+    positive: Mapped[int] = mapped_column(Integer, default=0)
+    neutral: Mapped[int] = mapped_column(Integer, default=0)
+    negative: Mapped[int] = mapped_column(Integer, default=0)
+    emotions: Mapped[dict | None] = mapped_column(JSON, nullable=True)
+    topics: Mapped[dict | None] = mapped_column(JSON, nullable=True)
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), default=lambda: datetime.now(timezone.utc)
+    )
+
+    __table_args__ = (
+        UniqueConstraint("connection_id", "day", name="uq_connection_daily_stats_day"),
+    )
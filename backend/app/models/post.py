@@ -36,6 +36,12 @@ class Post(Base):
     fetched_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True), default=lambda: datetime.now(timezone.utc)
     )
+    # Last time the post's comments were fetched (see comment_ingest_service.needs_comment_refresh)
+    comments_fetched_at: Mapped[datetime | None] = mapped_column(
+        DateTime(timezone=True), nullable=True
+    )
+    # Newest comment seen and last full fetch (see comment_ingest_service.comment_fetch_limit)
+    comment_watermark: Mapped[dict | None] = mapped_column(JSON, nullable=True)
 
     __table_args__ = (
         UniqueConstraint("connection_id", "platform_post_id", name="uq_connection_post"),
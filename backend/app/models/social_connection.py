@@ -40,6 +40,8 @@ class SocialConnection(Base):
     last_sync_at: Mapped[datetime | None] = mapped_column(
         DateTime(timezone=True), nullable=True
     )
+    # Listing cursor: newest post seen and last full listing (see comment_ingest_service.listing_since)
+    sync_cursor: Mapped[dict | None] = mapped_column(JSON, nullable=True)
     ignore_author_comments: Mapped[bool] = mapped_column(
         default=True, server_default="true", nullable=False
     )
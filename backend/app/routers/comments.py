@@ -1,7 +1,7 @@
 import uuid
 
 from fastapi import APIRouter, Depends, Query
-from sqlalchemy import desc, asc, and_, or_, select, func
+from sqlalchemy import desc, asc, and_, or_, func
 from sqlalchemy.orm import Session
 
 from app.core.deps import get_current_user
@@ -15,50 +15,6 @@ import sqlalchemy.types as types
 router = APIRouter(prefix="/comments", tags=["comments"])
 
 
-def _latest_analysis_subquery():
-    ranked = (
-        select(
-            CommentAnalysis.id.label("id"),
-            CommentAnalysis.comment_id.label("comment_id"),
-            CommentAnalysis.score_0_10.label("score_0_10"),
-            CommentAnalysis.polarity.label("polarity"),
-            CommentAnalysis.intensity.label("intensity"),
-            CommentAnalysis.emotions.label("emotions"),
-            CommentAnalysis.topics.label("topics"),
-            CommentAnalysis.sarcasm.label("sarcasm"),
-            CommentAnalysis.summary_pt.label("summary_pt"),
-            CommentAnalysis.confidence.label("confidence"),
-            CommentAnalysis.analyzed_at.label("analyzed_at"),
-            func.row_number()
-            .over(
-                partition_by=CommentAnalysis.comment_id,
-                order_by=(
-                    CommentAnalysis.analyzed_at.desc().nullslast(),
-                    CommentAnalysis.id.desc(),
-                ),
-            )
-            .label("rn"),
-        ).subquery()
-    )
-    return (
-        select(
-            ranked.c.id,
-            ranked.c.comment_id,
-            ranked.c.score_0_10,
-            ranked.c.polarity,
-            ranked.c.intensity,
-            ranked.c.emotions,
-            ranked.c.topics,
-            ranked.c.sarcasm,
-            ranked.c.summary_pt,
-            ranked.c.confidence,
-            ranked.c.analyzed_at,
-        )
-        .where(ranked.c.rn == 1)
-        .subquery()
-    )
-
-
 @router.get("")
 def list_comments(
     connection_id: uuid.UUID | None = Query(None),
@@ -84,24 +40,23 @@ def list_comments(
         return {"items": [], "total": 0, "limit": limit, "offset": offset}
 
     # Base query: comments with analysis LEFT JOIN
-    latest_analysis = _latest_analysis_subquery()
     query = (
         db.query(
             Comment,
-            latest_analysis.c.id.label("analysis_id"),
-            latest_analysis.c.score_0_10.label("analysis_score_0_10"),
-            latest_analysis.c.polarity.label("analysis_polarity"),
-            latest_analysis.c.intensity.label("analysis_intensity"),
-            latest_analysis.c.emotions.label("analysis_emotions"),
-            latest_analysis.c.topics.label("analysis_topics"),
-            latest_analysis.c.sarcasm.label("analysis_sarcasm"),
-            latest_analysis.c.summary_pt.label("analysis_summary_pt"),
-            latest_analysis.c.confidence.label("analysis_confidence"),
+            CommentAnalysis.id.label("analysis_id"),
+            CommentAnalysis.score_0_10.label("analysis_score_0_10"),
+            CommentAnalysis.polarity.label("analysis_polarity"),
+            CommentAnalysis.intensity.label("analysis_intensity"),
+            CommentAnalysis.emotions.label("analysis_emotions"),
+            CommentAnalysis.topics.label("analysis_topics"),
+            CommentAnalysis.sarcasm.label("analysis_sarcasm"),
+            CommentAnalysis.summary_pt.label("analysis_summary_pt"),
+            CommentAnalysis.confidence.label("analysis_confidence"),
         )
         .outerjoin(
-            latest_analysis,
+            CommentAnalysis,
             and_(
-                latest_analysis.c.comment_id == Comment.id,
+                CommentAnalysis.id == Comment.latest_analysis_id,
             ),
         )
         .join(SocialConnection, Comment.connection_id == SocialConnection.id)
@@ -120,29 +75,29 @@ def list_comments(
 
     # Sentiment filter
     if sentiment == "positive":
-        query = query.filter(latest_analysis.c.score_0_10 > 6)
+        query = query.filter(CommentAnalysis.score_0_10 > 6)
     elif sentiment == "neutral":
-        query = query.filter(latest_analysis.c.score_0_10.between(4, 6))
+        query = query.filter(CommentAnalysis.score_0_10.between(4, 6))
     elif sentiment == "negative":
-        query = query.filter(latest_analysis.c.score_0_10 < 4)
+        query = query.filter(CommentAnalysis.score_0_10 < 4)
 
     # Text search
     if search:
         search_lower = search.lower()
         sentiment_conds = []
         if "positiv" in search_lower:
-            sentiment_conds.append(latest_analysis.c.score_0_10 > 6)
+            sentiment_conds.append(CommentAnalysis.score_0_10 > 6)
         if "neutro" in search_lower or "neutra" in search_lower:
-            sentiment_conds.append(latest_analysis.c.score_0_10.between(4, 6))
+            sentiment_conds.append(CommentAnalysis.score_0_10.between(4, 6))
         if "negativ" in search_lower:
-            sentiment_conds.append(latest_analysis.c.score_0_10 < 4)
+            sentiment_conds.append(CommentAnalysis.score_0_10 < 4)
             
         from sqlalchemy.sql.expression import cast
         query = query.filter(
             or_(
                 Comment.text_original.ilike(f"%{search}%"),
-                cast(latest_analysis.c.emotions, types.String).ilike(f"%{search}%"),
-                cast(latest_analysis.c.topics, types.String).ilike(f"%{search}%"),
+                cast(CommentAnalysis.emotions, types.String).ilike(f"%{search}%"),
+                cast(CommentAnalysis.topics, types.String).ilike(f"%{search}%"),
                 *sentiment_conds
             )
         )
@@ -153,7 +108,7 @@ def list_comments(
     # Sorting
     order_fn = desc if order == "desc" else asc
     if sort == "score":
-        score_sort = func.coalesce(latest_analysis.c.score_0_10, -1)
+        score_sort = func.coalesce(CommentAnalysis.score_0_10, -1)
         query = query.order_by(order_fn(score_sort))
     elif sort == "likes":
         query = query.order_by(order_fn(Comment.like_count))
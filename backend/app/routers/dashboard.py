@@ -3,7 +3,7 @@ from collections import Counter
 from datetime import datetime, timezone, timedelta
 
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy import func, case, cast, Date, select
+from sqlalchemy import func, case
 from sqlalchemy.orm import Session
 
 from app.core.deps import get_current_user
@@ -11,6 +11,7 @@ from app.core.cache import cached, invalidate_pattern
 from app.db.session import get_db
 from app.models.comment import Comment
 from app.models.analysis import CommentAnalysis, PostAnalysisSummary
+from app.models.daily_stats import ConnectionDailyStats
 from app.models.post import Post
 from app.models.social_connection import SocialConnection
 from app.models.user import User
@@ -19,46 +20,6 @@ from app.services.report_service import generate_health_report
 router = APIRouter(prefix="/dashboard", tags=["dashboard"])
 
 
-def _latest_analysis_subquery():
-    ranked = (
-        select(
-            CommentAnalysis.id.label("id"),
-            CommentAnalysis.comment_id.label("comment_id"),
-            CommentAnalysis.score_0_10.label("score_0_10"),
-            CommentAnalysis.polarity.label("polarity"),
-            CommentAnalysis.intensity.label("intensity"),
-            CommentAnalysis.emotions.label("emotions"),
-            CommentAnalysis.topics.label("topics"),
-            CommentAnalysis.sarcasm.label("sarcasm"),
-            CommentAnalysis.analyzed_at.label("analyzed_at"),
-            func.row_number()
-            .over(
-                partition_by=CommentAnalysis.comment_id,
-                order_by=(
-                    CommentAnalysis.analyzed_at.desc().nullslast(),
-                    CommentAnalysis.id.desc(),
-                ),
-            )
-            .label("rn"),
-        ).subquery()
-    )
-    return (
-        select(
-            ranked.c.id,
-            ranked.c.comment_id,
-            ranked.c.score_0_10,
-            ranked.c.polarity,
-            ranked.c.intensity,
-            ranked.c.emotions,
-            ranked.c.topics,
-            ranked.c.sarcasm,
-            ranked.c.analyzed_at,
-        )
-        .where(ranked.c.rn == 1)
-        .subquery()
-    )
-
-
 @cached(prefix="dashboard_summary", ttl=300)
 def _build_dashboard_summary(user_id: str, db: Session) -> dict:
     """Build dashboard summary data (cached for 5 minutes)."""
@@ -83,19 +44,6 @@ def _build_dashboard_summary(user_id: str, db: Session) -> dict:
             "connections": [],
         }
 
-    total_posts = db.query(func.count(Post.id)).filter(
-        Post.connection_id.in_(conn_ids)
-    ).scalar() or 0
-
-    total_comments = db.query(func.count(Comment.id)).filter(
-        Comment.connection_id.in_(conn_ids)
-    ).scalar() or 0
-
-    total_analyzed = db.query(func.count(Comment.id)).filter(
-        Comment.connection_id.in_(conn_ids),
-        Comment.status == "processed",
-    ).scalar() or 0
-
     post_counts = {
         row[0]: row[1]
         for row in db.query(Post.connection_id, func.count(Post.id))
@@ -103,63 +51,47 @@ def _build_dashboard_summary(user_id: str, db: Session) -> dict:
         .group_by(Post.connection_id).all()
     }
 
-    analyzed_counts = {
-        row[0]: row[1]
-        for row in db.query(Comment.connection_id, func.count(Comment.id))
-        .filter(Comment.connection_id.in_(conn_ids), Comment.status == "processed")
-        .group_by(Comment.connection_id).all()
-    }
-
-    latest_analysis = _latest_analysis_subquery()
-    avg_stats = (
+    # Every comment/analysis aggregate in one grouped scan
+    comment_stats = (
         db.query(
-            func.avg(latest_analysis.c.score_0_10),
-            func.avg(latest_analysis.c.polarity),
+            Comment.connection_id,
+            func.count(Comment.id).label("total_comments"),
+            func.count(case((Comment.status == "processed", 1))).label("analyzed"),
+            func.sum(CommentAnalysis.score_0_10).label("score_sum"),
+            func.count(CommentAnalysis.score_0_10).label("score_count"),
+            func.sum(CommentAnalysis.polarity).label("polarity_sum"),
+            func.count(CommentAnalysis.polarity).label("polarity_count"),
+            func.count(case((CommentAnalysis.score_0_10 < 4, 1))).label("negative"),
+            func.count(case((CommentAnalysis.score_0_10.between(4, 6), 1))).label("neutral"),
+            func.count(case((CommentAnalysis.score_0_10 > 6, 1))).label("positive"),
         )
-        .join(Comment, Comment.id == latest_analysis.c.comment_id)
+        .outerjoin(CommentAnalysis, CommentAnalysis.id == Comment.latest_analysis_id)
         .filter(Comment.connection_id.in_(conn_ids))
-        .first()
+        .group_by(Comment.connection_id)
+        .all()
     )
 
-    avg_score = round(avg_stats[0], 2) if avg_stats[0] else None
-    avg_polarity = round(avg_stats[1], 2) if avg_stats[1] else None
+    def total(field):
+        return sum(getattr(row, field) or 0 for row in comment_stats)
+
+    total_posts = sum(post_counts.values())
+    total_comments = total("total_comments")
+    total_analyzed = total("analyzed")
+    analyzed_counts = {row.connection_id: row.analyzed for row in comment_stats}
+
+    score_count = total("score_count")
+    polarity_count = total("polarity_count")
+    avg_score = total("score_sum") / score_count if score_count else None
+    avg_polarity = total("polarity_sum") / polarity_count if polarity_count else None
+    avg_score = round(avg_score, 2) if avg_score else None
+    avg_polarity = round(avg_polarity, 2) if avg_polarity else None
 
     sentiment_distribution = None
     if total_analyzed > 0:
-        negative = (
-            db.query(func.count(latest_analysis.c.id))
-            .join(Comment, Comment.id == latest_analysis.c.comment_id)
-            .filter(
-                Comment.connection_id.in_(conn_ids),
-                latest_analysis.c.score_0_10 < 4,
-            )
-            .scalar()
-            or 0
-        )
-        neutral = (
-            db.query(func.count(latest_analysis.c.id))
-            .join(Comment, Comment.id == latest_analysis.c.comment_id)
-            .filter(
-                Comment.connection_id.in_(conn_ids),
-                latest_analysis.c.score_0_10.between(4, 6),
-            )
-            .scalar()
-            or 0
-        )
-        positive = (
-            db.query(func.count(latest_analysis.c.id))
-            .join(Comment, Comment.id == latest_analysis.c.comment_id)
-            .filter(
-                Comment.connection_id.in_(conn_ids),
-                latest_analysis.c.score_0_10 > 6,
-            )
-            .scalar()
-            or 0
-        )
         sentiment_distribution = {
-            "negative": negative,
-            "neutral": neutral,
-            "positive": positive,
+            "negative": total("negative"),
+            "neutral": total("neutral"),
+            "positive": total("positive"),
         }
 
     recent_posts = (
@@ -358,6 +290,29 @@ def get_connection_dashboard(
     }
 
 
+def _daily_rollups(db: Session, conn_ids: list, days: int) -> list[ConnectionDailyStats]:
+    """Daily rollup rows of the last ``days`` days, falling back to all-time when empty."""
+    cutoff = (datetime.now(timezone.utc) - timedelta(days=days)).date()
+    query = (
+        db.query(ConnectionDailyStats)
+        .filter(ConnectionDailyStats.connection_id.in_(conn_ids))
+        .order_by(ConnectionDailyStats.day)
+    )
+    rows = query.filter(ConnectionDailyStats.day >= cutoff).all()
+    if not rows:
+        rows = query.all()
+    return rows
+
+
+def _period_key(day, granularity: str) -> str:
+    if granularity == "day":
+        return day.isoformat()
+    if granularity == "week":
+        # ISO week start (Monday)
+        return (day - timedelta(days=day.weekday())).isoformat()
+    return f"{day.year}-{day.month:02d}-01"
+
+
 @cached(prefix="dashboard_trends", ttl=300)
 def _build_trends(user_id: str, connection_id_str: str | None, granularity: str, days: int, db: Session) -> dict:
     """Build trends data (cached for 5 minutes)."""
@@ -374,59 +329,12 @@ def _build_trends(user_id: str, connection_id_str: str | None, granularity: str,
     if not conn_ids:
         return {"data_points": [], "granularity": granularity}
 
-    cutoff = datetime.now(timezone.utc) - timedelta(days=days)
-    latest_analysis = _latest_analysis_subquery()
-
-    def trends_query(with_cutoff: bool):
-        query = db.query(
-            cast(Comment.published_at, Date).label("period"),
-            func.count(Comment.id).label("total_comments"),
-            func.count(latest_analysis.c.id).label("analyzed_comments"),
-            func.sum(Comment.like_count).label("total_likes"),
-            func.avg(latest_analysis.c.score_0_10).label("avg_score"),
-            func.sum(
-                case((latest_analysis.c.score_0_10 > 6, 1), else_=0)
-            ).label("positive"),
-            func.sum(
-                case(
-                    (latest_analysis.c.score_0_10.between(4, 6), 1), else_=0
-                )
-            ).label("neutral_count"),
-            func.sum(
-                case((latest_analysis.c.score_0_10 < 4, 1), else_=0)
-            ).label("negative"),
-        ).outerjoin(latest_analysis, latest_analysis.c.comment_id == Comment.id).filter(
-            Comment.connection_id.in_(conn_ids),
-            Comment.published_at.isnot(None),
-        )
-        if with_cutoff:
-            query = query.filter(Comment.published_at >= cutoff)
-        return (
-            query.group_by(cast(Comment.published_at, Date))
-            .order_by(cast(Comment.published_at, Date))
-            .all()
-        )
-
-    # Query comments grouped by date. If there is no data in recent window, fallback to all-time.
-    query = trends_query(with_cutoff=True)
-    if not query:
-        query = trends_query(with_cutoff=False)
+    rows = _daily_rollups(db, conn_ids, days)
 
     # Aggregate by granularity
     data_points_map = {}
-    for row in query:
-        if row.period is None:
-            continue
-
-        if granularity == "day":
-            key = row.period.isoformat()
-        elif granularity == "week":
-            # ISO week start (Monday)
-            d = row.period
-            week_start = d - timedelta(days=d.weekday())
-            key = week_start.isoformat()
-        else:  # month
-            key = f"{row.period.year}-{row.period.month:02d}-01"
+    for row in rows:
+        key = _period_key(row.day, granularity)
 
         if key not in data_points_map:
             data_points_map[key] = {
@@ -442,16 +350,13 @@ def _build_trends(user_id: str, connection_id_str: str | None, granularity: str,
             }
 
         dp = data_points_map[key]
-        dp["positive"] += int(row.positive or 0)
-        dp["neutral"] += int(row.neutral_count or 0)
-        dp["negative"] += int(row.negative or 0)
-        dp["total_comments"] += int(row.total_comments or 0)
-        dp["total_likes"] += int(row.total_likes or 0)
-        if row.avg_score is not None:
-            analyzed_count = int(row.analyzed_comments or 0)
-            if analyzed_count > 0:
-                dp["_score_sum"] += float(row.avg_score) * analyzed_count
-                dp["_score_count"] += analyzed_count
+        dp["positive"] += row.positive
+        dp["neutral"] += row.neutral
+        dp["negative"] += row.negative
+        dp["total_comments"] += row.total_comments
+        dp["total_likes"] += row.total_likes
+        dp["_score_sum"] += row.score_sum
+        dp["_score_count"] += row.score_count
 
     # Finalize avg scores
     data_points = []
@@ -503,39 +408,12 @@ def get_trends_detailed(
     if not conn_ids:
         return {"data_points": [], "granularity": granularity}
 
-    cutoff = datetime.now(timezone.utc) - timedelta(days=days)
-    latest_analysis = _latest_analysis_subquery()
-
-    def detailed_rows(with_cutoff: bool):
-        query = db.query(
-            Comment.published_at.label("published_at"),
-            latest_analysis.c.score_0_10.label("score"),
-            latest_analysis.c.emotions.label("emotions"),
-            latest_analysis.c.topics.label("topics"),
-        ).outerjoin(latest_analysis, latest_analysis.c.comment_id == Comment.id).filter(
-            Comment.connection_id.in_(conn_ids),
-            Comment.published_at.isnot(None),
-        )
-        if with_cutoff:
-            query = query.filter(Comment.published_at >= cutoff)
-        return query.all()
-
-    rows = detailed_rows(with_cutoff=True)
-    if not rows:
-        rows = detailed_rows(with_cutoff=False)
+    rows = _daily_rollups(db, conn_ids, days)
 
     data_points_map: dict = {}
 
     for row in rows:
-        period_date = row.published_at.date()
-
-        if granularity == "day":
-            key = period_date.isoformat()
-        elif granularity == "week":
-            week_start = period_date - timedelta(days=period_date.weekday())
-            key = week_start.isoformat()
-        else:  # month
-            key = f"{period_date.year}-{period_date.month:02d}-01"
+        key = _period_key(row.day, granularity)
 
         if key not in data_points_map:
             data_points_map[key] = {
@@ -549,24 +427,12 @@ def get_trends_detailed(
             }
 
         dp = data_points_map[key]
-        dp["total_comments"] += 1
-
-        score = row.score
-        if score is not None:
-            if score > 6:
-                dp["positive"] += 1
-            elif score >= 4:
-                dp["neutral"] += 1
-            else:
-                dp["negative"] += 1
-
-        if row.emotions and isinstance(row.emotions, list):
-            for e in row.emotions:
-                dp["emotions"][str(e)] += 1
-
-        if row.topics and isinstance(row.topics, list):
-            for t in row.topics:
-                dp["topics"][str(t)] += 1
+        dp["total_comments"] += row.total_comments
+        dp["positive"] += row.positive
+        dp["neutral"] += row.neutral
+        dp["negative"] += row.negative
+        dp["emotions"].update(row.emotions or {})
+        dp["topics"].update(row.topics or {})
 
     data_points = []
     for dp in sorted(data_points_map.values(), key=lambda x: x["period"]):
@@ -674,20 +540,19 @@ def get_platform_compare(
     db: Session = Depends(get_db),
 ):
     cutoff = datetime.now(timezone.utc) - timedelta(days=days)
-    latest_analysis = _latest_analysis_subquery()
 
     rows = (
         db.query(
             SocialConnection.platform.label("platform"),
             func.count(Comment.id).label("total_comments"),
-            func.count(latest_analysis.c.id).label("total_analyzed"),
-            func.avg(latest_analysis.c.score_0_10).label("avg_score"),
-            func.sum(case((latest_analysis.c.score_0_10 > 6, 1), else_=0)).label("positive"),
-            func.sum(case((latest_analysis.c.score_0_10.between(4, 6), 1), else_=0)).label("neutral"),
-            func.sum(case((latest_analysis.c.score_0_10 < 4, 1), else_=0)).label("negative"),
+            func.count(CommentAnalysis.id).label("total_analyzed"),
+            func.avg(CommentAnalysis.score_0_10).label("avg_score"),
+            func.sum(case((CommentAnalysis.score_0_10 > 6, 1), else_=0)).label("positive"),
+            func.sum(case((CommentAnalysis.score_0_10.between(4, 6), 1), else_=0)).label("neutral"),
+            func.sum(case((CommentAnalysis.score_0_10 < 4, 1), else_=0)).label("negative"),
         )
         .join(Comment, Comment.connection_id == SocialConnection.id)
-        .outerjoin(latest_analysis, latest_analysis.c.comment_id == Comment.id)
+        .outerjoin(CommentAnalysis, CommentAnalysis.id == Comment.latest_analysis_id)
         .filter(
             SocialConnection.user_id == current_user.id,
             Comment.published_at.isnot(None),
@@ -738,20 +603,19 @@ def get_reputation_alerts(
     db: Session = Depends(get_db),
 ):
     cutoff = datetime.now(timezone.utc) - timedelta(days=days)
-    latest_analysis = _latest_analysis_subquery()
 
     rows = (
         db.query(
             SocialConnection.id.label("connection_id"),
             SocialConnection.platform.label("platform"),
             SocialConnection.username.label("username"),
-            func.count(latest_analysis.c.id).label("total_analyzed"),
-            func.avg(latest_analysis.c.score_0_10).label("avg_score"),
-            func.sum(case((latest_analysis.c.score_0_10 < 4, 1), else_=0)).label("negative"),
-            func.sum(case((latest_analysis.c.sarcasm.is_(True), 1), else_=0)).label("sarcasm"),
+            func.count(CommentAnalysis.id).label("total_analyzed"),
+            func.avg(CommentAnalysis.score_0_10).label("avg_score"),
+            func.sum(case((CommentAnalysis.score_0_10 < 4, 1), else_=0)).label("negative"),
+            func.sum(case((CommentAnalysis.sarcasm.is_(True), 1), else_=0)).label("sarcasm"),
         )
         .join(Comment, Comment.connection_id == SocialConnection.id)
-        .join(latest_analysis, latest_analysis.c.comment_id == Comment.id)
+        .join(CommentAnalysis, CommentAnalysis.id == Comment.latest_analysis_id)
         .filter(
             SocialConnection.user_id == current_user.id,
             Comment.published_at.isnot(None),
@@ -1,20 +1,38 @@
 import asyncio
 import json
+import logging
 import uuid
 
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from redis.exceptions import ConnectionError as RedisConnectionError
 from sqlalchemy.orm import Session
 from sse_starlette.sse import EventSourceResponse
 
 from app.core.deps import get_current_user, get_current_user_token_or_query
 from app.db.session import get_db
+from app.models.analysis_batch_job import AnalysisBatchJob
 from app.models.pipeline_run import PipelineRun
 from app.models.social_connection import SocialConnection
 from app.models.user import User
-from app.schemas.pipeline import PipelineRunResponse, PipelineStatusResponse
+from app.schemas.pipeline import (
+    BatchJobRequest,
+    BatchJobResponse,
+    PipelineRunResponse,
+    PipelineStatusResponse,
+)
+from app.services import progress_service
+from app.services.rate_limiter import get_gemini_limiter
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/pipeline", tags=["pipeline"])
 
+# Max wait for a published event before re-reading the run from the DB
+STREAM_RESYNC_SECONDS = 30
+# DB polling interval when Redis is unavailable
+STREAM_POLL_SECONDS = 2
+
 
 @router.get("/runs", response_model=list[PipelineRunResponse])
 def list_pipeline_runs(
@@ -97,6 +115,53 @@ def get_pipeline_run(
     )
 
 
+@router.get("/llm-rate-limit")
+def get_llm_rate_limit(current_user: User = Depends(get_current_user)):
+    """Gemini rate limiter counters of this API process.
+
+    The cluster-wide counters cover every tenant and are not exposed here.
+    """
+    metrics = get_gemini_limiter().metrics(include_cluster=False)
+    metrics.pop("cluster")
+    return metrics
+
+
+@router.post("/batch-jobs", status_code=202)
+def create_batch_job(
+    body: BatchJobRequest,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """Backfill a connection through an offline Gemini batch job."""
+    conn = db.query(SocialConnection).filter(
+        SocialConnection.id == body.connection_id,
+        SocialConnection.user_id == current_user.id,
+    ).first()
+    if not conn:
+        raise HTTPException(status_code=404, detail="Connection not found")
+
+    from app.tasks.pipeline_tasks import task_submit_batch_job
+
+    result = task_submit_batch_job.delay(
+        str(conn.id), str(current_user.id), prompt_version=body.prompt_version
+    )
+    return {"task_id": result.id}
+
+
+@router.get("/batch-jobs", response_model=list[BatchJobResponse])
+def list_batch_jobs(
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    return (
+        db.query(AnalysisBatchJob)
+        .filter(AnalysisBatchJob.user_id == current_user.id)
+        .order_by(AnalysisBatchJob.created_at.desc())
+        .limit(50)
+        .all()
+    )
+
+
 @router.get("/runs/{run_id}/status", response_model=PipelineStatusResponse)
 def get_pipeline_status(
     run_id: uuid.UUID,
@@ -126,46 +191,80 @@ async def stream_run_progress(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user_token_or_query),
 ):
-    """SSE endpoint to stream pipeline run progress."""
+    """SSE endpoint to stream pipeline run progress.
 
-    async def event_generator():
-        while True:
-            run = (
-                db.query(PipelineRun)
-                .filter(
-                    PipelineRun.id == run_id,
-                    PipelineRun.user_id == current_user.id,
-                )
-                .first()
+    Events are pushed from the run's Redis channel as workers publish them;
+    the database is only read for the initial snapshot, when no event
+    arrives for STREAM_RESYNC_SECONDS, or every STREAM_POLL_SECONDS when
+    Redis is unavailable or drops mid-stream.
+    """
+
+    def load_progress() -> dict | None:
+        run = (
+            db.query(PipelineRun)
+            .filter(
+                PipelineRun.id == run_id,
+                PipelineRun.user_id == current_user.id,
             )
-            if not run:
-                yield {"event": "error", "data": json.dumps({"message": "Run not found"})}
-                break
-
-            progress_data = {
-                "status": run.status,
-                "posts_fetched": run.posts_fetched or 0,
-                "comments_fetched": run.comments_fetched or 0,
-                "comments_analyzed": run.comments_analyzed or 0,
-                "errors_count": run.errors_count or 0,
-            }
-
-            # Parse notes for detailed progress
-            if run.notes:
-                try:
-                    notes = json.loads(run.notes)
-                    progress_data.update(notes)
-                except (json.JSONDecodeError, TypeError):
-                    progress_data["notes"] = run.notes
+            .first()
+        )
+        if not run:
+            return None
+        progress = progress_service.run_progress(run)
+        # Expire the cached object so next query gets fresh data
+        db.expire(run)
+        return progress
+
+    async def next_progress(pubsub) -> dict | None:
+        if pubsub is None:
+            await asyncio.sleep(STREAM_POLL_SECONDS)
+        else:
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + STREAM_RESYNC_SECONDS
+            # get_message returns None early for skipped subscribe confirmations
+            while (remaining := deadline - loop.time()) > 0:
+                message = await pubsub.get_message(
+                    ignore_subscribe_messages=True, timeout=remaining
+                )
+                if message is not None:
+                    return json.loads(message["data"])
+        return await run_in_threadpool(load_progress)
 
-            yield {"event": "progress", "data": json.dumps(progress_data)}
+    async def event_generator():
+        redis = pubsub = subscription = None
+        try:
+            # Subscribe before the first read so no event is missed in between
+            redis = progress_service.get_async_redis()
+            pubsub = redis.pubsub()
+            await pubsub.subscribe(progress_service.run_channel(run_id))
+            subscription = pubsub
+        except Exception:
+            logger.warning("Redis unavailable, polling run %s", run_id)
+            pubsub = None
+
+        try:
+            progress_data = await run_in_threadpool(load_progress)
+            while True:
+                if progress_data is None:
+                    yield {"event": "error", "data": json.dumps({"message": "Run not found"})}
+                    break
 
-            if run.status in ("completed", "failed", "partial"):
-                yield {"event": "complete", "data": json.dumps(progress_data)}
-                break
+                yield {"event": "progress", "data": json.dumps(progress_data)}
 
-            # Expire the cached object so next query gets fresh data
-            db.expire(run)
-            await asyncio.sleep(2)
+                if progress_data.get("status") in progress_service.TERMINAL_STATUSES:
+                    yield {"event": "complete", "data": json.dumps(progress_data)}
+                    break
+
+                try:
+                    progress_data = await next_progress(subscription)
+                except RedisConnectionError:
+                    logger.warning("Redis connection lost, polling run %s", run_id)
+                    subscription = None
+                    progress_data = await next_progress(None)
+        finally:
+            if pubsub is not None:
+                await pubsub.aclose()
+            if redis is not None:
+                await redis.aclose()
 
     return EventSourceResponse(event_generator())
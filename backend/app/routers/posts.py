@@ -2,7 +2,6 @@ import uuid
 
 from fastapi import APIRouter, Depends, HTTPException, Query
 from fastapi.responses import FileResponse
-from sqlalchemy import func, select
 from sqlalchemy.orm import Session
 
 from app.core.deps import get_current_user
@@ -23,50 +22,6 @@ from app.schemas.post import (
 router = APIRouter(prefix="/posts", tags=["posts"])
 
 
-def _latest_analysis_subquery():
-    ranked = (
-        select(
-            CommentAnalysis.id.label("id"),
-            CommentAnalysis.comment_id.label("comment_id"),
-            CommentAnalysis.score_0_10.label("score_0_10"),
-            CommentAnalysis.polarity.label("polarity"),
-            CommentAnalysis.intensity.label("intensity"),
-            CommentAnalysis.emotions.label("emotions"),
-            CommentAnalysis.topics.label("topics"),
-            CommentAnalysis.sarcasm.label("sarcasm"),
-            CommentAnalysis.summary_pt.label("summary_pt"),
-            CommentAnalysis.confidence.label("confidence"),
-            CommentAnalysis.analyzed_at.label("analyzed_at"),
-            func.row_number()
-            .over(
-                partition_by=CommentAnalysis.comment_id,
-                order_by=(
-                    CommentAnalysis.analyzed_at.desc().nullslast(),
-                    CommentAnalysis.id.desc(),
-                ),
-            )
-            .label("rn"),
-        ).subquery()
-    )
-    return (
-        select(
-            ranked.c.id,
-            ranked.c.comment_id,
-            ranked.c.score_0_10,
-            ranked.c.polarity,
-            ranked.c.intensity,
-            ranked.c.emotions,
-            ranked.c.topics,
-            ranked.c.sarcasm,
-            ranked.c.summary_pt,
-            ranked.c.confidence,
-            ranked.c.analyzed_at,
-        )
-        .where(ranked.c.rn == 1)
-        .subquery()
-    )
-
-
 @router.get("/thumbnail")
 def get_thumbnail_proxy(url: str = Query(..., min_length=5)):
     cached = cache_remote_image(url)
@@ -137,13 +92,12 @@ def get_post_detail(
         .all()
     )
 
-    comment_ids = [c.id for c in comments]
     analyses = []
-    if comment_ids:
-        latest_analysis = _latest_analysis_subquery()
+    if comments:
         rows = (
-            db.query(latest_analysis)
-            .filter(latest_analysis.c.comment_id.in_(comment_ids))
+            db.query(CommentAnalysis)
+            .join(Comment, Comment.latest_analysis_id == CommentAnalysis.id)
+            .filter(Comment.post_id == post_id)
             .all()
         )
         analyses = [
@@ -30,3 +30,27 @@ class PipelineStatusResponse(BaseModel):
     comments_fetched: int
     comments_analyzed: int
     errors_count: int
+
+
+class BatchJobRequest(BaseModel):
+    connection_id: uuid.UUID
+    prompt_version: str | None = None
+
+
+class BatchJobResponse(BaseModel):
+    id: uuid.UUID
+    connection_id: uuid.UUID
+    model: str
+    prompt_version: str
+    status: str
+    gemini_state: str | None
+    request_count: int
+    comment_count: int
+    comments_analyzed: int
+    errors_count: int
+    total_cost_usd: float
+    created_at: datetime
+    completed_at: datetime | None
+    error: str | None
+
+    model_config = {"from_attributes": True}
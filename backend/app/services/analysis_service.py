@@ -5,19 +5,28 @@ Adapts the existing LLMClient from src/analysis/llm_client.py
 to work with PostgreSQL models.
 """
 
+import hashlib
 import math
 import sys
+import time
 import uuid
 import logging
 import json
 from pathlib import Path
 from collections import Counter
-from datetime import datetime, timezone
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timedelta, timezone
+from queue import Empty, SimpleQueue
+from typing import Callable
 
-from sqlalchemy import func
+from sqlalchemy import Float, and_, case, func, insert, or_, select, true, update
 from sqlalchemy.orm import Session
 
-from app.services.llm_client import LLMClient
+from app.services.batching import estimate_text_tokens, get_batch_tuner, next_batch
+from app.services.comment_ingest_service import comment_text_hash
+from app.services.llm_client import OUTPUT_TOKENS_PER_COMMENT, LLMClient
+from app.services.preclassifier import LOCAL_MODEL, preclassify
 
 from app.core.config import settings
 from app.models.analysis import CommentAnalysis, PostAnalysisSummary
@@ -27,6 +36,20 @@ from app.models.social_connection import SocialConnection
 
 logger = logging.getLogger(__name__)
 
+# Max ids/hashes per IN (...) clause
+IN_CLAUSE_CHUNK = 500
+# Rows fetched per round trip when streaming analyses
+STREAM_CHUNK_SIZE = 1000
+# With streamed LLM responses, results parsed so far are stored this often (s)
+STREAM_FLUSH_INTERVAL = 1.0
+# Posts expected to need at least this many batches cache their prompt prefix
+CONTEXT_CACHE_MIN_BATCHES = 3
+
+
+def _analysis_models() -> tuple[str, str]:
+    """Models whose analyses make up a comment's sentiment (LLM and local)."""
+    return (settings.GEMINI_MODEL, LOCAL_MODEL)
+
 
 def _analysis_exists_expression(
     db: Session,
@@ -36,20 +59,434 @@ def _analysis_exists_expression(
         db.query(CommentAnalysis.id)
         .filter(
             CommentAnalysis.comment_id == Comment.id,
-            CommentAnalysis.model == settings.GEMINI_MODEL,
+            CommentAnalysis.model.in_(_analysis_models()),
             CommentAnalysis.prompt_version == prompt_version,
+            CommentAnalysis.confidence > 0,
         )
         .exists()
     )
 
 
+def _not_author_filter(connection: SocialConnection):
+    """Exclude the account owner's own comments (NULL authors are kept)."""
+    return or_(
+        Comment.author_username.is_(None),
+        func.lower(Comment.author_username) != func.lower(connection.username),
+    )
+
+
+def unanalyzed_filters(
+    db: Session,
+    prompt_version: str,
+    connection: SocialConnection | None,
+) -> list:
+    """Filters for comments still lacking a successful analysis.
+
+    The account owner's own comments are left out when the connection
+    ignores them.
+    """
+    filters = [~_analysis_exists_expression(db, prompt_version)]
+    if connection is not None and connection.ignore_author_comments:
+        filters.append(_not_author_filter(connection))
+    return filters
+
+
+def _text_hash(text: str) -> str:
+    return hashlib.sha256((text or "").encode("utf-8")).hexdigest()
+
+
+def _context_class(persona_text: str | None) -> str:
+    """Key of the context an analysis was produced under.
+
+    Only the account persona is part of the key: post captions vary per post
+    and would defeat reuse of results for identical short texts.
+    """
+    if not persona_text:
+        return "default"
+    return _text_hash(persona_text.strip())[:32]
+
+
+def _find_cached_results(
+    db: Session,
+    text_hashes: list[str],
+    prompt_version: str,
+    context_class: str,
+) -> dict[str, dict]:
+    """Return successful earlier analyses keyed by comment text hash."""
+    found: dict[str, dict] = {}
+    for i in range(0, len(text_hashes), IN_CLAUSE_CHUNK):
+        chunk = text_hashes[i : i + IN_CLAUSE_CHUNK]
+        rows = (
+            db.query(Comment.text_hash, CommentAnalysis)
+            .join(CommentAnalysis, CommentAnalysis.comment_id == Comment.id)
+            .filter(
+                Comment.text_hash.in_(chunk),
+                CommentAnalysis.model == settings.GEMINI_MODEL,
+                CommentAnalysis.prompt_version == prompt_version,
+                CommentAnalysis.context_class == context_class,
+                CommentAnalysis.confidence > 0,
+            )
+            .all()
+        )
+        for text_hash, analysis in rows:
+            if text_hash in found:
+                continue
+            found[text_hash] = {
+                "score_0_10": analysis.score_0_10,
+                "polarity": analysis.polarity,
+                "intensity": analysis.intensity,
+                "emotions": analysis.emotions,
+                "topics": analysis.topics,
+                "sarcasm": analysis.sarcasm,
+                "summary_pt": analysis.summary_pt,
+                "confidence": analysis.confidence,
+                "tokens_in": 0,
+                "tokens_out": 0,
+                "cost_estimate_usd": 0.0,
+                "raw_llm_response": None,
+            }
+    return found
+
+
+def _resolve_persona(post: Post) -> str | None:
+    """Persona text from the connection, falling back to user_context_post.json."""
+    if post.connection and post.connection.persona:
+        return post.connection.persona
+
+    context_file = Path(__file__).resolve().parent.parent.parent.parent / "user_context_post.json"
+    if context_file.exists():
+        try:
+            with open(context_file, "r", encoding="utf-8") as f:
+                file_data = json.load(f)
+                return file_data.get("persona")
+        except Exception as e:
+            logger.error("Erro ao carregar contexto da persona: %s", e)
+    return None
+
+
+def build_analysis_context(
+    db: Session,
+    llm: LLMClient,
+    post: Post,
+    persona_text: str | None,
+) -> dict:
+    """Persona + caption + image context sent along with every batch of a post."""
+    post_context = {}
+    if post.content_text:
+        post_context["post_caption"] = post.content_text
+
+    # Auto-generate image context via Vision LLM if missing
+    if not post.image_context and isinstance(post.media_urls, dict):
+        image_url = post.media_urls.get("url") or post.media_urls.get("thumbnail_url")
+        if image_url:
+            logger.info("Generating visual context for post %s using Vision LLM...", str(post.id))
+            try:
+                generated_context = llm.analyze_image(image_url, post.content_text)
+                if generated_context and not generated_context.startswith("Erro"):
+                    post.image_context = generated_context
+                    db.commit()
+                    logger.info("Visual context successfully generated and saved.")
+                else:
+                    logger.warning("Failed to generate useful visual context: %s", generated_context)
+            except Exception as e:
+                logger.error("Error generating visual context for image: %s", e)
+
+    if post.image_context:
+        post_context["post_image_context"] = post.image_context
+
+    analysis_context = {}
+    if persona_text:
+        analysis_context["persona"] = persona_text
+    analysis_context.update(post_context)
+    return analysis_context
+
+
+def _next_retry_at(attempts: int, now: datetime) -> datetime | None:
+    """When the sweeper retries a comment after ``attempts`` failed runs.
+
+    The delay doubles from ``ANALYSIS_RETRY_BASE_DELAY``; after
+    ``ANALYSIS_RETRY_MAX_SWEEPS`` failures the comment stays in "error".
+    """
+    if attempts >= settings.ANALYSIS_RETRY_MAX_SWEEPS:
+        return None
+    return now + timedelta(seconds=settings.ANALYSIS_RETRY_BASE_DELAY * 2 ** (attempts - 1))
+
+
+def _expected_batches(comments: list[Comment], tuner, batch_size: int | None) -> int:
+    """Rough number of LLM batches ``comments`` will be packed into."""
+    input_budget, output_budget = tuner.budgets()
+    input_tokens = sum(estimate_text_tokens(comment.text_clean) for comment in comments)
+    return max(
+        math.ceil(input_tokens / input_budget),
+        math.ceil(len(comments) * OUTPUT_TOKENS_PER_COMMENT / output_budget),
+        math.ceil(len(comments) / batch_size) if batch_size else 1,
+    )
+
+
+def _run_llm_batch(
+    llm: LLMClient,
+    comments_payload: list[dict],
+    prompt_version: str,
+    context: dict | None,
+    arrivals: SimpleQueue | None = None,
+    cache_context: bool = False,
+) -> tuple[list[dict], float]:
+    """Run one LLM batch to completion (executed on a worker thread).
+
+    With ``arrivals`` the response is streamed and every successful result
+    is also put on that queue as soon as it is parsed.
+    Returns the results and the wall-clock latency of the batch.
+    """
+    started = time.perf_counter()
+    results = []
+    options = {}
+    if arrivals is not None:
+        options["stream"] = True
+    if cache_context:
+        options["cache_context"] = True
+    for result in llm.analyze_comments(
+        comments_payload,
+        prompt_version=prompt_version,
+        context=context,
+        **options,
+    ):
+        results.append(result)
+        if arrivals is not None and result.get("error") is None:
+            arrivals.put(result)
+    return results, time.perf_counter() - started
+
+
+def store_analysis_results(
+    db: Session,
+    results: list[dict],
+    prompt_version: str,
+    stats: dict,
+    context_class: str | None = None,
+    summary_delta: dict | None = None,
+    model: str | None = None,
+) -> None:
+    """Upsert a batch of LLM results and update the comments' status.
+
+    Uses a constant number of statements per batch: one lookup of the
+    comments and their existing rows on ``uq_comment_model_version``, one
+    INSERT and one UPDATE for ``comment_analysis`` and one UPDATE for
+    ``comments`` (status and the ``latest_analysis_id`` pointer). When ``summary_delta`` is given, the change in the
+    post's running totals (new result minus replaced result) is added to it.
+    A replaced result that had a score was weighted by the like count at its
+    own analysis time, which is not known here, so the delta is flagged
+    for a full rebuild instead (``delta["rebuild"]``).
+
+    ``model`` (default ``settings.GEMINI_MODEL``) tags the stored rows. A
+    comment keeps one row per prompt version across the analysis models:
+    an existing row of the other model is replaced in place.
+    """
+    model = model or settings.GEMINI_MODEL
+    if not results:
+        return
+
+    analyzed_at = datetime.now(timezone.utc)
+    by_comment = {uuid.UUID(result["comment_id"]): result for result in results}
+
+    existing = {
+        row.comment_id: row
+        for row in (
+            db.query(
+                Comment.id.label("comment_id"),
+                Comment.like_count,
+                Comment.analysis_attempts,
+                CommentAnalysis.id.label("analysis_id"),
+                CommentAnalysis.score_0_10,
+                CommentAnalysis.polarity,
+                CommentAnalysis.intensity,
+                CommentAnalysis.confidence,
+                CommentAnalysis.emotions,
+                CommentAnalysis.topics,
+            )
+            .outerjoin(
+                CommentAnalysis,
+                and_(
+                    CommentAnalysis.comment_id == Comment.id,
+                    CommentAnalysis.model.in_(_analysis_models()),
+                    CommentAnalysis.prompt_version == prompt_version,
+                ),
+            )
+            .filter(Comment.id.in_(list(by_comment)))
+            .all()
+        )
+    }
+
+    to_insert = []
+    to_update = []
+    comment_rows = []
+    for comment_uuid, result in by_comment.items():
+        confidence = result.get("confidence")
+        is_error = confidence in (None, 0)
+        values = {
+            "model": model,
+            "score_0_10": result.get("score_0_10"),
+            "polarity": result.get("polarity"),
+            "intensity": result.get("intensity"),
+            "emotions": result.get("emotions"),
+            "topics": result.get("topics"),
+            "sarcasm": result.get("sarcasm", False),
+            "summary_pt": result.get("summary_pt"),
+            "confidence": confidence,
+            "tokens_in": result.get("tokens_in"),
+            "tokens_out": result.get("tokens_out"),
+            "cost_estimate_usd": result.get("cost_estimate_usd"),
+            "raw_llm_response": result.get("raw_llm_response"),
+            "context_class": context_class,
+            "analyzed_at": analyzed_at,
+        }
+        row = existing.get(comment_uuid)
+        analysis_id = row.analysis_id if row else None
+        if summary_delta is not None and row is not None:
+            if analysis_id is not None and row.score_0_10 is not None:
+                summary_delta["rebuild"] = True
+            elif analysis_id is not None:
+                _accumulate(summary_delta, row._mapping, row.like_count, -1)
+            _accumulate(summary_delta, values, row.like_count, 1)
+        if analysis_id is None:
+            analysis_id = uuid.uuid4()
+            to_insert.append({
+                "id": analysis_id,
+                "comment_id": comment_uuid,
+                "prompt_version": prompt_version,
+                **values,
+            })
+        else:
+            to_update.append({"id": analysis_id, **values})
+
+        attempts = 0
+        if is_error:
+            attempts = ((row.analysis_attempts if row else 0) or 0) + 1
+        comment_rows.append({
+            "id": comment_uuid,
+            "status": "error" if is_error else "processed",
+            "last_error": (result.get("summary_pt") or "")[:200] if is_error else None,
+            "latest_analysis_id": analysis_id,
+            "analysis_attempts": attempts,
+            "next_retry_at": _next_retry_at(attempts, analyzed_at) if is_error else None,
+        })
+        if is_error:
+            stats["errors"] += 1
+        stats["analyzed"] += 1
+
+    if to_insert:
+        db.execute(insert(CommentAnalysis), to_insert)
+    if to_update:
+        db.execute(update(CommentAnalysis), to_update)
+    db.execute(update(Comment), comment_rows)
+
+
+def _preclassify_comments(
+    db: Session,
+    comments: list[Comment],
+    prompt_version: str,
+    stats: dict,
+    context_class: str | None = None,
+    summary_delta: dict | None = None,
+) -> list[Comment]:
+    """Score trivial comments locally; returns the ones left for the LLM.
+
+    Emoji-only, single-word, tag-only and empty comments get a lexicon
+    result stored under ``LOCAL_MODEL`` (see services/preclassifier.py).
+    Counted in ``stats["local"]``.
+    """
+    if not settings.LOCAL_PRECLASSIFIER:
+        return comments
+    local, remaining = [], []
+    for comment in comments:
+        result = preclassify(comment.text_clean)
+        if result is None:
+            remaining.append(comment)
+        else:
+            local.append({**result, "comment_id": str(comment.id)})
+    for i in range(0, len(local), IN_CLAUSE_CHUNK):
+        store_analysis_results(
+            db, local[i : i + IN_CLAUSE_CHUNK], prompt_version, stats,
+            context_class=context_class,
+            summary_delta=summary_delta,
+            model=LOCAL_MODEL,
+        )
+    stats["local"] = stats.get("local", 0) + len(local)
+    return remaining
+
+
+def prepare_post_comments(
+    db: Session,
+    post: Post,
+    comments: list[Comment],
+    prompt_version: str,
+    stats: dict,
+    summary_delta: dict | None = None,
+) -> tuple[dict[str, list[Comment]], str, str | None]:
+    """Store what is known without the LLM; group the rest by text.
+
+    Trivial comments are scored locally (``_preclassify_comments``) and
+    comments whose text was already analyzed (same model, prompt version
+    and persona) reuse that result, counted in ``stats["cache_hits"]``.
+    Returns the comments left for the LLM grouped by text hash (the first
+    of each group is the one to send), the context class and the persona.
+    """
+    persona_text = _resolve_persona(post)
+    context_class = _context_class(persona_text)
+    comments = _preclassify_comments(
+        db, comments, prompt_version, stats,
+        context_class=context_class,
+        summary_delta=summary_delta,
+    )
+
+    groups: dict[str, list[Comment]] = {}
+    for comment in comments:
+        text_hash = comment.text_hash or comment_text_hash(comment.text_clean)
+        groups.setdefault(text_hash, []).append(comment)
+
+    cached_results = _find_cached_results(
+        db, list(groups), prompt_version, context_class
+    )
+    reused = []
+    for text_hash, result in cached_results.items():
+        for comment in groups.pop(text_hash):
+            reused.append({**result, "comment_id": str(comment.id)})
+    stats["cache_hits"] = stats.get("cache_hits", 0) + len(reused)
+    for i in range(0, len(reused), IN_CLAUSE_CHUNK):
+        store_analysis_results(
+            db, reused[i : i + IN_CLAUSE_CHUNK], prompt_version, stats,
+            context_class=context_class,
+            summary_delta=summary_delta,
+        )
+    return groups, context_class, persona_text
+
+
 def analyze_post_comments(
     db: Session,
     post_id: uuid.UUID,
-    batch_size: int = 30,
+    batch_size: int | None = None,
     prompt_version: str = "v1",
+    max_concurrency: int | None = None,
+    stream: bool | None = None,
+    on_progress: Callable[[dict], None] | None = None,
 ) -> dict:
-    """Analyze pending comments for a post, skipping already-analyzed rows."""
+    """Analyze pending comments for a post, skipping already-analyzed rows.
+
+    Trivial comments (emoji only, one word, tags, empty) are scored
+    locally first and comments whose text was already analyzed (same
+    model, prompt version and persona) reuse that result instead of calling
+    the LLM (see ``prepare_post_comments``). The rest
+    are packed into batches by token budget (see services/batching.py;
+    ``batch_size`` additionally caps the comments per batch). Up to
+    ``max_concurrency`` batches (default ``settings.LLM_MAX_CONCURRENCY``)
+    are sent to the LLM at the same time. Comments the LLM did not answer
+    are sent again within a bounded number of calls (see ``recover``). The
+    post's PostAnalysisSummary is updated incrementally from the newly
+    stored results.
+
+    With ``stream`` (default ``settings.GEMINI_STREAMING``) responses are
+    streamed and results are stored every STREAM_FLUSH_INTERVAL seconds
+    while batches are still running. ``on_progress`` is called with the
+    stats after every commit.
+    """
     analysis_exists = _analysis_exists_expression(db, prompt_version)
 
     # Repair stale pending rows: if analysis exists, mark processed.
@@ -68,253 +505,474 @@ def analyze_post_comments(
 
     post = db.get(Post, post_id)
     if not post:
-        return {"analyzed": 0, "errors": 0, "llm_calls": 0}
+        return {"analyzed": 0, "errors": 0, "llm_calls": 0, "cache_hits": 0}
         
     connection = db.get(SocialConnection, post.connection_id)
-    ignore_author = connection.ignore_author_comments if connection else False
 
-    pending_query = (
+    pending = (
         db.query(Comment)
         .filter(
             Comment.post_id == post_id,
             Comment.status == "pending",
-            ~analysis_exists,
+            *unanalyzed_filters(db, prompt_version, connection),
         )
+        .order_by(Comment.like_count.desc())
+        .all()
     )
-    
-    if ignore_author and connection:
-        pending_query = pending_query.filter(
-            func.lower(Comment.author_username) != func.lower(connection.username)
-        )
-        
-    pending = pending_query.order_by(Comment.like_count.desc()).all()
 
     if not pending:
         db.commit()
-        return {"analyzed": 0, "errors": 0, "llm_calls": 0}
+        return {"analyzed": 0, "errors": 0, "llm_calls": 0, "cache_hits": 0}
+
+    stats = {"analyzed": 0, "errors": 0, "llm_calls": 0, "cache_hits": 0, "retried": 0, "local": 0}
+    summary_delta = _empty_totals(prompt_version)
+
+    # Identical texts are analyzed once: one representative per unknown
+    # text hash goes to the LLM.
+    groups, context_class, persona_text = prepare_post_comments(
+        db, post, pending, prompt_version, stats, summary_delta=summary_delta
+    )
+
+    if not groups:
+        _apply_summary_delta(db, post, connection, summary_delta)
+        return stats
 
     llm = LLMClient(
         api_key=settings.GEMINI_API_KEY,
         model=settings.GEMINI_MODEL,
     )
+    analysis_context = build_analysis_context(db, llm, post, persona_text)
 
-    stats = {"analyzed": 0, "errors": 0, "llm_calls": 0}
-
-    post_context = {}
-    persona_text = None
-
-    if post:
-        if post.content_text:
-            post_context["post_caption"] = post.content_text
-        
-        # Auto-generate image context via Vision LLM if missing
-        if not post.image_context and isinstance(post.media_urls, dict):
-            image_url = post.media_urls.get("url") or post.media_urls.get("thumbnail_url")
-            if image_url:
-                logger.info("Generating visual context for post %s using Vision LLM...", str(post.id))
-                try:
-                    generated_context = llm.analyze_image(image_url, post.content_text)
-                    if generated_context and not generated_context.startswith("Erro"):
-                        post.image_context = generated_context
-                        db.commit()
-                        logger.info("Visual context successfully generated and saved.")
-                    else:
-                        logger.warning("Failed to generate useful visual context: %s", generated_context)
-                except Exception as e:
-                    logger.error("Error generating visual context for image: %s", e)
-
-        if post.image_context:
-            post_context["post_image_context"] = post.image_context
-        
-        # Prefer the DB-stored persona
-        if post.connection and post.connection.persona:
-            persona_text = post.connection.persona
-
-    # Fallback to file if not in DB yet
-    if not persona_text:
-        context_file = Path(__file__).resolve().parent.parent.parent.parent / "user_context_post.json"
-        if context_file.exists():
-            try:
-                with open(context_file, "r", encoding="utf-8") as f:
-                    file_data = json.load(f)
-                    persona_text = file_data.get("persona")
-            except Exception as e:
-                logger.error("Erro ao carregar contexto da persona: %s", e)
-
-    analysis_context = {}
-    if persona_text:
-        analysis_context["persona"] = persona_text
-    analysis_context.update(post_context)
+    representatives = [members[0] for members in groups.values()]
+    duplicates = {
+        str(members[0].id): members[1:] for members in groups.values()
+    }
 
-    for i in range(0, len(pending), batch_size):
-        batch = pending[i : i + batch_size]
-        batch_num = i // batch_size + 1
-        total_batches = math.ceil(len(pending) / batch_size)
+    queue = deque(representatives)
+    # Halves of failed batches, sent as they are (see the recovery below)
+    retry_batches: deque[list[Comment]] = deque()
+    calls_per_comment: Counter = Counter()
+    max_calls = max(1, settings.LLM_MAX_COMMENT_ATTEMPTS)
+    tuner = get_batch_tuner(llm.model)
+    concurrency = max(1, max_concurrency or settings.LLM_MAX_CONCURRENCY)
+    context_payload = analysis_context if analysis_context else None
+    stream = settings.GEMINI_STREAMING if stream is None else stream
+    arrivals: SimpleQueue | None = SimpleQueue() if stream else None
+    streamed_ids: set[str] = set()
+    cache_context = settings.GEMINI_CONTEXT_CACHE and _expected_batches(
+        representatives, tuner, batch_size
+    ) >= CONTEXT_CACHE_MIN_BATCHES
+    batch_num = 0
 
+    def dispatch(pool, futures) -> None:
+        # Packed lazily so each batch uses the budgets tuned by the ones before it
+        nonlocal batch_num
+        if retry_batches:
+            batch = retry_batches.popleft()
+        else:
+            input_budget, output_budget = tuner.budgets()
+            batch = next_batch(
+                queue, lambda comment: comment.text_clean, input_budget, output_budget, batch_size
+            )
+        batch_num += 1
         logger.info(
-            "Processing batch %d/%d (%d comments)",
+            "Dispatching batch %d (%d comments, %d left)",
             batch_num,
-            total_batches,
             len(batch),
+            len(queue),
+        )
+        comments_payload = []
+        for comment in batch:
+            calls_per_comment[comment.id] += 1
+            comments_payload.append({"comment_id": str(comment.id), "text_clean": comment.text_clean})
+        future = pool.submit(
+            _run_llm_batch, llm, comments_payload, prompt_version, context_payload,
+            arrivals, cache_context,
         )
+        futures[future] = (batch_num, batch)
 
-        comments_payload = [
-            {"comment_id": str(comment.id), "text_clean": comment.text_clean}
-            for comment in batch
-        ]
+    def recover(batch: list[Comment], results: list[dict]) -> list[dict]:
+        """Send unanswered comments again; returns the results to store.
 
-        try:
-            results = list(llm.analyze_comments(
-                comments_payload,
-                prompt_version=prompt_version,
-                context=analysis_context if analysis_context else None
-            ))
-            stats["llm_calls"] += 1
-
-            for result in results:
-                comment_uuid = uuid.UUID(result["comment_id"])
-                confidence = result.get("confidence")
-                is_error = confidence in (None, 0)
-
-                existing_analysis = (
-                    db.query(CommentAnalysis)
-                    .filter(
-                        CommentAnalysis.comment_id == comment_uuid,
-                        CommentAnalysis.model == settings.GEMINI_MODEL,
-                        CommentAnalysis.prompt_version == prompt_version,
-                    )
-                    .first()
-                )
+        Ids the LLM left out go back to the front of the queue and are
+        packed into the next batch. A batch whose call failed is split in
+        two, so a comment that breaks the request ends up alone and only
+        that one is stored as an error. Each comment takes part in at most
+        ``LLM_MAX_COMMENT_ATTEMPTS`` calls; after that its error is kept
+        and the background sweeper retries it later.
+        """
+        by_id = {str(comment.id): comment for comment in batch}
+        final, failed = [], []
+        for result in results:
+            comment = by_id[result["comment_id"]]
+            error = result.get("error")
+            if error is None or calls_per_comment[comment.id] >= max_calls:
+                final.append(result)
+            elif error == "failed" and len(batch) == 1:
+                final.append(result)
+            elif error == "failed":
+                failed.append(comment)
+            else:
+                queue.appendleft(comment)
+                stats["retried"] += 1
+        if failed:
+            middle = (len(failed) + 1) // 2
+            retry_batches.extend(half for half in (failed[:middle], failed[middle:]) if half)
+            stats["retried"] += len(failed)
+        return final
 
-                if existing_analysis:
-                    analysis = existing_analysis
-                else:
-                    analysis = CommentAnalysis(
-                        comment_id=comment_uuid,
-                        model=settings.GEMINI_MODEL,
-                        prompt_version=prompt_version,
-                    )
-                    db.add(analysis)
-
-                analysis.score_0_10 = result.get("score_0_10")
-                analysis.polarity = result.get("polarity")
-                analysis.intensity = result.get("intensity")
-                analysis.emotions = result.get("emotions")
-                analysis.topics = result.get("topics")
-                analysis.sarcasm = result.get("sarcasm", False)
-                analysis.summary_pt = result.get("summary_pt")
-                analysis.confidence = confidence
-                analysis.tokens_in = result.get("tokens_in")
-                analysis.tokens_out = result.get("tokens_out")
-                analysis.cost_estimate_usd = result.get("cost_estimate_usd")
-                analysis.raw_llm_response = result.get("raw_llm_response")
-                analysis.analyzed_at = datetime.now(timezone.utc)
-
-                comment = db.get(Comment, comment_uuid)
-                if comment:
-                    comment.status = "error" if is_error else "processed"
-                    comment.last_error = (
-                        (result.get("summary_pt") or "")[:200] if is_error else None
-                    )
+    def persist(results: list[dict]) -> None:
+        copies = [
+            {
+                **result,
+                "comment_id": str(duplicate.id),
+                "tokens_in": 0,
+                "tokens_out": 0,
+                "cost_estimate_usd": 0.0,
+            }
+            for result in results
+            for duplicate in duplicates.get(result["comment_id"], [])
+        ]
+        store_analysis_results(
+            db, results + copies, prompt_version, stats,
+            context_class=context_class,
+            summary_delta=summary_delta,
+        )
 
-                stats["analyzed"] += 1
-                if is_error:
-                    stats["errors"] += 1
+    def flush_streamed() -> bool:
+        # Results streamed so far by batches still (or just) running
+        results = []
+        while True:
+            try:
+                results.append(arrivals.get_nowait())
+            except Empty:
+                break
+        if results:
+            streamed_ids.update(result["comment_id"] for result in results)
+            persist(results)
+        return bool(results)
 
-        except Exception as exc:
-            logger.error("Batch %d failed: %s", batch_num, exc)
-            for comment in batch:
-                comment.status = "error"
-                comment.last_error = str(exc)[:200]
-            stats["errors"] += len(batch)
+    # LLM calls fan out to a thread pool; results are persisted on this
+    # thread (the Session is not thread-safe) as each batch completes.
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = {}
+        while (queue or retry_batches) and len(futures) < concurrency:
+            dispatch(pool, futures)
 
-    db.commit()
+        while futures:
+            done, _ = wait(
+                futures,
+                timeout=STREAM_FLUSH_INTERVAL if stream else None,
+                return_when=FIRST_COMPLETED,
+            )
+            # Drained before the finished batches, whose streamed results
+            # are already on the queue
+            if stream and flush_streamed() and not done:
+                db.commit()
+                if on_progress:
+                    on_progress(stats)
+            for future in done:
+                done_num, batch = futures.pop(future)
+                try:
+                    results, latency = future.result()
+                    stats["llm_calls"] += 1
+                    tuner.record(
+                        len(batch),
+                        sum(1 for result in results if result.get("confidence") in (None, 0)),
+                        latency,
+                    )
+                    results = recover(batch, results)
+                    persist([result for result in results if result["comment_id"] not in streamed_ids])
+                except Exception as exc:
+                    logger.error("Batch %d failed: %s", done_num, exc)
+                    failed_at = datetime.now(timezone.utc)
+                    for representative in batch:
+                        if str(representative.id) in streamed_ids:
+                            continue
+                        for comment in [representative, *duplicates.get(str(representative.id), [])]:
+                            comment.status = "error"
+                            comment.last_error = str(exc)[:200]
+                            comment.analysis_attempts = (comment.analysis_attempts or 0) + 1
+                            comment.next_retry_at = _next_retry_at(comment.analysis_attempts, failed_at)
+                            stats["errors"] += 1
+                db.commit()
+                if on_progress:
+                    on_progress(stats)
+            while (queue or retry_batches) and len(futures) < concurrency:
+                dispatch(pool, futures)
+
+    _apply_summary_delta(db, post, connection, summary_delta)
     return stats
 
 
-def generate_post_summary(
+def requeue_failed_comments(
     db: Session,
-    post_id: uuid.UUID,
-    prompt_version: str = "v1",
-) -> PostAnalysisSummary | None:
-    """Calculate and store aggregated analysis for one post."""
-    post = db.get(Post, post_id)
-    connection = db.get(SocialConnection, post.connection_id) if post else None
-    ignore_author = connection.ignore_author_comments if connection else False
+    now: datetime | None = None,
+    limit: int = 5000,
+) -> list[uuid.UUID]:
+    """Put comments whose retry is due back to "pending".
 
-    analyses_query = (
-        db.query(CommentAnalysis)
-        .join(Comment, Comment.id == CommentAnalysis.comment_id)
-        .filter(
-            Comment.post_id == post_id,
-            CommentAnalysis.model == settings.GEMINI_MODEL,
-            CommentAnalysis.prompt_version == prompt_version,
-        )
+    Comments stored as errors get a ``next_retry_at`` with exponential
+    backoff (see ``_next_retry_at``). Returns the ids of the posts that now
+    have pending comments; the caller commits and queues their analysis.
+    """
+    now = now or datetime.now(timezone.utc)
+    due = (
+        db.query(Comment.id, Comment.post_id)
+        .filter(Comment.status == "error", Comment.next_retry_at <= now)
+        .order_by(Comment.next_retry_at)
+        .limit(limit)
+        .all()
+    )
+    if not due:
+        return []
+    db.execute(
+        update(Comment),
+        [{"id": comment_id, "status": "pending", "next_retry_at": None} for comment_id, _ in due],
     )
-    
+    return list(dict.fromkeys(post_id for _, post_id in due))
+
+
+def _summary_filters(post_id: uuid.UUID, prompt_version: str, connection, ignore_author: bool) -> list:
+    filters = [
+        Comment.post_id == post_id,
+        CommentAnalysis.model.in_(_analysis_models()),
+        CommentAnalysis.prompt_version == prompt_version,
+    ]
     if ignore_author and connection:
-        analyses_query = analyses_query.filter(
-            func.lower(Comment.author_username) != func.lower(connection.username)
-        )
-        
-    analyses = analyses_query.all()
+        filters.append(_not_author_filter(connection))
+    return filters
 
-    if not analyses:
-        return None
 
-    total_comments_query = (
-        db.query(func.count(Comment.id))
-        .filter(Comment.post_id == post_id)
-    )
-    
+def _total_comments_filters(post_id: uuid.UUID, connection, ignore_author: bool) -> list:
+    filters = [Comment.post_id == post_id]
     if ignore_author and connection:
-        total_comments_query = total_comments_query.filter(
-            func.lower(Comment.author_username) != func.lower(connection.username)
+        filters.append(_not_author_filter(connection))
+    return filters
+
+
+# ---------------------------------------------------------------------------
+# Running totals: mergeable state behind PostAnalysisSummary
+# ---------------------------------------------------------------------------
+
+_AVERAGED_FIELDS = (
+    ("score", "score_0_10"),
+    ("polarity", "polarity"),
+    ("intensity", "intensity"),
+    ("confidence", "confidence"),
+)
+
+
+def _empty_totals(prompt_version: str) -> dict:
+    totals = {
+        "model": settings.GEMINI_MODEL,
+        "prompt_version": prompt_version,
+        "analyzed": 0,
+        "weighted_sum": 0.0,
+        "weight_sum": 0.0,
+        "negative": 0,
+        "neutral": 0,
+        "positive": 0,
+        "emotions": {},
+        "topics": {},
+    }
+    for key, _ in _AVERAGED_FIELDS:
+        totals[f"{key}_sum"] = 0.0
+        totals[f"{key}_n"] = 0
+    return totals
+
+
+def _accumulate(totals: dict, analysis, like_count: int | None, sign: int) -> None:
+    """Add (sign=1) or remove (sign=-1) one analysis' contribution."""
+    totals["analyzed"] += sign
+    for key, column in _AVERAGED_FIELDS:
+        value = analysis[column]
+        if value is not None:
+            totals[f"{key}_sum"] += sign * value
+            totals[f"{key}_n"] += sign
+
+    score = analysis["score_0_10"]
+    if score is not None:
+        weight = math.log2((like_count or 0) + 2)
+        totals["weighted_sum"] += sign * score * weight
+        totals["weight_sum"] += sign * weight
+        if score < 4:
+            totals["negative"] += sign
+        elif score <= 6:
+            totals["neutral"] += sign
+        else:
+            totals["positive"] += sign
+
+    for key, column in (("emotions", "emotions"), ("topics", "topics")):
+        labels = analysis[column]
+        if isinstance(labels, list):
+            counter = totals[key]
+            for label in labels:
+                label = str(label)
+                counter[label] = counter.get(label, 0) + sign
+                if counter[label] <= 0:
+                    del counter[label]
+
+
+def _merge_totals(base: dict, delta: dict) -> dict:
+    merged = dict(base)
+    for key, value in delta.items():
+        if key in ("emotions", "topics"):
+            counter = Counter(base.get(key) or {})
+            counter.update(value)
+            merged[key] = {label: n for label, n in counter.items() if n > 0}
+        elif isinstance(value, (int, float)):
+            merged[key] = (base.get(key) or 0) + value
+    return merged
+
+
+def _write_summary(summary: PostAnalysisSummary, totals: dict, total_comments: int) -> None:
+    def avg(key):
+        n = totals[f"{key}_n"]
+        return round(totals[f"{key}_sum"] / n, 2) if n > 0 else None
+
+    summary.total_comments = total_comments
+    summary.total_analyzed = totals["analyzed"]
+    summary.avg_score = avg("score")
+    summary.avg_polarity = avg("polarity")
+    summary.avg_intensity = avg("intensity")
+    summary.avg_confidence = avg("confidence")
+    summary.weighted_score = (
+        round(totals["weighted_sum"] / totals["weight_sum"], 2)
+        if totals["weight_sum"] > 0 else None
+    )
+    summary.emotions_distribution = dict(Counter(totals["emotions"]).most_common(10))
+    summary.topics_frequency = dict(Counter(totals["topics"]).most_common(15))
+    summary.sentiment_distribution = {
+        "negative": totals["negative"],
+        "neutral": totals["neutral"],
+        "positive": totals["positive"],
+    }
+    summary.running_totals = totals
+    summary.generated_at = datetime.now(timezone.utc)
+
+
+def _label_counts_subquery(analyses, column):
+    """json_object_agg of label -> count over a JSON array column (PostgreSQL)."""
+    # Non-array values (JSON null, scalars) become SQL NULL and yield no rows
+    array_only = case((func.json_typeof(column) == "array", column))
+    labels = func.json_array_elements_text(array_only).table_valued("value").lateral()
+    counts = (
+        select(labels.c.value.label("label"), func.count().label("n"))
+        .select_from(analyses)
+        .join(labels, true())
+        .group_by(labels.c.value)
+        .subquery()
+    )
+    return select(func.json_object_agg(counts.c.label, counts.c.n)).scalar_subquery()
+
+
+def _summary_statement(post_id: uuid.UUID, prompt_version: str, connection, ignore_author: bool):
+    """Single PostgreSQL statement computing the running totals of a post."""
+    analyses = (
+        select(
+            CommentAnalysis.score_0_10.label("score"),
+            CommentAnalysis.polarity.label("polarity"),
+            CommentAnalysis.intensity.label("intensity"),
+            CommentAnalysis.confidence.label("confidence"),
+            CommentAnalysis.emotions.label("emotions"),
+            CommentAnalysis.topics.label("topics"),
+            (
+                func.ln(func.coalesce(Comment.like_count, 0) + 2, type_=Float)
+                / math.log(2)
+            ).label("weight"),
         )
+        .join(Comment, Comment.id == CommentAnalysis.comment_id)
+        .where(*_summary_filters(post_id, prompt_version, connection, ignore_author))
+        .cte("post_analyses")
+    )
+    score = analyses.c.score
+    total_comments = (
+        select(func.count(Comment.id))
+        .where(*_total_comments_filters(post_id, connection, ignore_author))
+        .scalar_subquery()
+    )
+    columns = [
+        total_comments.label("total_comments"),
+        func.count().label("analyzed"),
+        func.sum(score * analyses.c.weight).label("weighted_sum"),
+        func.sum(case((score.isnot(None), analyses.c.weight))).label("weight_sum"),
+        func.count(case((score < 4, 1))).label("negative"),
+        func.count(case((score.between(4, 6), 1))).label("neutral"),
+        func.count(case((score > 6, 1))).label("positive"),
+        _label_counts_subquery(analyses, analyses.c.emotions).label("emotions"),
+        _label_counts_subquery(analyses, analyses.c.topics).label("topics"),
+    ]
+    for key, _ in _AVERAGED_FIELDS:
+        columns.append(func.sum(analyses.c[key]).label(f"{key}_sum"))
+        columns.append(func.count(analyses.c[key]).label(f"{key}_n"))
+    return select(*columns).select_from(analyses)
 
-    total_comments = total_comments_query.scalar() or 0
 
-    scores = [a.score_0_10 for a in analyses if a.score_0_10 is not None]
-    polarities = [a.polarity for a in analyses if a.polarity is not None]
-    intensities = [a.intensity for a in analyses if a.intensity is not None]
-    confidences = [a.confidence for a in analyses if a.confidence is not None]
+def _aggregate_summary_sql(db: Session, post_id, prompt_version, connection, ignore_author) -> tuple[dict, int]:
+    row = db.execute(
+        _summary_statement(post_id, prompt_version, connection, ignore_author)
+    ).one()._mapping
+    totals = _empty_totals(prompt_version)
+    for key in totals:
+        if key in ("emotions", "topics"):
+            totals[key] = dict(row[key] or {})
+        elif key not in ("model", "prompt_version"):
+            totals[key] = row[key] or 0
+    return totals, row["total_comments"] or 0
 
-    avg_score = sum(scores) / len(scores) if scores else None
-    avg_polarity = sum(polarities) / len(polarities) if polarities else None
-    avg_intensity = sum(intensities) / len(intensities) if intensities else None
-    avg_confidence = sum(confidences) / len(confidences) if confidences else None
 
-    weighted_score = None
-    if scores:
-        weighted_pairs = []
-        for analysis in analyses:
-            if analysis.score_0_10 is None:
-                continue
-            comment = db.get(Comment, analysis.comment_id)
-            likes = comment.like_count if comment else 0
-            weight = math.log2(likes + 2)
-            weighted_pairs.append((analysis.score_0_10, weight))
-        if weighted_pairs:
-            total_weight = sum(weight for _, weight in weighted_pairs)
-            weighted_score = (
-                sum(score * weight for score, weight in weighted_pairs) / total_weight
-            )
+def _aggregate_summary_streaming(db: Session, post_id, prompt_version, connection, ignore_author) -> tuple[dict, int]:
+    """Dialect-agnostic fallback (SQLite): one streamed pass, constant memory."""
+    totals = _empty_totals(prompt_version)
+    rows = (
+        db.query(
+            CommentAnalysis.score_0_10,
+            CommentAnalysis.polarity,
+            CommentAnalysis.intensity,
+            CommentAnalysis.confidence,
+            CommentAnalysis.emotions,
+            CommentAnalysis.topics,
+            Comment.like_count,
+        )
+        .join(Comment, Comment.id == CommentAnalysis.comment_id)
+        .filter(*_summary_filters(post_id, prompt_version, connection, ignore_author))
+        .yield_per(STREAM_CHUNK_SIZE)
+    )
+    for row in rows:
+        _accumulate(totals, row._mapping, row.like_count, 1)
+
+    total_comments = (
+        db.query(func.count(Comment.id))
+        .filter(*_total_comments_filters(post_id, connection, ignore_author))
+        .scalar()
+        or 0
+    )
+    return totals, total_comments
 
-    emotion_counter = Counter()
-    for analysis in analyses:
-        if analysis.emotions:
-            for emotion in analysis.emotions:
-                emotion_counter[emotion] += 1
 
-    topic_counter = Counter()
-    for analysis in analyses:
-        if analysis.topics:
-            for topic in analysis.topics:
-                topic_counter[topic] += 1
+def generate_post_summary(
+    db: Session,
+    post_id: uuid.UUID,
+    prompt_version: str = "v1",
+) -> PostAnalysisSummary | None:
+    """Rebuild the aggregated analysis of one post from scratch.
+
+    On PostgreSQL every aggregate is computed by a single statement; other
+    dialects stream the analyses once. Routine updates go through
+    ``_apply_summary_delta`` instead.
+    """
+    post = db.get(Post, post_id)
+    connection = db.get(SocialConnection, post.connection_id) if post else None
+    ignore_author = connection.ignore_author_comments if connection else False
 
-    negative = sum(1 for score in scores if score < 4)
-    neutral = sum(1 for score in scores if 4 <= score <= 6)
-    positive = sum(1 for score in scores if score > 6)
+    if db.get_bind().dialect.name == "postgresql":
+        totals, total_comments = _aggregate_summary_sql(db, post_id, prompt_version, connection, ignore_author)
+    else:
+        totals, total_comments = _aggregate_summary_streaming(db, post_id, prompt_version, connection, ignore_author)
+
+    if not totals["analyzed"]:
+        return None
 
     summary = (
         db.query(PostAnalysisSummary)
@@ -326,26 +984,52 @@ def generate_post_summary(
         summary = PostAnalysisSummary(post_id=post_id)
         db.add(summary)
 
-    summary.total_comments = total_comments
-    summary.total_analyzed = len(analyses)
-    summary.avg_score = round(avg_score, 2) if avg_score is not None else None
-    summary.avg_polarity = round(avg_polarity, 2) if avg_polarity is not None else None
-    summary.avg_intensity = round(avg_intensity, 2) if avg_intensity is not None else None
-    summary.avg_confidence = (
-        round(avg_confidence, 2) if avg_confidence is not None else None
-    )
-    summary.weighted_score = (
-        round(weighted_score, 2) if weighted_score is not None else None
-    )
-    summary.emotions_distribution = dict(emotion_counter.most_common(10))
-    summary.topics_frequency = dict(topic_counter.most_common(15))
-    summary.sentiment_distribution = {
-        "negative": negative,
-        "neutral": neutral,
-        "positive": positive,
-    }
-    summary.generated_at = datetime.now(timezone.utc)
+    _write_summary(summary, totals, total_comments)
 
     db.commit()
     db.refresh(summary)
     return summary
+
+
+def _apply_summary_delta(
+    db: Session,
+    post: Post,
+    connection: SocialConnection | None,
+    delta: dict,
+) -> PostAnalysisSummary | None:
+    """Merge newly stored results into the post summary in O(delta).
+
+    Falls back to a full rebuild when the summary has no running totals yet,
+    they belong to another model/prompt version or the delta replaced a
+    scored result (see ``store_analysis_results``). Like weights are those
+    at analysis time; a rebuild picks up later like changes.
+    """
+    if delta == _empty_totals(delta["prompt_version"]):
+        db.commit()
+        return None
+
+    summary = (
+        db.query(PostAnalysisSummary)
+        .filter(PostAnalysisSummary.post_id == post.id)
+        .first()
+    )
+    base = summary.running_totals if summary else None
+    if (
+        not base
+        or delta.get("rebuild")
+        or base.get("model") != delta["model"]
+        or base.get("prompt_version") != delta["prompt_version"]
+    ):
+        db.commit()
+        return generate_post_summary(db, post.id, delta["prompt_version"])
+
+    ignore_author = connection.ignore_author_comments if connection else False
+    total_comments = (
+        db.query(func.count(Comment.id))
+        .filter(*_total_comments_filters(post.id, connection, ignore_author))
+        .scalar()
+        or 0
+    )
+    _write_summary(summary, _merge_totals(base, delta), total_comments)
+    db.commit()
+    return summary
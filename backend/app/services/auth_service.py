@@ -1,8 +1,8 @@
 import uuid
 
-import httpx
 from sqlalchemy.orm import Session
 
+from app.core.http import get_async_http_client
 from app.core.security import (
     create_access_token,
     create_refresh_token,
@@ -43,14 +43,14 @@ def authenticate_user(db: Session, email: str, password: str) -> User | None:
 
 async def authenticate_google(db: Session, google_token: str) -> User:
     """Verify Google token and create/get user."""
-    async with httpx.AsyncClient() as client:
-        response = await client.get(
-            GOOGLE_USERINFO_URL,
-            headers={"Authorization": f"Bearer {google_token}"},
-        )
-        if response.status_code != 200:
-            raise ValueError("Invalid Google token")
-        userinfo = response.json()
+    client = get_async_http_client("google")
+    response = await client.get(
+        GOOGLE_USERINFO_URL,
+        headers={"Authorization": f"Bearer {google_token}"},
+    )
+    if response.status_code != 200:
+        raise ValueError("Invalid Google token")
+    userinfo = response.json()
 
     email = userinfo.get("email")
     if not email:
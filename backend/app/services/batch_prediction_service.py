@@ -0,0 +1,419 @@
+"""
+Offline Gemini batch prediction for large backfills.
+
+Re-analysing a whole account (nightly backfills, prompt version
+migrations) does not need answers within seconds, so instead of
+synchronous ``generateContent`` calls the analysis requests are written to
+a JSONL job file, uploaded through the Files API and submitted as one
+Gemini batch job, which is billed at half the interactive price and does
+not count against the real-time quota.
+
+``submit_batch_job`` packs the comments of a connection that have no
+successful analysis for the prompt version into the same token-budgeted
+requests as ``analyze_post_comments`` and marks them "batched" so the
+real-time pipeline leaves them alone. ``poll_batch_job`` (run periodically
+by celery beat) checks the job and, once it succeeded, streams the results
+file line by line into ``CommentAnalysis``. Comments the job did not answer
+are stored as errors and picked up by the regular retry sweep; when the
+whole job fails they go back to "pending".
+"""
+
+import itertools
+import json
+import logging
+import tempfile
+import uuid
+from collections import deque
+from datetime import datetime, timedelta, timezone
+
+import httpx
+from sqlalchemy import and_, or_, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.http import get_http_client
+from app.models.analysis_batch_job import AnalysisBatchJob
+from app.models.comment import Comment
+from app.models.post import Post
+from app.models.social_connection import SocialConnection
+from app.services.analysis_service import (
+    IN_CLAUSE_CHUNK,
+    build_analysis_context,
+    generate_post_summary,
+    prepare_post_comments,
+    store_analysis_results,
+    unanalyzed_filters,
+)
+from app.services.batching import next_batch
+from app.services.llm_client import LLMClient
+from app.services.rollup_service import refresh_rollups_since
+
+logger = logging.getLogger(__name__)
+
+GEMINI_UPLOAD_URL = "https://generativelanguage.googleapis.com/upload/v1beta/files"
+GEMINI_DOWNLOAD_URL = "https://generativelanguage.googleapis.com/download/v1beta"
+
+SUCCEEDED_STATE = "BATCH_STATE_SUCCEEDED"
+FAILED_STATES = {"BATCH_STATE_FAILED", "BATCH_STATE_CANCELLED", "BATCH_STATE_EXPIRED"}
+# Result lines stored per transaction while reading the results file
+RESULT_CHUNK_LINES = 200
+# Upload / download of job files (can be hundreds of MB)
+FILE_TIMEOUT = httpx.Timeout(600, connect=10)
+# An "ingesting" claim older than this is considered abandoned (worker died)
+INGEST_LEASE = timedelta(minutes=30)
+# Ingestion attempts before the job is failed and its comments released
+MAX_INGEST_ATTEMPTS = 3
+
+
+def submit_batch_job(
+    db: Session,
+    connection_id: uuid.UUID,
+    user_id: uuid.UUID,
+    prompt_version: str | None = None,
+    max_comments: int | None = None,
+) -> AnalysisBatchJob | None:
+    """Submit the unanalyzed comments of a connection as one batch job.
+
+    As in ``analyze_post_comments``, trivial comments are scored locally
+    and earlier results for identical texts are reused right away; only one
+    comment per distinct text and post is sent. Returns None when there is
+    nothing to send.
+    """
+    prompt_version = prompt_version or settings.PROMPT_VERSION
+    connection = db.get(SocialConnection, connection_id)
+    if connection is None:
+        return None
+
+    comments = (
+        db.query(Comment)
+        .filter(
+            Comment.connection_id == connection_id,
+            Comment.status != "batched",
+            *unanalyzed_filters(db, prompt_version, connection),
+        )
+        .order_by(Comment.post_id, Comment.like_count.desc())
+        .limit(max_comments or settings.GEMINI_BATCH_MAX_COMMENTS)
+        .all()
+    )
+    if not comments:
+        return None
+
+    llm = LLMClient(api_key=settings.GEMINI_API_KEY, model=settings.GEMINI_MODEL)
+    stats = {"analyzed": 0, "errors": 0}
+    manifest: dict[str, dict] = {}
+    batched_ids: list[uuid.UUID] = []
+    reused_posts: set[uuid.UUID] = set()
+
+    with tempfile.TemporaryFile() as job_file:
+        for post_id, post_comments in itertools.groupby(comments, key=lambda c: c.post_id):
+            post = db.get(Post, post_id)
+            stored_before = stats["analyzed"]
+            groups, context_class, persona_text = prepare_post_comments(
+                db, post, list(post_comments), prompt_version, stats
+            )
+            if stats["analyzed"] > stored_before:
+                reused_posts.add(post_id)
+            if not groups:
+                continue
+
+            context = build_analysis_context(db, llm, post, persona_text) or None
+            queue = deque(groups.values())
+            while queue:
+                batch = next_batch(
+                    queue,
+                    lambda members: members[0].text_clean,
+                    settings.LLM_INPUT_TOKEN_BUDGET,
+                    settings.LLM_OUTPUT_TOKEN_BUDGET,
+                )
+                key = str(len(manifest) + 1)
+                request = llm.build_batch_request(
+                    [
+                        {"comment_id": str(members[0].id), "text_clean": members[0].text_clean}
+                        for members in batch
+                    ],
+                    context,
+                )
+                line = json.dumps({"key": key, "request": request}, ensure_ascii=False)
+                job_file.write(line.encode("utf-8") + b"\n")
+                # Position n of the request -> every comment sharing that text
+                manifest[key] = {
+                    "post_id": str(post_id),
+                    "context_class": context_class,
+                    "comments": [[str(c.id) for c in members] for members in batch],
+                }
+                batched_ids.extend(c.id for members in batch for c in members)
+
+        for post_id in reused_posts:
+            generate_post_summary(db, post_id, prompt_version)
+        if not manifest:
+            db.commit()
+            return None
+
+        display_name = f"sentimenta-{connection_id}-{prompt_version}"
+        file_name = _upload_job_file(llm, job_file, display_name)
+
+    batch_name = _create_batch(llm, file_name, display_name)
+    job = AnalysisBatchJob(
+        user_id=user_id,
+        connection_id=connection_id,
+        model=llm.model,
+        prompt_version=prompt_version,
+        status="submitted",
+        gemini_batch_name=batch_name,
+        manifest=manifest,
+        request_count=len(manifest),
+        comment_count=len(batched_ids),
+    )
+    db.add(job)
+    db.execute(
+        update(Comment),
+        [{"id": comment_id, "status": "batched"} for comment_id in batched_ids],
+    )
+    db.commit()
+    logger.info(
+        "Submitted batch job %s (%d requests, %d comments) for connection %s",
+        batch_name, job.request_count, job.comment_count, connection_id,
+    )
+    return job
+
+
+def _upload_job_file(llm: LLMClient, job_file, display_name: str) -> str:
+    """Resumable upload of the JSONL job file; returns the Files API name."""
+    size = job_file.tell()
+    client = get_http_client("gemini")
+    start = client.post(
+        f"{GEMINI_UPLOAD_URL}?key={llm.api_key}",
+        headers={
+            "X-Goog-Upload-Protocol": "resumable",
+            "X-Goog-Upload-Command": "start",
+            "X-Goog-Upload-Header-Content-Length": str(size),
+            "X-Goog-Upload-Header-Content-Type": "application/jsonl",
+        },
+        json={"file": {"display_name": display_name}},
+    )
+    start.raise_for_status()
+
+    job_file.seek(0)
+    response = client.post(
+        start.headers["X-Goog-Upload-URL"],
+        headers={
+            "Content-Length": str(size),
+            "X-Goog-Upload-Offset": "0",
+            "X-Goog-Upload-Command": "upload, finalize",
+        },
+        content=iter(lambda: job_file.read(1 << 20), b""),
+        timeout=FILE_TIMEOUT,
+    )
+    response.raise_for_status()
+    return response.json()["file"]["name"]
+
+
+def _create_batch(llm: LLMClient, file_name: str, display_name: str) -> str:
+    response = get_http_client("gemini").post(
+        f"{llm.base_url}/models/{llm.model}:batchGenerateContent?key={llm.api_key}",
+        json={"batch": {"display_name": display_name, "input_config": {"file_name": file_name}}},
+    )
+    response.raise_for_status()
+    return response.json()["name"]
+
+
+def poll_batch_job(db: Session, job: AnalysisBatchJob, now: datetime | None = None) -> str:
+    """Check a submitted job and store its results once it succeeded.
+
+    Returns the job status. Results are stored with the same upserts as the
+    real-time pipeline, so a job whose ingestion was interrupted is simply
+    read again: at the next poll after an error, or once the INGEST_LEASE of
+    a worker that died while ingesting has expired. After
+    MAX_INGEST_ATTEMPTS the job fails and its comments are released.
+    """
+    now = now or datetime.now(timezone.utc)
+    lease_expiry = now - INGEST_LEASE
+    if job.status == "ingesting":
+        claimed_at = job.claimed_at
+        if claimed_at is not None and claimed_at.tzinfo is None:
+            claimed_at = claimed_at.replace(tzinfo=timezone.utc)
+        if claimed_at is not None and claimed_at > lease_expiry:
+            return job.status
+    elif job.status != "submitted":
+        return job.status
+
+    llm = LLMClient(api_key=settings.GEMINI_API_KEY, model=job.model)
+    response = get_http_client("gemini").get(
+        f"{llm.base_url}/{job.gemini_batch_name}?key={llm.api_key}"
+    )
+    response.raise_for_status()
+    data = response.json()
+    metadata = data.get("metadata") or {}
+    job.gemini_state = metadata.get("state") or data.get("state")
+
+    if job.gemini_state in FAILED_STATES:
+        _release_comments(db, job)
+        job.status = "failed"
+        job.error = json.dumps(data.get("error") or job.gemini_state)[:500]
+        job.completed_at = datetime.now(timezone.utc)
+        db.commit()
+        logger.warning("Batch job %s ended in %s", job.gemini_batch_name, job.gemini_state)
+        return job.status
+    if job.gemini_state != SUCCEEDED_STATE:
+        db.commit()
+        return job.status
+
+    # Claim the job, so overlapping polls do not ingest it twice
+    claimed = (
+        db.query(AnalysisBatchJob)
+        .filter(
+            AnalysisBatchJob.id == job.id,
+            or_(
+                AnalysisBatchJob.status == "submitted",
+                and_(
+                    AnalysisBatchJob.status == "ingesting",
+                    or_(
+                        AnalysisBatchJob.claimed_at.is_(None),
+                        AnalysisBatchJob.claimed_at <= lease_expiry,
+                    ),
+                ),
+            ),
+        )
+        .update(
+            {
+                "status": "ingesting",
+                "claimed_at": now,
+                "ingest_attempts": AnalysisBatchJob.ingest_attempts + 1,
+            },
+            synchronize_session=False,
+        )
+    )
+    db.commit()
+    db.refresh(job)
+    if not claimed:
+        return job.status
+
+    output = data.get("response") or metadata.get("output") or {}
+    try:
+        _ingest_results(db, llm, job, output["responsesFile"])
+    except Exception as e:
+        logger.exception("Storing results of batch job %s failed", job.gemini_batch_name)
+        db.rollback()
+        job.error = str(e)[:500]
+        job.claimed_at = None
+        if job.ingest_attempts >= MAX_INGEST_ATTEMPTS:
+            _release_comments(db, job)
+            job.status = "failed"
+            job.completed_at = datetime.now(timezone.utc)
+        else:
+            job.status = "submitted"
+        db.commit()
+        return job.status
+    return job.status
+
+
+def _ingest_results(db: Session, llm: LLMClient, job: AnalysisBatchJob, file_name: str) -> None:
+    """Stream the results file into CommentAnalysis, then refresh aggregates."""
+    started_at = datetime.now(timezone.utc)
+    stats = {"analyzed": 0, "errors": 0}
+    cost = 0.0
+    posts: set[str] = set()
+    answered: set[str] = set()
+
+    def store(lines: list[dict]) -> None:
+        nonlocal cost
+        for line in lines:
+            key = str(line.get("key"))
+            entry = job.manifest.get(key)
+            if entry is None or key in answered:
+                continue
+            answered.add(key)
+            results = _line_results(llm, job, entry, line)
+            cost += sum(result.get("cost_estimate_usd") or 0.0 for result in results)
+            _store_expanded(db, job, entry, results, stats)
+            posts.add(entry["post_id"])
+        db.commit()
+
+    url = f"{GEMINI_DOWNLOAD_URL}/{file_name}:download?alt=media&key={llm.api_key}"
+    with get_http_client("gemini").stream("GET", url, timeout=FILE_TIMEOUT) as response:
+        response.raise_for_status()
+        chunk = []
+        for raw in response.iter_lines():
+            if not raw.strip():
+                continue
+            chunk.append(json.loads(raw))
+            if len(chunk) >= RESULT_CHUNK_LINES:
+                store(chunk)
+                chunk = []
+        store(chunk)
+
+    # Requests without a line in the results file
+    for key, entry in job.manifest.items():
+        if key in answered:
+            continue
+        ids = [members[0] for members in entry["comments"]]
+        results = llm.missing_results(
+            ids, job.prompt_version, "Não analisado (ausente no batch job)"
+        )
+        _store_expanded(db, job, entry, results, stats)
+        posts.add(entry["post_id"])
+    db.commit()
+
+    for post_id in posts:
+        generate_post_summary(db, uuid.UUID(post_id), job.prompt_version)
+    refresh_rollups_since(db, job.connection_id, started_at)
+
+    job.status = "completed"
+    job.comments_analyzed = stats["analyzed"]
+    job.errors_count = stats["errors"]
+    job.total_cost_usd = cost
+    job.completed_at = datetime.now(timezone.utc)
+    job.error = None
+    db.commit()
+    logger.info(
+        "Batch job %s stored %d analyses (%d errors)",
+        job.gemini_batch_name, stats["analyzed"], stats["errors"],
+    )
+
+
+def _line_results(llm: LLMClient, job: AnalysisBatchJob, entry: dict, line: dict) -> list[dict]:
+    """Results of one output line, for the first comment of each text."""
+    ids = [members[0] for members in entry["comments"]]
+    if "response" in line:
+        return llm.parse_batch_response(line["response"], ids, job.prompt_version)
+    error = RuntimeError(json.dumps(line.get("error") or "sem resposta", ensure_ascii=False))
+    return llm.failed_results(ids, job.prompt_version, error)
+
+
+def _store_expanded(
+    db: Session, job: AnalysisBatchJob, entry: dict, results: list[dict], stats: dict
+) -> None:
+    """Store ``results`` for every comment sharing the text of each one.
+
+    Only the comment that was sent carries the usage; its copies cost nothing.
+    """
+    duplicates = {group[0]: group[1:] for group in entry["comments"]}
+    copies = [
+        {
+            **result,
+            "comment_id": comment_id,
+            "tokens_in": 0,
+            "tokens_out": 0,
+            "cost_estimate_usd": 0.0,
+        }
+        for result in results
+        for comment_id in duplicates.get(result["comment_id"], [])
+    ]
+    store_analysis_results(
+        db, results + copies, job.prompt_version, stats, context_class=entry["context_class"]
+    )
+
+
+def _release_comments(db: Session, job: AnalysisBatchJob) -> None:
+    """Put the comments of a failed job back to "pending"."""
+    comment_ids = [
+        uuid.UUID(comment_id)
+        for entry in (job.manifest or {}).values()
+        for members in entry["comments"]
+        for comment_id in members
+    ]
+    for i in range(0, len(comment_ids), IN_CLAUSE_CHUNK):
+        db.query(Comment).filter(
+            Comment.id.in_(comment_ids[i : i + IN_CLAUSE_CHUNK]),
+            Comment.status == "batched",
+        ).update({"status": "pending"}, synchronize_session=False)
@@ -0,0 +1,109 @@
+"""
+Token-budget batching for comment analysis.
+
+Batches are packed greedily, in priority order, until either the input
+budget (comment text sent) or the output budget (one JSON item expected
+back per comment) would be exceeded, so a request carries many short
+comments or a few long ones. A per-model ``BatchTuner`` scales both
+budgets down when batches come back with parse failures or run past the
+latency target, and grows them back while batches succeed.
+"""
+
+import math
+import threading
+from collections import deque
+from typing import Callable, TypeVar
+
+from app.core.config import settings
+from app.services.llm_client import OUTPUT_TOKENS_PER_COMMENT
+
+T = TypeVar("T")
+
+# Per-comment framing in the prompt ("<n>\t" line prefix and newline)
+ITEM_OVERHEAD_TOKENS = 4
+MIN_SCALE = 0.125
+# Multiplicative decrease on failure / slow batch, additive increase on success
+FAILURE_FACTOR = 0.5
+SLOW_FACTOR = 0.75
+RECOVERY_STEP = 0.1
+
+
+def estimate_text_tokens(text: str | None) -> int:
+    """Local token estimate for a comment as sent in the prompt.
+
+    ~4 characters per token for plain text; UTF-8 bytes are used when
+    larger so emoji- and accent-heavy comments are not undercounted.
+    """
+    if not text:
+        return ITEM_OVERHEAD_TOKENS
+    return ITEM_OVERHEAD_TOKENS + math.ceil(max(len(text), len(text.encode("utf-8")) / 2) / 4)
+
+
+class BatchTuner:
+    """Adaptive scale (MIN_SCALE..1) applied to the token budgets."""
+
+    def __init__(self, latency_target: float | None = None):
+        self.latency_target = latency_target or settings.LLM_BATCH_LATENCY_TARGET
+        self.scale = 1.0
+        self._lock = threading.Lock()
+        self.stats = {"batches": 0, "failed_batches": 0, "slow_batches": 0, "latency_total": 0.0}
+
+    def budgets(self) -> tuple[int, int]:
+        """Current (input, output) token budgets."""
+        with self._lock:
+            scale = self.scale
+        return (
+            max(1, int(settings.LLM_INPUT_TOKEN_BUDGET * scale)),
+            max(OUTPUT_TOKENS_PER_COMMENT, int(settings.LLM_OUTPUT_TOKEN_BUDGET * scale)),
+        )
+
+    def record(self, items: int, failed: int, latency: float) -> None:
+        """Feed back one finished batch (``failed`` = items without a result)."""
+        with self._lock:
+            self.stats["batches"] += 1
+            self.stats["latency_total"] += latency
+            if failed:
+                self.stats["failed_batches"] += 1
+                self.scale = max(MIN_SCALE, self.scale * FAILURE_FACTOR)
+            elif latency > self.latency_target:
+                self.stats["slow_batches"] += 1
+                self.scale = max(MIN_SCALE, self.scale * SLOW_FACTOR)
+            else:
+                self.scale = min(1.0, self.scale + RECOVERY_STEP)
+
+
+_tuners: dict[str, BatchTuner] = {}
+_tuners_lock = threading.Lock()
+
+
+def get_batch_tuner(model: str) -> BatchTuner:
+    """Process-wide tuner for ``model``."""
+    with _tuners_lock:
+        if model not in _tuners:
+            _tuners[model] = BatchTuner()
+        return _tuners[model]
+
+
+def next_batch(
+    queue: deque,
+    text_of: Callable[[T], str | None],
+    input_budget: int,
+    output_budget: int,
+    max_items: int | None = None,
+) -> list[T]:
+    """Pop the next batch off the front of ``queue``.
+
+    Always takes at least one item, even if it alone exceeds a budget.
+    """
+    batch: list[T] = []
+    input_tokens = 0
+    while queue:
+        tokens = estimate_text_tokens(text_of(queue[0]))
+        output_tokens = (len(batch) + 1) * OUTPUT_TOKENS_PER_COMMENT
+        if batch and (input_tokens + tokens > input_budget or output_tokens > output_budget):
+            break
+        if max_items is not None and len(batch) >= max_items:
+            break
+        batch.append(queue.popleft())
+        input_tokens += tokens
+    return batch
@@ -0,0 +1,261 @@
+"""
+Bulk comment persistence shared by the platform ingest services.
+
+Instead of one SELECT per incoming comment, the existing
+``platform_comment_id``s of a post are loaded in a single query and the
+incoming rows are written with one executemany INSERT and one bulk UPDATE
+(by primary key) per chunk.
+
+It also holds the incremental sync policy: which listed posts need their
+comments fetched again, and the watermarks (newest post per connection,
+newest comment per post) that let a steady-state sync request only the
+activity since the previous one.
+"""
+
+import hashlib
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import insert, update
+from sqlalchemy.orm import Session
+
+from app.models.comment import Comment
+from app.models.post import Post
+from app.models.social_connection import SocialConnection
+
+# Rows per executemany statement
+WRITE_CHUNK_SIZE = 500
+
+# Posts younger than this are "hot" and re-checked even without a count change
+HOT_POST_AGE = timedelta(hours=48)
+HOT_POST_RECHECK = timedelta(hours=1)
+# Safety net: every post's comments are re-fetched at least this often
+COMMENT_RECHECK_INTERVAL = timedelta(days=7)
+# Extra comments requested past the count delta (deleted comments, count lag)
+WATERMARK_MARGIN = 20
+
+
+def comment_text_hash(text_clean: str | None) -> str:
+    """Dedup key of a comment, always computed from its cleaned text."""
+    return hashlib.sha256((text_clean or "").encode("utf-8")).hexdigest()
+
+
+def bulk_upsert_comments(
+    db: Session,
+    post_id: uuid.UUID,
+    rows: list[dict],
+    update_fields: tuple[str, ...],
+) -> dict:
+    """Insert new comments of a post and refresh ``update_fields`` of known ones.
+
+    Args:
+        db: Database session (not committed here).
+        post_id: Post the comments belong to.
+        rows: Comment column values; each must contain ``platform_comment_id``.
+            New rows get ``post_id`` and ``status="pending"`` filled in.
+        update_fields: Columns overwritten when the comment already exists.
+
+    Returns:
+        Dict with ``inserted`` and ``updated`` counts.
+    """
+    # Last occurrence wins when the source repeats a comment id
+    incoming = {row["platform_comment_id"]: row for row in rows if row.get("platform_comment_id")}
+    if not incoming:
+        return {"inserted": 0, "updated": 0}
+
+    existing_ids = dict(
+        db.query(Comment.platform_comment_id, Comment.id)
+        .filter(Comment.post_id == post_id)
+        .all()
+    )
+
+    to_insert = []
+    to_update = []
+    for platform_comment_id, row in incoming.items():
+        comment_id = existing_ids.get(platform_comment_id)
+        if comment_id is None:
+            to_insert.append({"status": "pending", **row, "post_id": post_id})
+        else:
+            values = {field: row.get(field) for field in update_fields}
+            values["id"] = comment_id
+            to_update.append(values)
+
+    for i in range(0, len(to_insert), WRITE_CHUNK_SIZE):
+        db.execute(insert(Comment), to_insert[i : i + WRITE_CHUNK_SIZE])
+    for i in range(0, len(to_update), WRITE_CHUNK_SIZE):
+        db.execute(update(Comment), to_update[i : i + WRITE_CHUNK_SIZE])
+
+    return {"inserted": len(to_insert), "updated": len(to_update)}
+
+
+def _as_utc(value: datetime) -> datetime:
+    # SQLite hands back naive datetimes; they are stored in UTC
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def needs_comment_refresh(
+    post: Post | None,
+    listed_comment_count: int | None,
+    now: datetime | None = None,
+) -> bool:
+    """Whether a listed post's comments must be fetched again.
+
+    Call before the stored post is updated from the listing. Comments are
+    re-fetched for new posts, when the listing's comment count differs from
+    the stored one, for hot (recent) posts every HOT_POST_RECHECK, and for
+    every post after COMMENT_RECHECK_INTERVAL.
+    """
+    if post is None or post.comments_fetched_at is None:
+        return True
+    if (listed_comment_count or 0) != (post.comment_count or 0):
+        return True
+
+    now = now or datetime.now(timezone.utc)
+    since_fetch = now - _as_utc(post.comments_fetched_at)
+    if since_fetch >= COMMENT_RECHECK_INTERVAL:
+        return True
+    is_hot = post.published_at is not None and now - _as_utc(post.published_at) < HOT_POST_AGE
+    return is_hot and since_fetch >= HOT_POST_RECHECK
+
+
+def _isoformat(value: datetime | None) -> str | None:
+    return _as_utc(value).isoformat() if value else None
+
+
+def _parse_iso(value: str | None) -> datetime | None:
+    return datetime.fromisoformat(value) if value else None
+
+
+def listing_since(connection: SocialConnection, now: datetime | None = None) -> datetime | None:
+    """Oldest publish time a listing of ``connection`` needs to cover.
+
+    Returns None (list everything) until the connection has a cursor and
+    after COMMENT_RECHECK_INTERVAL without a full listing; otherwise posts
+    older than the newest one seen minus HOT_POST_AGE are not re-listed.
+    """
+    cursor = connection.sync_cursor or {}
+    newest_post_at = _parse_iso(cursor.get("newest_post_at"))
+    full_listing_at = _parse_iso(cursor.get("full_listing_at"))
+    if newest_post_at is None or full_listing_at is None:
+        return None
+    now = now or datetime.now(timezone.utc)
+    if now - full_listing_at >= COMMENT_RECHECK_INTERVAL:
+        return None
+    return newest_post_at - HOT_POST_AGE
+
+
+def advance_listing_cursor(
+    connection: SocialConnection,
+    posts: list[Post],
+    since: datetime | None,
+    now: datetime | None = None,
+) -> None:
+    """Move the connection's cursor past the posts of a listing."""
+    cursor = dict(connection.sync_cursor or {})
+    newest = max(
+        (p for p in posts if p.published_at is not None),
+        key=lambda p: _as_utc(p.published_at),
+        default=None,
+    )
+    current = _parse_iso(cursor.get("newest_post_at"))
+    if newest is not None and (current is None or _as_utc(newest.published_at) > current):
+        cursor["newest_post_at"] = _isoformat(newest.published_at)
+        cursor["newest_post_id"] = newest.platform_post_id
+    if since is None:
+        cursor["full_listing_at"] = _isoformat(now or datetime.now(timezone.utc))
+    connection.sync_cursor = cursor
+
+
+def comment_fetch_limit(
+    post: Post | None,
+    listed_comment_count: int | None,
+    max_comments: int,
+    now: datetime | None = None,
+) -> int:
+    """How many comments to request for a post that needs a refresh.
+
+    Call before the stored post is updated from the listing. Without a
+    watermark, or once COMMENT_RECHECK_INTERVAL has passed since the last
+    full fetch, the whole ``max_comments`` window is requested; otherwise
+    only the newest ``count delta + WATERMARK_MARGIN`` comments.
+    """
+    watermark = post.comment_watermark if post is not None else None
+    full_at = _parse_iso((watermark or {}).get("full_at"))
+    now = now or datetime.now(timezone.utc)
+    if full_at is None or now - full_at >= COMMENT_RECHECK_INTERVAL:
+        return max_comments
+    new_comments = max((listed_comment_count or 0) - (post.comment_count or 0), 0)
+    return min(max_comments, new_comments + WATERMARK_MARGIN)
+
+
+def stop_at_watermark(post: Post, rows: list[dict]) -> list[dict]:
+    """Leading rows of a newest-first fetch that are newer than the watermark.
+
+    Stops at the last comment seen (by id) or at the first comment not
+    newer than the last comment time, so only use it on sources that
+    guarantee the order (yt-dlp's "new" sort). Rows are returned unchanged
+    when the post has no watermark.
+    """
+    watermark = post.comment_watermark or {}
+    last_id = watermark.get("last_comment_id")
+    last_at = _parse_iso(watermark.get("last_comment_at"))
+    if last_id is None and last_at is None:
+        return rows
+
+    fresh = []
+    for row in rows:
+        if row.get("platform_comment_id") == last_id:
+            break
+        published_at = row.get("published_at")
+        if last_at is not None and published_at is not None and _as_utc(published_at) <= last_at:
+            break
+        fresh.append(row)
+    return fresh
+
+
+def advance_comment_watermark(
+    post: Post,
+    rows: list[dict],
+    full: bool,
+    now: datetime | None = None,
+    newest_first: bool = True,
+) -> None:
+    """Record the newest comment of a newest-first fetch on ``post``.
+
+    With ``newest_first=False`` (e.g. a fetch sorted by likes) the first row
+    is not the newest comment, so the last comment id is left as it was.
+    """
+    watermark = dict(post.comment_watermark or {})
+    if rows:
+        if newest_first:
+            watermark["last_comment_id"] = rows[0]["platform_comment_id"]
+        timestamps = [_as_utc(r["published_at"]) for r in rows if r.get("published_at")]
+        current = _parse_iso(watermark.get("last_comment_at"))
+        if timestamps and (current is None or max(timestamps) > current):
+            watermark["last_comment_at"] = max(timestamps).isoformat()
+    if full:
+        watermark["full_at"] = _isoformat(now or datetime.now(timezone.utc))
+    post.comment_watermark = watermark
+
+
+def record_comment_fetch(
+    post: Post,
+    rows: list[dict],
+    full: bool,
+    previous_comment_count: int | None,
+    newest_first: bool = True,
+) -> bool:
+    """Mark ``post``'s comments as fetched; returns False for a failed fetch.
+
+    Comment fetchers return no rows when the fetch fails (quota, 429,
+    network). No rows for a post the listing says has comments is treated
+    as a failure: the fetch time and watermark are left alone and the
+    comment count goes back to ``previous_comment_count``, so the next sync
+    still sees the count change and fetches again.
+    """
+    if not rows and post.comment_count:
+        post.comment_count = previous_comment_count or 0
+        return False
+    post.comments_fetched_at = datetime.now(timezone.utc)
+    advance_comment_watermark(post, rows, full=full, newest_first=newest_first)
+    return True
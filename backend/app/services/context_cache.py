@@ -0,0 +1,146 @@
+"""
+Gemini context caching for the stable prefix of analysis prompts.
+
+Every batch of a post repeats the same prefix: the system prompt plus the
+persona, caption and image context. When a post needs several batches the
+prefix is registered once as a Gemini cached content
+(``POST /cachedContents``) and later batches only send their comments and
+reference the cache by name; cached input tokens are billed at a fraction
+of the normal rate and do not have to be re-processed.
+
+Cache names are shared by all workers through Redis, keyed by a hash of the
+model and prefix, and expire a little before the Gemini TTL. Without Redis
+they are kept in process. Prefixes below Gemini's minimum cacheable size
+are not cached.
+"""
+
+import hashlib
+import logging
+import threading
+import time
+from typing import Callable
+
+from app.core.cache import get_redis
+from app.core.config import settings
+from app.services.rate_limiter import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+_KEY_PREFIX = "gemini_cache"
+# Stop handing out a cache this long before Gemini deletes it
+EXPIRY_MARGIN = 60
+
+
+class ContextCache:
+    """Maps prompt prefixes to Gemini cached content names."""
+
+    def __init__(self, ttl: int | None = None, min_tokens: int | None = None):
+        self.ttl = ttl or settings.GEMINI_CACHE_TTL
+        self.min_tokens = settings.GEMINI_CACHE_MIN_TOKENS if min_tokens is None else min_tokens
+        self._local: dict[str, tuple[str, float]] = {}
+        self._lock = threading.Lock()
+        self._creating: dict[str, threading.Lock] = {}
+        self.stats = {"created": 0, "hits": 0, "skipped": 0, "invalidated": 0, "errors": 0}
+
+    def key(self, model: str, prefix: str) -> str:
+        digest = hashlib.sha256(f"{model}\n{prefix}".encode("utf-8")).hexdigest()[:32]
+        return f"{_KEY_PREFIX}:{digest}"
+
+    def resolve(self, model: str, prefix: str, create: Callable[[], str]) -> str | None:
+        """Name of the cache holding ``prefix``, created with ``create`` if needed.
+
+        Returns None when the prefix is too small to cache or creation
+        failed; the caller then sends the full prompt.
+        """
+        if estimate_tokens(prefix) < self.min_tokens:
+            self._count("skipped")
+            return None
+        key = self.key(model, prefix)
+        name = self._get(key)
+        if name:
+            self._count("hits")
+            return name
+
+        # One creation per prefix in this process; concurrent batches wait
+        with self._lock:
+            creating = self._creating.setdefault(key, threading.Lock())
+        with creating:
+            try:
+                return self._create(key, create)
+            finally:
+                # Waiters already hold a reference; later callers find the name
+                with self._lock:
+                    if self._creating.get(key) is creating:
+                        del self._creating[key]
+
+    def _create(self, key: str, create: Callable[[], str]) -> str | None:
+        name = self._get(key)
+        if name:
+            self._count("hits")
+            return name
+        try:
+            name = create()
+        except Exception:
+            logger.warning("Could not create Gemini context cache", exc_info=True)
+            self._count("errors")
+            return None
+        self._put(key, name)
+        self._count("created")
+        return name
+
+    def invalidate(self, model: str, prefix: str) -> None:
+        """Forget the cache of ``prefix`` (expired or deleted on Gemini's side)."""
+        key = self.key(model, prefix)
+        self._count("invalidated")
+        with self._lock:
+            self._local.pop(key, None)
+        r = get_redis()
+        if r is not None:
+            try:
+                r.delete(key)
+            except Exception:
+                pass
+
+    def _get(self, key: str) -> str | None:
+        r = get_redis()
+        if r is not None:
+            try:
+                name = r.get(key)
+                if name:
+                    return name
+            except Exception:
+                pass
+        # Also holds names whose Redis write failed
+        with self._lock:
+            name, expires_at = self._local.get(key, (None, 0.0))
+        return name if expires_at > time.monotonic() else None
+
+    def _put(self, key: str, name: str) -> None:
+        lifetime = max(1, self.ttl - EXPIRY_MARGIN)
+        r = get_redis()
+        if r is not None:
+            try:
+                r.set(key, name, ex=lifetime)
+                return
+            except Exception:
+                pass
+        with self._lock:
+            self._local[key] = (name, time.monotonic() + lifetime)
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self.stats[name] += 1
+
+
+_context_cache: ContextCache | None = None
+_context_cache_lock = threading.Lock()
+
+
+def get_context_cache() -> ContextCache:
+    """Process-wide context cache registry."""
+    global _context_cache
+    if _context_cache is None:
+        with _context_cache_lock:
+            if _context_cache is None:
+                _context_cache = ContextCache()
+    return _context_cache
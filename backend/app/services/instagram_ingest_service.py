@@ -4,16 +4,24 @@ Instagram data ingestion service (public scraping mode).
 Similar to youtube_service.py but for Instagram.
 """
 
-import hashlib
 import logging
+import uuid
 from datetime import date, datetime, timezone
-from typing import Optional
+from typing import Callable, Optional
 
 from sqlalchemy.orm import Session
 
-from app.models.comment import Comment
 from app.models.post import Post
 from app.models.social_connection import SocialConnection
+from app.services.comment_ingest_service import (
+    advance_listing_cursor,
+    bulk_upsert_comments,
+    comment_fetch_limit,
+    comment_text_hash,
+    listing_since,
+    needs_comment_refresh,
+    record_comment_fetch,
+)
 from app.services.media_cache_service import cache_remote_image
 from app.services.instagram_scrape_service import (
     fetch_post_comments,
@@ -22,6 +30,17 @@ from app.services.instagram_scrape_service import (
 
 logger = logging.getLogger(__name__)
 
+COMMENT_UPDATE_FIELDS = (
+    "author_username",
+    "author_name",
+    "like_count",
+    "published_at",
+    "text_original",
+    "text_clean",
+    "text_hash",
+    "raw_payload",
+)
+
 
 def _parse_timestamp(value: str | None) -> datetime | None:
     if not value:
@@ -42,6 +61,7 @@ def ingest_instagram_profile(
     max_posts: int = 10,
     max_comments_per_post: int = 100,
     since_date: Optional[date] = None,
+    on_post_ingested: Optional[Callable[[uuid.UUID], None]] = None,
 ) -> dict:
     """
     Ingest recent posts and comments from an Instagram profile.
@@ -51,6 +71,10 @@ def ingest_instagram_profile(
         connection: SocialConnection instance
         max_posts: Maximum posts to fetch
         max_comments_per_post: Max comments per post
+        since_date: Skip posts published before this date (defaults to
+            the connection's listing cursor)
+        on_post_ingested: Called with each post id right after the post
+            and its comments are committed
 
     Returns:
         Dict with stats: posts_fetched, comments_fetched
@@ -61,17 +85,25 @@ def ingest_instagram_profile(
         "posts_updated": 0,
         "comments_fetched": 0,
         "comments_updated": 0,
+        "posts_skipped": 0,
         "errors": [],
     }
 
     try:
+        since = listing_since(connection)
+        if since_date is not None:
+            since = datetime.combine(since_date, datetime.min.time(), tzinfo=timezone.utc)
         posts_data = fetch_recent_posts(
             username,
             max_posts=max_posts,
-            since_date=since_date,
+            since_date=since,
         )
 
+        listed = []
         for post_data in posts_data:
+            published_at = _parse_timestamp(post_data.get("timestamp"))
+            if since is not None and published_at is not None and published_at < since:
+                continue
             try:
                 post = (
                     db.query(Post)
@@ -81,6 +113,11 @@ def ingest_instagram_profile(
                     )
                     .first()
                 )
+                refresh_comments = needs_comment_refresh(post, post_data.get("comment_count"))
+                fetch_limit = comment_fetch_limit(
+                    post, post_data.get("comment_count"), max_comments_per_post
+                )
+                previous_comment_count = post.comment_count if post else 0
 
                 if post:
                     media_url = post_data.get("media_url")
@@ -96,7 +133,7 @@ def ingest_instagram_profile(
                     post.like_count = post_data.get("like_count", 0) or 0
                     post.comment_count = post_data.get("comment_count", 0) or 0
                     post.view_count = post_data.get("view_count", 0) or 0
-                    post.published_at = _parse_timestamp(post_data.get("timestamp"))
+                    post.published_at = published_at
                     post.post_url = post_data.get("permalink")
                     post.raw_payload = post_data
                     post.fetched_at = datetime.now(timezone.utc)
@@ -119,7 +156,7 @@ def ingest_instagram_profile(
                         like_count=post_data.get("like_count", 0) or 0,
                         comment_count=post_data.get("comment_count", 0) or 0,
                         view_count=post_data.get("view_count", 0) or 0,
-                        published_at=_parse_timestamp(post_data.get("timestamp")),
+                        published_at=published_at,
                         post_url=post_data.get("permalink"),
                         raw_payload=post_data,
                         fetched_at=datetime.now(timezone.utc),
@@ -127,72 +164,61 @@ def ingest_instagram_profile(
                     db.add(post)
                     db.flush()
                     stats["posts_fetched"] += 1
+                listed.append(post)
+
+                if not refresh_comments:
+                    # Listing unchanged: no comment fetch (a billed XPoz job)
+                    stats["posts_skipped"] += 1
+                    db.commit()
+                    continue
 
                 comments_data = fetch_post_comments(
                     post_data["platform_post_id"],
-                    max_comments=max_comments_per_post,
+                    max_comments=fetch_limit,
                 )
 
+                comment_rows = []
                 for comment_data in comments_data:
-                    try:
-                        platform_comment_id = str(
-                            comment_data.get("platform_comment_id", "")
-                        ).strip()
-                        if not platform_comment_id:
-                            continue
-
-                        text_original = (comment_data.get("text") or "").strip()
-                        text_hash = hashlib.sha256(
-                            text_original.encode("utf-8")
-                        ).hexdigest()
-
-                        existing_comment = (
-                            db.query(Comment)
-                            .filter(
-                                Comment.post_id == post.id,
-                                Comment.platform_comment_id == platform_comment_id,
-                            )
-                            .first()
-                        )
-
-                        if existing_comment:
-                            existing_comment.author_username = comment_data.get("username")
-                            existing_comment.author_name = comment_data.get("username")
-                            existing_comment.like_count = (
-                                comment_data.get("like_count", 0) or 0
-                            )
-                            existing_comment.published_at = _parse_timestamp(
-                                comment_data.get("timestamp")
-                            ) or post.published_at
-                            existing_comment.text_original = text_original
-                            existing_comment.text_clean = text_original
-                            existing_comment.text_hash = text_hash
-                            existing_comment.raw_payload = comment_data
-                            stats["comments_updated"] += 1
-                            continue
-
-                        comment = Comment(
-                            post_id=post.id,
-                            connection_id=connection.id,
-                            platform="instagram",
-                            platform_comment_id=platform_comment_id,
-                            source_type="comment",
-                            author_username=comment_data.get("username"),
-                            author_name=comment_data.get("username"),
-                            like_count=comment_data.get("like_count", 0) or 0,
-                            published_at=_parse_timestamp(comment_data.get("timestamp")) or post.published_at,
-                            text_original=text_original,
-                            text_clean=text_original,
-                            text_hash=text_hash,
-                            status="pending",
-                            raw_payload=comment_data,
-                        )
-                        db.add(comment)
-                        stats["comments_fetched"] += 1
-
-                    except Exception as exc:
-                        logger.error("Error saving comment: %s", exc)
-                        stats["errors"].append(str(exc))
+                    platform_comment_id = str(
+                        comment_data.get("platform_comment_id", "")
+                    ).strip()
+                    if not platform_comment_id:
+                        continue
+
+                    text_original = (comment_data.get("text") or "").strip()
+                    text_clean = text_original
+                    comment_rows.append({
+                        "connection_id": connection.id,
+                        "platform": "instagram",
+                        "platform_comment_id": platform_comment_id,
+                        "source_type": "comment",
+                        "author_username": comment_data.get("username"),
+                        "author_name": comment_data.get("username"),
+                        "like_count": comment_data.get("like_count", 0) or 0,
+                        "published_at": _parse_timestamp(comment_data.get("timestamp")) or post.published_at,
+                        "text_original": text_original,
+                        "text_clean": text_clean,
+                        "text_hash": comment_text_hash(text_clean),
+                        "raw_payload": comment_data,
+                    })
+
+                full_fetch = fetch_limit == max_comments_per_post
+                written = bulk_upsert_comments(
+                    db, post.id, comment_rows, COMMENT_UPDATE_FIELDS
+                )
+                stats["comments_fetched"] += written["inserted"]
+                stats["comments_updated"] += written["updated"]
+                if not record_comment_fetch(
+                    post, comment_rows, full_fetch, previous_comment_count
+                ):
+                    logger.warning(
+                        "No comments fetched for post %s; retrying next sync",
+                        post_data["platform_post_id"],
+                    )
+
+                db.commit()
+                if on_post_ingested:
+                    on_post_ingested(post.id)
 
             except Exception as exc:
                 logger.error(
@@ -202,6 +228,7 @@ def ingest_instagram_profile(
                 )
                 stats["errors"].append(str(exc))
 
+        advance_listing_cursor(connection, listed, since)
         db.commit()
         logger.info(
             "Instagram ingestion complete for @%s: %s new posts, %s updated posts, "
@@ -120,13 +120,20 @@ def create_instagram_connection(db: Session, user_id: str, username: str) -> Opt
     return conn
 
 def fetch_recent_posts(username: str, max_posts: int = 10, since_date=None) -> list[dict]:
-    """Fetch recent posts using XPoz getInstagramPostsByUser, parsed by LLM."""
+    """Fetch recent posts using XPoz getInstagramPostsByUser, parsed by LLM.
+
+    ``since_date`` asks for posts published on or after it only; XPoz has
+    no cursor parameter, so callers still filter the result.
+    """
     username = username.replace("@", "")
+    prompt = f"Get {max_posts} recent posts from instagram user {username}"
+    if since_date:
+        prompt += f" published on or after {since_date.isoformat()}"
     res = _xpoz_call("getInstagramPostsByUser", {
         "identifier": username,
         "identifierType": "username",
         "limit": max_posts,
-        "userPrompt": f"Get {max_posts} recent posts from instagram user {username}"
+        "userPrompt": prompt
     })
     
     text = res.get("text", "")
@@ -156,7 +163,7 @@ def fetch_post_comments(post_id: str, max_comments: int = 100) -> list[dict]:
     res = _xpoz_call("getInstagramCommentsByPostId", {
         "postId": post_id,
         "limit": max_comments,
-        "userPrompt": f"Get comments for instagram post {post_id}"
+        "userPrompt": f"Get comments for instagram post {post_id}, newest first"
     }, async_poll=True)
     
     text = res.get("text", "")
@@ -3,10 +3,10 @@ import logging
 from urllib.parse import urlencode
 from datetime import datetime, timezone, timedelta
 
-import httpx
 from sqlalchemy.orm import Session
 
 from app.core.config import settings
+from app.core.http import shared_async_client
 from app.core.security import encrypt_token, decrypt_token
 from app.models.social_connection import SocialConnection
 
@@ -164,7 +164,7 @@ async def fetch_user_posts(
         "access_token": access_token,
     }
 
-    async with httpx.AsyncClient(timeout=30.0) as client:
+    async with shared_async_client("instagram_graph") as client:
         response = await client.get(url, params=params)
         if response.status_code != 200:
             logger.error(
@@ -215,7 +215,7 @@ async def fetch_post_comments(
 
     all_comments: list[dict] = []
 
-    async with httpx.AsyncClient(timeout=30.0) as client:
+    async with shared_async_client("instagram_graph") as client:
         while url and len(all_comments) < limit:
             response = await client.get(url, params=params)
             if response.status_code != 200:
@@ -276,7 +276,7 @@ async def refresh_long_lived_token(access_token: str) -> dict:
         "access_token": access_token,
     }
 
-    async with httpx.AsyncClient(timeout=30.0) as client:
+    async with shared_async_client("instagram_graph") as client:
         response = await client.get(url, params=params)
         if response.status_code != 200:
             logger.error(
@@ -311,7 +311,7 @@ async def _exchange_code_for_short_token(code: str) -> str:
         "code": code,
     }
 
-    async with httpx.AsyncClient(timeout=30.0) as client:
+    async with shared_async_client("instagram_graph") as client:
         response = await client.post(INSTAGRAM_TOKEN_URL, data=payload)
         if response.status_code != 200:
             logger.error(
@@ -340,7 +340,7 @@ async def _exchange_for_long_lived_token(short_lived_token: str) -> dict:
         "access_token": short_lived_token,
     }
 
-    async with httpx.AsyncClient(timeout=30.0) as client:
+    async with shared_async_client("instagram_graph") as client:
         response = await client.get(url, params=params)
         if response.status_code != 200:
             logger.error(
@@ -371,7 +371,7 @@ async def _fetch_user_profile(access_token: str) -> dict:
         "access_token": access_token,
     }
 
-    async with httpx.AsyncClient(timeout=30.0) as client:
+    async with shared_async_client("instagram_graph") as client:
         response = await client.get(url, params=params)
         if response.status_code != 200:
             logger.error(
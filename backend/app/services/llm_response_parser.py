@@ -0,0 +1,81 @@
+"""
+Tolerant, incremental parser for batched LLM answers.
+
+The analysis call answers with one JSON object holding a single result
+array (``{"r": [...]}``, or ``{"items": [...]}`` in the legacy format).
+Instead of decoding the whole document at once, ``ResultArrayParser``
+decodes the array one element at a time as text arrives, so complete
+elements are kept when the answer is truncated (output token limit,
+dropped connection) or when one element is malformed. Markdown fences or
+chatter around the object are ignored.
+"""
+
+import json
+import re
+
+_ARRAY_START = re.compile(r'"(?:r|items)"\s*:\s*\[')
+# Boundary between two elements, used to skip past a malformed one
+_NEXT_ELEMENT = re.compile(r"[\]}]\s*,\s*(?=[\[{])")
+_SEPARATORS = " \t\r\n,"
+
+_decoder = json.JSONDecoder()
+
+
+class ResultArrayParser:
+    """Extracts the complete elements of the result array, chunk by chunk."""
+
+    def __init__(self):
+        self._buffer = ""
+        self._pos: int | None = None
+        self.found = False
+        self.complete = False
+        self.skipped = 0
+
+    def feed(self, chunk: str) -> list:
+        """Add text; returns the elements completed by it."""
+        self._buffer += chunk
+        if self._pos is None:
+            match = _ARRAY_START.search(self._buffer)
+            if match is None:
+                return []
+            self.found = True
+            self._pos = match.end()
+
+        elements = []
+        while not self.complete:
+            pos = self._pos
+            while pos < len(self._buffer) and self._buffer[pos] in _SEPARATORS:
+                pos += 1
+            if pos >= len(self._buffer):
+                break
+            if self._buffer[pos] == "]":
+                self.complete = True
+                self._pos = pos + 1
+                break
+            try:
+                element, self._pos = _decoder.raw_decode(self._buffer, pos)
+            except json.JSONDecodeError:
+                # Most likely an element still being written
+                break
+            elements.append(element)
+        return elements
+
+    def close(self) -> list:
+        """End of input: salvages complete elements after a malformed one."""
+        elements = []
+        while self.found and not self.complete:
+            match = _NEXT_ELEMENT.search(self._buffer, self._pos)
+            if match is None:
+                break
+            self.skipped += 1
+            self._pos = match.end()
+            elements.extend(self.feed(""))
+        return elements
+
+
+def parse_result_array(content: str) -> tuple[list, ResultArrayParser]:
+    """Parses a whole answer; the parser tells whether it was complete."""
+    parser = ResultArrayParser()
+    elements = parser.feed(content)
+    elements += parser.close()
+    return elements, parser
@@ -2,7 +2,7 @@ import hashlib
 import mimetypes
 from pathlib import Path
 
-import httpx
+from app.core.http import get_http_client
 
 BASE_DIR = Path(__file__).resolve().parent.parent.parent.parent
 CACHE_DIR = BASE_DIR / "output" / "media_cache"
@@ -41,29 +41,18 @@ def cache_remote_image(url: str) -> Path | None:
         return existing
 
     try:
-        with httpx.Client(
-            timeout=20.0,
-            follow_redirects=True,
-            headers={
-                "User-Agent": (
-                    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-                    "AppleWebKit/537.36 (KHTML, like Gecko) "
-                    "Chrome/125.0.0.0 Safari/537.36"
-                )
-            },
-        ) as client:
-            response = client.get(url)
-            if response.status_code != 200:
-                return None
-
-            content_type = response.headers.get("content-type")
-            if not content_type or not content_type.startswith("image/"):
-                return None
-
-            ext = _extension_from_content_type(content_type, url)
-            target = CACHE_DIR / f"{key}{ext}"
-            target.write_bytes(response.content)
-            return target
+        response = get_http_client("media").get(url)
+        if response.status_code != 200:
+            return None
+
+        content_type = response.headers.get("content-type")
+        if not content_type or not content_type.startswith("image/"):
+            return None
+
+        ext = _extension_from_content_type(content_type, url)
+        target = CACHE_DIR / f"{key}{ext}"
+        target.write_bytes(response.content)
+        return target
     except Exception:
         return None
 
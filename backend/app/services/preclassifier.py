@@ -0,0 +1,173 @@
+"""
+Local pre-classification of trivial comments.
+
+A large share of comments carries no more than a reaction: emoji only
+("👏👏"), one word ("lindo", "top", "kkkk"), tags of other users, or
+nothing at all after cleaning. These are scored deterministically from a
+small lexicon, on the CPU, into the same result shape the LLM returns and
+stored under their own ``model`` tag (``LOCAL_MODEL``). Anything the
+lexicon does not fully cover (unknown emoji or words, more than one word,
+mixed positive and negative signals) is ambiguous and left for Gemini.
+"""
+
+import re
+import unicodedata
+from collections import Counter
+
+# Bump the suffix whenever the lexicon or the scoring changes
+LOCAL_MODEL = "local-lexicon-v1"
+
+# Confidence of lexicon scores and of empty / tag-only comments
+LEXICON_CONFIDENCE = 0.8
+TRIVIAL_CONFIDENCE = 0.9
+
+# Emoji -> (polarity, emotion). Emoji whose meaning depends on context
+# (😭, 🙄, 😱, 🤔, ...) are deliberately missing.
+EMOJI_LEXICON = {
+    "😍": (0.9, "alegria"), "🥰": (0.9, "alegria"), "😘": (0.8, "alegria"),
+    "❤": (0.8, "alegria"), "♥": (0.8, "alegria"), "💖": (0.8, "alegria"),
+    "💕": (0.8, "alegria"), "💗": (0.8, "alegria"), "💓": (0.8, "alegria"),
+    "💞": (0.8, "alegria"), "💘": (0.8, "alegria"), "💙": (0.7, "alegria"),
+    "💚": (0.7, "alegria"), "💛": (0.7, "alegria"), "💜": (0.7, "alegria"),
+    "🧡": (0.7, "alegria"), "🤍": (0.7, "alegria"), "🖤": (0.6, "alegria"),
+    "😊": (0.7, "alegria"), "☺": (0.7, "alegria"), "😁": (0.7, "alegria"),
+    "😀": (0.6, "alegria"), "😃": (0.7, "alegria"), "😄": (0.7, "alegria"),
+    "🤩": (0.9, "alegria"), "🥳": (0.8, "alegria"), "😂": (0.6, "alegria"),
+    "🤣": (0.6, "alegria"), "😆": (0.6, "alegria"), "👏": (0.8, "alegria"),
+    "🙌": (0.8, "alegria"), "👍": (0.6, "alegria"), "💯": (0.8, "alegria"),
+    "🔥": (0.8, "alegria"), "✨": (0.6, "alegria"), "🌟": (0.7, "alegria"),
+    "⭐": (0.6, "alegria"), "💪": (0.7, "alegria"), "🙏": (0.6, "alegria"),
+    "🎉": (0.8, "alegria"), "👑": (0.7, "alegria"), "🌹": (0.6, "alegria"),
+    "😡": (-0.9, "raiva"), "🤬": (-0.9, "raiva"), "😠": (-0.8, "raiva"),
+    "👎": (-0.7, "raiva"), "💩": (-0.8, "nojo"), "🤮": (-0.9, "nojo"),
+    "🤢": (-0.8, "nojo"), "😢": (-0.6, "tristeza"), "😞": (-0.6, "tristeza"),
+    "😔": (-0.5, "tristeza"), "💔": (-0.7, "tristeza"), "😒": (-0.5, "raiva"),
+}
+
+# Single words (lowercase, no accents, repeated letters collapsed)
+WORD_LEXICON = {
+    **dict.fromkeys(
+        ["lindo", "linda", "lindos", "lindas", "lindeza", "top", "perfeito",
+         "perfeita", "maravilhoso", "maravilhosa", "maravilha", "amei", "amo",
+         "incrivel", "show", "sensacional", "espetacular", "demais", "parabens",
+         "lacrou", "arrasou", "arrasa", "diva", "massa", "excelente", "otimo",
+         "otima", "sucesso", "obrigado", "obrigada", "amem", "fofo", "fofa",
+         "love", "uau", "bravo", "apaixonada", "apaixonado", "maravilindo",
+         "delicia", "bonito", "bonita", "lindissimo", "lindissima"],
+        (0.8, "alegria"),
+    ),
+    **dict.fromkeys(
+        ["horrivel", "pessimo", "pessima", "ridiculo", "ridicula", "lixo",
+         "vergonha", "nojento", "nojenta", "odeio", "decepcionante", "fraude",
+         "golpe", "golpista", "mentiroso", "mentirosa", "palhacada", "porcaria",
+         "vergonhoso", "horroroso", "horrorosa"],
+        (-0.8, "raiva"),
+    ),
+    **dict.fromkeys(["triste", "decepcao"], (-0.6, "tristeza")),
+    **dict.fromkeys(["ok", "oi", "ola", "primeiro", "primeira"], (0.0, "neutro")),
+}
+
+# Neutral one-word questions, with the topic they raise
+QUESTION_WORDS = {
+    "link": "link",
+    "preco": "preço",
+    "valor": "preço",
+    "quanto": "preço",
+    "onde": "onde comprar",
+    "tamanho": "tamanho",
+    "cupom": "cupom",
+}
+
+_MENTION = re.compile(r"@[\w.]+")
+_LAUGHTER = re.compile(r"^(?:k{2,}|(?:ha|he|hu|hi){2,}h?|(?:rs){2,}|(?:ksk|kks)[ks]*)$")
+_REPEATED = re.compile(r"(\w)\1{2,}")
+# Emoji presentation modifiers: variation selectors and skin tones
+_MODIFIERS = re.compile("[\ufe0e\ufe0f\U0001f3fb-\U0001f3ff]")
+
+
+def _strip_accents(word: str) -> str:
+    word = unicodedata.normalize("NFKD", word.lower())
+    return "".join(ch for ch in word if not unicodedata.combining(ch))
+
+
+def _result(score, polarity, intensity, emotions, topics, summary, confidence) -> dict:
+    return {
+        "score_0_10": score,
+        "polarity": polarity,
+        "intensity": intensity,
+        "emotions": emotions,
+        "topics": topics,
+        "sarcasm": False,
+        "summary_pt": summary,
+        "confidence": confidence,
+        "tokens_in": 0,
+        "tokens_out": 0,
+        "cost_estimate_usd": 0.0,
+        "raw_llm_response": None,
+    }
+
+
+def preclassify(text: str | None) -> dict | None:
+    """Local result for a trivial comment, or None when it is ambiguous."""
+    text = (text or "").strip()
+    rest = _MENTION.sub(" ", text)
+    tagged = rest != text
+    rest = _MODIFIERS.sub("", rest)
+
+    words: list[str] = []
+    signals: list[tuple[float, str]] = []
+    for token in rest.split():
+        letters = "".join(ch for ch in token if ch.isalnum())
+        if letters:
+            words.append(letters)
+        for ch in token:
+            if ch.isalnum():
+                continue
+            if ch in EMOJI_LEXICON:
+                signals.append(EMOJI_LEXICON[ch])
+            elif unicodedata.category(ch)[0] != "P":
+                # Unknown emoji, symbol or emoji sequence (ZWJ)
+                return None
+
+    if not words and not signals:
+        if tagged:
+            return _result(5.0, 0.0, 0.1, ["neutro"], ["marcação"], "Marca outros usuários", TRIVIAL_CONFIDENCE)
+        return _result(5.0, 0.0, 0.0, ["neutro"], [], "Comentário sem texto", TRIVIAL_CONFIDENCE)
+    if len(words) > 1:
+        return None
+
+    topics: list[str] = []
+    summary = None
+    if words:
+        word = _strip_accents(words[0])
+        if word.isdigit():
+            return None
+        if _LAUGHTER.match(word):
+            signals.append((0.6, "alegria"))
+            topics, summary = ["humor"], "Reação de riso"
+        elif (word := _REPEATED.sub(r"\1", word)) in WORD_LEXICON:
+            signals.append(WORD_LEXICON[word])
+        elif word in QUESTION_WORDS:
+            signals.append((0.0, "neutro"))
+            topics, summary = [QUESTION_WORDS[word]], f"Pergunta sobre {QUESTION_WORDS[word]}"
+        else:
+            return None
+
+    polarities = [polarity for polarity, _ in signals]
+    if max(polarities) > 0 and min(polarities) < 0:
+        # Mixed signals: leave it to the LLM
+        return None
+
+    polarity = round(sum(polarities) / len(polarities), 2)
+    if summary is None:
+        if polarity > 0:
+            summary = "Reação positiva curta"
+        elif polarity < 0:
+            summary = "Reação negativa curta"
+        else:
+            summary = "Reação neutra curta"
+    emotions = [emotion for emotion, _ in Counter(e for _, e in signals).most_common(2)]
+    intensity = 0.0 if polarity == 0 else round(min(1.0, abs(polarity) * (0.5 + 0.1 * len(signals))), 2)
+    return _result(
+        round(5 + 5 * polarity, 1), polarity, intensity, emotions, topics, summary, LEXICON_CONFIDENCE
+    )
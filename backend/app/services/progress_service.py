@@ -0,0 +1,63 @@
+"""
+Pipeline run progress events over Redis pub/sub.
+
+Workers publish a snapshot of the run on ``pipeline_run:<run_id>`` every
+time they commit progress; the SSE endpoint subscribes to that channel and
+forwards events as they arrive instead of polling ``PipelineRun``.
+Publishing is best effort: without Redis the SSE endpoint falls back to
+periodic database reads.
+"""
+
+import json
+import logging
+import uuid
+
+import redis.asyncio as aioredis
+
+from app.core.cache import get_redis
+from app.core.config import settings
+from app.models.pipeline_run import PipelineRun
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATUSES = ("completed", "failed", "partial")
+
+
+def run_channel(run_id: uuid.UUID | str) -> str:
+    return f"pipeline_run:{run_id}"
+
+
+def run_progress(run: PipelineRun) -> dict:
+    """Progress payload sent to the browser for a run."""
+    progress_data = {
+        "status": run.status,
+        "posts_fetched": run.posts_fetched or 0,
+        "comments_fetched": run.comments_fetched or 0,
+        "comments_analyzed": run.comments_analyzed or 0,
+        "errors_count": run.errors_count or 0,
+    }
+
+    # Parse notes for detailed progress
+    if run.notes:
+        try:
+            progress_data.update(json.loads(run.notes))
+        except (json.JSONDecodeError, TypeError):
+            progress_data["notes"] = run.notes
+
+    return progress_data
+
+
+def publish_run_progress(run: PipelineRun) -> None:
+    """Publish the current state of ``run`` (call after committing it)."""
+    r = get_redis()
+    if r is None:
+        return
+    try:
+        r.publish(run_channel(run.id), json.dumps(run_progress(run)))
+    except Exception:
+        logger.warning("Could not publish progress for run %s", run.id, exc_info=True)
+
+
+def get_async_redis() -> aioredis.Redis:
+    """Async client for subscribers (one per SSE connection)."""
+    return aioredis.from_url(settings.CELERY_BROKER_URL, decode_responses=True)
@@ -0,0 +1,313 @@
+"""
+Gemini rate limiting shared by every worker.
+
+Two token buckets per model, one for requests/min and one for tokens/min,
+live in Redis and are checked and debited atomically by a Lua script, so
+all Celery workers and the API draw from the same quota. Callers reserve
+an estimate before each call and settle it with the real usage afterwards;
+a 429 pauses the model for every worker instead of each one retrying on
+its own schedule.
+
+Without Redis the same buckets are kept in process (each process then
+assumes it has the whole quota).
+"""
+
+import logging
+import random
+import threading
+import time
+
+from app.core.cache import get_redis
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Seconds before retrying Redis after it was found unavailable
+REDIS_RETRY_INTERVAL = 30
+# Upper bound for a single sleep while waiting for the buckets
+MAX_SLEEP = 5.0
+
+_KEY_PREFIX = "gemini_rl"
+
+# KEYS: requests bucket, tokens bucket, cooldown, metrics hash
+# ARGV: op ("acquire" | "settle" | "cooldown"), rpm, tpm, amount,
+#       ms already waited by this acquire
+# acquire -> ms to wait (0 = granted); settle/cooldown -> 0
+# Cluster counters are updated in the same call (no extra round trip).
+_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local op = ARGV[1]
+local rpm = tonumber(ARGV[2])
+local tpm = tonumber(ARGV[3])
+local amount = tonumber(ARGV[4])
+local waited = tonumber(ARGV[5] or '0')
+
+local function level(key, capacity)
+  local b = redis.call('HMGET', key, 'tokens', 'ts')
+  local tokens = tonumber(b[1]) or capacity
+  local ts = tonumber(b[2]) or now
+  return math.min(capacity, tokens + (now - ts) * capacity / 60000)
+end
+
+local function store(key, tokens)
+  redis.call('HSET', key, 'tokens', tokens, 'ts', now)
+  redis.call('PEXPIRE', key, 120000)
+end
+
+if op == 'cooldown' then
+  redis.call('HINCRBY', KEYS[4], 'rate_limited', 1)
+  local until_ms = now + amount
+  local current = tonumber(redis.call('GET', KEYS[3]) or '0')
+  if until_ms > current then
+    redis.call('SET', KEYS[3], until_ms, 'PX', amount)
+  end
+  return 0
+end
+
+if op == 'settle' then
+  store(KEYS[2], level(KEYS[2], tpm) + amount)
+  return 0
+end
+
+local cooldown = tonumber(redis.call('GET', KEYS[3]) or '0')
+if cooldown > now then
+  return cooldown - now
+end
+
+local requests = level(KEYS[1], rpm)
+local tokens = level(KEYS[2], tpm)
+local wait = 0
+if requests < 1 then
+  wait = math.max(wait, (1 - requests) * 60000 / rpm)
+end
+if tokens < amount then
+  wait = math.max(wait, (amount - tokens) * 60000 / tpm)
+end
+if wait > 0 then
+  return math.ceil(wait)
+end
+store(KEYS[1], requests - 1)
+store(KEYS[2], tokens - amount)
+redis.call('HINCRBY', KEYS[4], 'requests', 1)
+redis.call('HINCRBY', KEYS[4], 'tokens_reserved', amount)
+if waited > 0 then
+  redis.call('HINCRBY', KEYS[4], 'throttled', 1)
+  redis.call('HINCRBYFLOAT', KEYS[4], 'wait_seconds', waited / 1000)
+end
+return 0
+"""
+
+
+class RateLimitTimeout(Exception):
+    """The buckets did not free up within ``max_wait``."""
+
+
+class _LocalBuckets:
+    """In-process version of the Redis script (same arithmetic)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._levels: dict[str, tuple[float, float]] = {}
+        self._cooldown: dict[str, float] = {}
+
+    def _level(self, key: str, capacity: float, now: float) -> float:
+        tokens, ts = self._levels.get(key, (capacity, now))
+        return min(capacity, tokens + (now - ts) * capacity / 60)
+
+    def call(self, keys: tuple[str, str, str], op: str, rpm: int, tpm: int, amount: float) -> float:
+        """Same contract as the script, in seconds."""
+        requests_key, tokens_key, cooldown_key = keys
+        now = time.monotonic()
+        with self._lock:
+            if op == "cooldown":
+                self._cooldown[cooldown_key] = max(self._cooldown.get(cooldown_key, 0), now + amount)
+                return 0
+            if op == "settle":
+                self._levels[tokens_key] = (self._level(tokens_key, tpm, now) + amount, now)
+                return 0
+
+            cooldown = self._cooldown.get(cooldown_key, 0)
+            if cooldown > now:
+                return cooldown - now
+            requests = self._level(requests_key, rpm, now)
+            tokens = self._level(tokens_key, tpm, now)
+            wait = 0.0
+            if requests < 1:
+                wait = max(wait, (1 - requests) * 60 / rpm)
+            if tokens < amount:
+                wait = max(wait, (amount - tokens) * 60 / tpm)
+            if wait > 0:
+                return wait
+            self._levels[requests_key] = (requests - 1, now)
+            self._levels[tokens_key] = (tokens - amount, now)
+            return 0
+
+
+class GeminiRateLimiter:
+    """Requests/min and tokens/min buckets per Gemini model."""
+
+    def __init__(self, rpm: int | None = None, tpm: int | None = None):
+        self.rpm = rpm or settings.GEMINI_RPM
+        self.tpm = tpm or settings.GEMINI_TPM
+        self._local = _LocalBuckets()
+        self._script = None
+        self._redis_checked_at = 0.0
+        self._metrics_lock = threading.Lock()
+        self._metrics = {
+            "requests": 0,
+            "tokens_reserved": 0,
+            "throttled": 0,
+            "wait_seconds": 0.0,
+            "rate_limited": 0,
+            "local_fallback": 0,
+        }
+
+    # -- Redis access ------------------------------------------------------
+
+    def _redis(self):
+        if self._script is None and time.monotonic() - self._redis_checked_at >= REDIS_RETRY_INTERVAL:
+            self._redis_checked_at = time.monotonic()
+            r = get_redis()
+            if r is not None:
+                self._script = r.register_script(_SCRIPT)
+        return self._script
+
+    def _call(self, model: str, op: str, amount: float, waited: float = 0.0) -> float:
+        """Run ``op`` on the model's buckets; returns seconds to wait.
+
+        ``waited`` (s) is the time the acquire already spent throttled; it
+        goes into the cluster counters once the acquire is granted.
+        """
+        keys = (
+            f"{_KEY_PREFIX}:{model}:requests",
+            f"{_KEY_PREFIX}:{model}:tokens",
+            f"{_KEY_PREFIX}:{model}:cooldown",
+        )
+        script = self._redis()
+        if script is not None:
+            try:
+                if op == "cooldown":
+                    amount = amount * 1000
+                return script(
+                    keys=[*keys, f"{_KEY_PREFIX}:metrics"],
+                    args=[op, self.rpm, self.tpm, int(amount), int(waited * 1000)],
+                ) / 1000
+            except Exception:
+                logger.warning("Gemini rate limiter: Redis unavailable, using local buckets", exc_info=True)
+                self._script = None
+                self._redis_checked_at = time.monotonic()
+        self._count(local_fallback=1)
+        return self._local.call(keys, op, self.rpm, self.tpm, amount)
+
+    # -- Public API --------------------------------------------------------
+
+    def acquire(self, model: str, tokens: int, max_wait: float | None = None) -> float:
+        """Block until one request and ``tokens`` tokens are available.
+
+        ``tokens`` is an estimate of prompt + output tokens (capped at the
+        per-minute quota); settle it with ``record_usage`` after the call.
+        Returns the seconds spent waiting; raises RateLimitTimeout after
+        ``max_wait`` seconds.
+        """
+        tokens = max(1, min(int(tokens), self.tpm))
+        started = time.monotonic()
+        throttled = False
+        while True:
+            wait = self._call(
+                model, "acquire", tokens, time.monotonic() - started if throttled else 0.0
+            )
+            if wait <= 0:
+                break
+            throttled = True
+            waited = time.monotonic() - started
+            if max_wait is not None and waited + wait > max_wait:
+                raise RateLimitTimeout(f"Gemini quota busy for {wait:.1f}s more ({model})")
+            # Jitter keeps workers released by the same refill from colliding
+            time.sleep(min(wait, MAX_SLEEP) + random.uniform(0, 0.05))
+
+        waited = time.monotonic() - started
+        self._count(
+            requests=1,
+            tokens_reserved=tokens,
+            wait_seconds=waited,
+            throttled=int(throttled),
+        )
+        return waited
+
+    def record_usage(self, model: str, reserved: int, actual: int | None) -> None:
+        """Return (or charge) the difference between estimate and real usage.
+
+        ``actual=0`` (the call was refused, nothing was processed) returns
+        the whole reservation; ``None`` (usage unknown) keeps it.
+        """
+        if actual is None:
+            return
+        reserved = max(1, min(int(reserved), self.tpm))
+        if actual != reserved:
+            self._call(model, "settle", reserved - actual)
+
+    def report_rate_limited(self, model: str, retry_after: float) -> None:
+        """Pause ``model`` for every worker after a 429."""
+        self._count(rate_limited=1)
+        self._call(model, "cooldown", max(retry_after, 0.1))
+
+    def metrics(self, include_cluster: bool = True) -> dict:
+        """Counters of this process and, with Redis, of all workers.
+
+        ``include_cluster=False`` leaves out the counters of all workers.
+        """
+        with self._metrics_lock:
+            process = dict(self._metrics)
+        process["wait_seconds"] = round(process["wait_seconds"], 3)
+
+        cluster = None
+        r = get_redis() if include_cluster and self._script is not None else None
+        if r is not None:
+            try:
+                cluster = {
+                    name: round(float(value), 3)
+                    for name, value in r.hgetall(f"{_KEY_PREFIX}:metrics").items()
+                }
+            except Exception:
+                cluster = None
+        return {
+            "backend": "redis" if self._script is not None else "local",
+            "rpm": self.rpm,
+            "tpm": self.tpm,
+            "process": process,
+            "cluster": cluster,
+        }
+
+    def _count(self, **amounts: float) -> None:
+        # Process counters only; the cluster ones are kept by the script
+        with self._metrics_lock:
+            for name, amount in amounts.items():
+                self._metrics[name] += amount
+
+
+_limiter: GeminiRateLimiter | None = None
+_limiter_lock = threading.Lock()
+
+
+def get_gemini_limiter() -> GeminiRateLimiter:
+    """Process-wide limiter."""
+    global _limiter
+    if _limiter is None:
+        with _limiter_lock:
+            if _limiter is None:
+                _limiter = GeminiRateLimiter()
+    return _limiter
+
+
+def estimate_tokens(text: str, max_output_tokens: int = 0) -> int:
+    """Rough token count (~4 chars/token) plus the expected output."""
+    return len(text) // 4 + max_output_tokens
+
+
+def retry_after_seconds(response, default: float) -> float:
+    """Seconds from a 429's Retry-After header, or ``default``."""
+    try:
+        return float(response.headers.get("Retry-After"))
+    except (AttributeError, TypeError, ValueError):
+        return default
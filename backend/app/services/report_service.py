@@ -8,13 +8,16 @@ based on aggregated sentiment data.
 import logging
 import json
 
-import requests
-
 from app.core.config import settings
+from app.core.http import get_http_client
+from app.services.rate_limiter import estimate_tokens, get_gemini_limiter, retry_after_seconds
 
 logger = logging.getLogger(__name__)
 
 GEMINI_BASE_URL = "https://generativelanguage.googleapis.com/v1beta/models"
+MAX_OUTPUT_TOKENS = 2000
+# Reports are generated inside an API request: give up rather than queue
+RATE_LIMIT_MAX_WAIT = 20
 
 
 def generate_health_report(data_summary: dict) -> str:
@@ -58,14 +61,26 @@ Siga EXATAMENTE a estrutura visual pedida com os emojis e títulos fornecidos.""
         "contents": [{"parts": [{"text": prompt}]}],
         "generationConfig": {
             "temperature": 0.75,
-            "maxOutputTokens": 2000,
+            "maxOutputTokens": MAX_OUTPUT_TOKENS,
         },
     }
 
+    limiter = get_gemini_limiter()
+    reserved = estimate_tokens(prompt, MAX_OUTPUT_TOKENS)
     try:
-        resp = requests.post(url, json=payload, timeout=30)
-        resp.raise_for_status()
-        result = resp.json()
+        limiter.acquire(settings.GEMINI_MODEL, reserved, max_wait=RATE_LIMIT_MAX_WAIT)
+        # Nothing is consumed without a successful response: release the reservation
+        used = 0
+        try:
+            resp = get_http_client("gemini").post(url, json=payload, timeout=30)
+            if resp.status_code == 429:
+                limiter.report_rate_limited(settings.GEMINI_MODEL, retry_after_seconds(resp, 2))
+            resp.raise_for_status()
+            used = None
+            result = resp.json()
+            used = (result.get("usageMetadata") or {}).get("totalTokenCount")
+        finally:
+            limiter.record_usage(settings.GEMINI_MODEL, reserved, used)
         text = result["candidates"][0]["content"]["parts"][0]["text"]
         return text.strip()
     except Exception as e:
@@ -0,0 +1,218 @@
+"""
+Daily rollups behind the dashboard trend endpoints.
+
+Each ConnectionDailyStats row aggregates the comments published on one UTC
+day and their latest analysis. The pipeline refreshes only the days touched
+by a run (comments ingested, re-fetched or analyzed since it started), so
+trend requests read at most one row per connection and day instead of every
+comment. Rows are written with INSERT ... ON CONFLICT DO UPDATE, so
+concurrent refreshes of the same connection do not collide.
+"""
+
+import logging
+import uuid
+from collections import Counter
+from datetime import date, datetime, time, timedelta, timezone
+
+from sqlalchemy import and_, delete, or_, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app.models.analysis import CommentAnalysis
+from app.models.comment import Comment
+from app.models.daily_stats import ConnectionDailyStats
+from app.models.post import Post
+
+logger = logging.getLogger(__name__)
+
+# Max day ranges OR-ed into one statement
+RANGES_PER_QUERY = 200
+STREAM_CHUNK_SIZE = 1000
+
+
+def _utc_day(value: datetime) -> date:
+    # SQLite returns naive datetimes; they are stored in UTC
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc)
+    return value.date()
+
+
+def _day_ranges(days: set[date]) -> list[tuple[datetime, datetime]]:
+    """Merge days into contiguous [start, end) UTC datetime ranges."""
+    ranges = []
+    for day in sorted(days):
+        start = datetime.combine(day, time.min, tzinfo=timezone.utc)
+        end = start + timedelta(days=1)
+        if ranges and ranges[-1][1] == start:
+            ranges[-1] = (ranges[-1][0], end)
+        else:
+            ranges.append((start, end))
+    return ranges
+
+
+def _empty_day() -> dict:
+    return {
+        "total_comments": 0,
+        "analyzed_comments": 0,
+        "total_likes": 0,
+        "score_sum": 0.0,
+        "score_count": 0,
+        "positive": 0,
+        "neutral": 0,
+        "negative": 0,
+        "emotions": Counter(),
+        "topics": Counter(),
+    }
+
+
+def _aggregate_days(db: Session, connection_id: uuid.UUID, days: set[date] | None) -> dict[date, dict]:
+    """Stream the comments of the given days (all days if None) once."""
+    query = (
+        db.query(
+            Comment.published_at,
+            Comment.like_count,
+            CommentAnalysis.id.label("analysis_id"),
+            CommentAnalysis.score_0_10,
+            CommentAnalysis.emotions,
+            CommentAnalysis.topics,
+        )
+        .outerjoin(CommentAnalysis, CommentAnalysis.id == Comment.latest_analysis_id)
+        .filter(
+            Comment.connection_id == connection_id,
+            Comment.published_at.isnot(None),
+        )
+    )
+
+    if days is None:
+        batches = [query]
+    else:
+        ranges = _day_ranges(days)
+        batches = [
+            query.filter(or_(*[
+                and_(Comment.published_at >= start, Comment.published_at < end)
+                for start, end in ranges[i : i + RANGES_PER_QUERY]
+            ]))
+            for i in range(0, len(ranges), RANGES_PER_QUERY)
+        ]
+
+    totals: dict[date, dict] = {}
+    for batch in batches:
+        for row in batch.yield_per(STREAM_CHUNK_SIZE):
+            day = _utc_day(row.published_at)
+            if days is not None and day not in days:
+                continue
+            entry = totals.setdefault(day, _empty_day())
+            entry["total_comments"] += 1
+            entry["total_likes"] += row.like_count or 0
+            if row.analysis_id is None:
+                continue
+            entry["analyzed_comments"] += 1
+            score = row.score_0_10
+            if score is not None:
+                entry["score_sum"] += score
+                entry["score_count"] += 1
+                if score > 6:
+                    entry["positive"] += 1
+                elif score >= 4:
+                    entry["neutral"] += 1
+                else:
+                    entry["negative"] += 1
+            for key in ("emotions", "topics"):
+                labels = getattr(row, key)
+                if isinstance(labels, list):
+                    entry[key].update(str(label) for label in labels)
+    return totals
+
+
+def refresh_daily_rollups(
+    db: Session,
+    connection_id: uuid.UUID,
+    days: set[date] | None = None,
+) -> int:
+    """Recompute the rollup rows of a connection for ``days`` (all if None).
+
+    Returns the number of days written or removed. Commits.
+    """
+    totals = _aggregate_days(db, connection_id, days)
+
+    existing_query = db.query(ConnectionDailyStats.day).filter(
+        ConnectionDailyStats.connection_id == connection_id
+    )
+    if days is not None:
+        existing_query = existing_query.filter(ConnectionDailyStats.day.in_(days))
+    # Days left without comments
+    empty_days = {day for (day,) in existing_query.all()} - set(totals)
+
+    now = datetime.now(timezone.utc)
+    rows = [
+        {
+            "id": uuid.uuid4(),
+            "connection_id": connection_id,
+            "day": day,
+            **{key: dict(value) if isinstance(value, Counter) else value for key, value in values.items()},
+            "updated_at": now,
+        }
+        for day, values in totals.items()
+    ]
+    if rows:
+        db.execute(_upsert_statement(db.get_bind().dialect.name), rows)
+    if empty_days:
+        db.execute(
+            delete(ConnectionDailyStats).where(
+                ConnectionDailyStats.connection_id == connection_id,
+                ConnectionDailyStats.day.in_(empty_days),
+            )
+        )
+
+    db.commit()
+    return len(totals) + len(empty_days)
+
+
+def _upsert_statement(dialect_name: str):
+    """INSERT of rollup rows that overwrites an existing (connection, day)."""
+    dialect = postgresql if dialect_name == "postgresql" else sqlite
+    stmt = dialect.insert(ConnectionDailyStats)
+    return stmt.on_conflict_do_update(
+        index_elements=["connection_id", "day"],
+        set_={
+            key: stmt.excluded[key]
+            for key in (*_empty_day(), "updated_at")
+        },
+    )
+
+
+def touched_days(db: Session, connection_id: uuid.UUID, since: datetime) -> set[date]:
+    """UTC days with comments ingested or (re)analyzed at or after ``since``.
+
+    Comments of posts whose comments were fetched again since then count
+    too: the upsert may have changed their ``like_count``.
+    """
+    refetched_posts = select(Post.id).where(
+        Post.connection_id == connection_id,
+        Post.comments_fetched_at >= since,
+    )
+    rows = (
+        db.query(Comment.published_at)
+        .outerjoin(CommentAnalysis, CommentAnalysis.id == Comment.latest_analysis_id)
+        .filter(
+            Comment.connection_id == connection_id,
+            Comment.published_at.isnot(None),
+            or_(
+                Comment.created_at >= since,
+                CommentAnalysis.analyzed_at >= since,
+                Comment.post_id.in_(refetched_posts),
+            ),
+        )
+        .yield_per(STREAM_CHUNK_SIZE)
+    )
+    return {_utc_day(row.published_at) for row in rows}
+
+
+def refresh_rollups_since(db: Session, connection_id: uuid.UUID, since: datetime) -> int:
+    """Refresh only the days touched since ``since``."""
+    days = touched_days(db, connection_id, since)
+    if not days:
+        return 0
+    written = refresh_daily_rollups(db, connection_id, days)
+    logger.info("Refreshed %d daily rollups for connection %s", written, connection_id)
+    return written
@@ -8,21 +8,38 @@ XPoz tools used:
   - getTwitterPostComments  → replies for each tweet
 """
 
-import hashlib
 import logging
 import re
 import uuid
 from datetime import datetime, timezone
-from typing import Optional
+from typing import Callable, Optional
 
 from sqlalchemy.orm import Session
 
 from app.models.post import Post
-from app.models.comment import Comment
 from app.models.social_connection import SocialConnection
+from app.services.comment_ingest_service import (
+    advance_listing_cursor,
+    bulk_upsert_comments,
+    comment_fetch_limit,
+    comment_text_hash,
+    listing_since,
+    needs_comment_refresh,
+    record_comment_fetch,
+)
 
 logger = logging.getLogger(__name__)
 
+COMMENT_UPDATE_FIELDS = (
+    "author_name",
+    "author_username",
+    "like_count",
+    "text_original",
+    "text_clean",
+    "text_hash",
+    "raw_payload",
+)
+
 
 # ---------------------------------------------------------------------------
 # Helpers
@@ -34,10 +51,6 @@ def _clean_text(text: str) -> str:
     return re.sub(r"\s+", " ", text.strip())
 
 
-def _hash(text: str) -> str:
-    return hashlib.sha256(text.encode("utf-8")).hexdigest()
-
-
 def _parse_xpoz_text(text: str) -> dict:
     """Parse key:value lines returned by XPoz tools."""
     result = {}
@@ -166,16 +179,27 @@ def create_twitter_connection(
 # Posts fetch
 # ---------------------------------------------------------------------------
 
-def fetch_twitter_posts(username: str, max_posts: int = 10) -> list[dict]:
-    """Fetch recent tweets from a user via XPoz getTwitterPostsByAuthor, parsed by LLM."""
+def fetch_twitter_posts(
+    username: str,
+    max_posts: int = 10,
+    since: Optional[datetime] = None,
+) -> list[dict]:
+    """Fetch recent tweets from a user via XPoz getTwitterPostsByAuthor, parsed by LLM.
+
+    ``since`` asks for tweets posted at or after it only; XPoz has no cursor
+    parameter, so callers still filter the result.
+    """
     if username.startswith("@"):
         username = username[1:]
 
+    prompt = f"Get recent tweets from @{username}"
+    if since:
+        prompt += f" posted on or after {since.isoformat()}"
     res = _xpoz_call("getTwitterPostsByAuthor", {
         "identifier": username,
         "identifierType": "username",
         "limit": max_posts,
-        "userPrompt": f"Get recent tweets from @{username}",
+        "userPrompt": prompt,
     })
 
     text = res.get("text", "")
@@ -212,7 +236,7 @@ def fetch_tweet_comments(tweet_id: str, max_comments: int = 100) -> list[dict]:
     res = _xpoz_call("getTwitterPostComments", {
         "postId": tweet_id,
         "limit": max_comments,
-        "userPrompt": f"Get comments/replies for tweet {tweet_id}",
+        "userPrompt": f"Get comments/replies for tweet {tweet_id}, newest first",
     })
 
     text = res.get("text", "")
@@ -246,19 +270,27 @@ def ingest_twitter_profile(
     connection: SocialConnection,
     max_posts: int = 10,
     max_comments_per_post: int = 100,
+    on_post_ingested: Optional[Callable[[uuid.UUID], None]] = None,
 ) -> dict:
-    """Full ingestion: fetch tweets + replies and save to DB."""
+    """Full ingestion: fetch tweets + replies and save to DB.
+
+    ``on_post_ingested`` is called with each post id right after the post
+    and its replies are committed.
+    """
     username = connection.username
     if username.startswith("@"):
         username = username[1:]
 
-    raw_posts = fetch_twitter_posts(username, max_posts)
+    since = listing_since(connection)
+    raw_posts = fetch_twitter_posts(username, max_posts, since)
     if not raw_posts:
         logger.warning(f"No posts fetched for Twitter @{username}")
         return {"posts_fetched": 0, "comments_fetched": 0}
 
     posts_fetched = 0
+    posts_skipped = 0
     comments_fetched = 0
+    listed = []
 
     for raw_post in raw_posts:
         post_id = raw_post["platform_post_id"]
@@ -276,6 +308,8 @@ def ingest_twitter_profile(
                 published_at = datetime.fromisoformat(ts.replace("Z", "+00:00"))
             except (ValueError, TypeError):
                 pass
+        if since is not None and published_at is not None and published_at < since:
+            continue
 
         existing_post = (
             db.query(Post)
@@ -286,6 +320,11 @@ def ingest_twitter_profile(
             )
             .first()
         )
+        refresh_comments = needs_comment_refresh(existing_post, raw_post.get("reply_count"))
+        fetch_limit = comment_fetch_limit(
+            existing_post, raw_post.get("reply_count"), max_comments_per_post
+        )
+        previous_comment_count = existing_post.comment_count if existing_post else 0
 
         if existing_post:
             existing_post.content_text = content
@@ -321,60 +360,63 @@ def ingest_twitter_profile(
 
         db.flush()
         posts_fetched += 1
+        listed.append(post)
+
+        if not refresh_comments:
+            # Reply count unchanged: no reply fetch (a billed XPoz job)
+            posts_skipped += 1
+            db.commit()
+            continue
 
         # Fetch replies
-        replies = fetch_tweet_comments(post_id, max_comments_per_post)
+        replies = fetch_tweet_comments(post_id, fetch_limit)
+        comment_rows = []
         for reply in replies:
             text_original = reply.get("text", "")
             text_clean = _clean_text(text_original)
-            text_hash = _hash(text_clean)
 
             comment_id = reply.get("platform_comment_id", "")
             if not comment_id:
                 continue
 
-            existing_comment = (
-                db.query(Comment)
-                .filter(
-                    Comment.post_id == post.id,
-                    Comment.platform_comment_id == comment_id,
-                )
-                .first()
-            )
+            comment_rows.append({
+                "connection_id": connection.id,
+                "platform": "twitter",
+                "platform_comment_id": comment_id,
+                "parent_comment_id": None,
+                "source_type": "comment",
+                "author_name": reply.get("author_name", ""),
+                "author_username": reply.get("username", ""),
+                "author_profile_url": None,
+                "like_count": reply.get("like_count", 0),
+                "reply_count": 0,
+                "published_at": None,
+                "text_original": text_original,
+                "text_clean": text_clean,
+                "text_hash": comment_text_hash(text_clean),
+                "raw_payload": reply,
+            })
+
+        full_fetch = fetch_limit == max_comments_per_post
+        written = bulk_upsert_comments(db, post.id, comment_rows, COMMENT_UPDATE_FIELDS)
+        comments_fetched += written["inserted"] + written["updated"]
+        if not record_comment_fetch(post, comment_rows, full_fetch, previous_comment_count):
+            logger.warning(f"No replies fetched for tweet {post_id}; retrying next sync")
 
-            if existing_comment:
-                existing_comment.author_name = reply.get("author_name", "")
-                existing_comment.author_username = reply.get("username", "")
-                existing_comment.like_count = reply.get("like_count", 0)
-                existing_comment.text_original = text_original
-                existing_comment.text_clean = text_clean
-                existing_comment.text_hash = text_hash
-                existing_comment.raw_payload = reply
-            else:
-                comment = Comment(
-                    post_id=post.id,
-                    connection_id=connection.id,
-                    platform="twitter",
-                    platform_comment_id=comment_id,
-                    parent_comment_id=None,
-                    source_type="comment",
-                    author_name=reply.get("author_name", ""),
-                    author_username=reply.get("username", ""),
-                    author_profile_url=None,
-                    like_count=reply.get("like_count", 0),
-                    reply_count=0,
-                    published_at=None,
-                    text_original=text_original,
-                    text_clean=text_clean,
-                    text_hash=text_hash,
-                    raw_payload=reply,
-                    status="pending",
-                )
-                db.add(comment)
-            comments_fetched += 1
+        db.commit()
+        if on_post_ingested:
+            on_post_ingested(post.id)
 
+    advance_listing_cursor(connection, listed, since)
     connection.last_sync_at = datetime.now(timezone.utc)
     db.commit()
 
-    logger.info(f"Twitter @{username}: {posts_fetched} posts, {comments_fetched} comments ingested")
-    return {"posts_fetched": posts_fetched, "comments_fetched": comments_fetched}
+    logger.info(
+        f"Twitter @{username}: {posts_fetched} posts ({posts_skipped} unchanged), "
+        f"{comments_fetched} comments ingested"
+    )
+    return {
+        "posts_fetched": posts_fetched,
+        "posts_skipped": posts_skipped,
+        "comments_fetched": comments_fetched,
+    }
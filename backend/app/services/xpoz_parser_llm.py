@@ -3,10 +3,15 @@ from google import genai
 from pydantic import BaseModel
 from typing import List, Optional
 from app.core.config import settings
+from app.services.rate_limiter import estimate_tokens, get_gemini_limiter
 import logging
 
 logger = logging.getLogger(__name__)
 
+PARSER_MODEL = 'gemini-2.5-flash'
+# Output reserved in the rate limiter for one parsed listing
+PARSER_OUTPUT_TOKENS = 4000
+
 class XpozPost(BaseModel):
     id: str
     text: Optional[str] = ""
@@ -59,18 +64,30 @@ def parse_xpoz_data_with_llm(raw_text: str, target_schema: type) -> dict:
     '''
     """
     
+    limiter = get_gemini_limiter()
+    reserved = estimate_tokens(prompt, PARSER_OUTPUT_TOKENS)
     try:
-        response = client.models.generate_content(
-            model='gemini-2.5-flash',
-            contents=prompt,
-            config={
-                'response_mime_type': 'application/json',
-                'response_schema': target_schema,
-                'temperature': 0.1,
-            },
-        )
+        limiter.acquire(PARSER_MODEL, reserved)
+        # Nothing is consumed without a response: release the reservation
+        used = 0
+        try:
+            response = client.models.generate_content(
+                model=PARSER_MODEL,
+                contents=prompt,
+                config={
+                    'response_mime_type': 'application/json',
+                    'response_schema': target_schema,
+                    'temperature': 0.1,
+                },
+            )
+            usage = getattr(response, 'usage_metadata', None)
+            used = getattr(usage, 'total_token_count', None)
+        finally:
+            limiter.record_usage(PARSER_MODEL, reserved, used)
         data = json.loads(response.text)
         return data
     except Exception as e:
+        if getattr(e, 'code', None) == 429:
+            limiter.report_rate_limited(PARSER_MODEL, 2)
         logger.error(f"Failed to parse XPoz data with LLM: {e}")
         return {}
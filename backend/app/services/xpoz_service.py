@@ -2,8 +2,8 @@ import json
 import logging
 import re
 import time
-import requests
 from app.core.config import settings
+from app.core.http import get_http_client
 
 logger = logging.getLogger(__name__)
 
@@ -24,7 +24,7 @@ def _call_mcp(name: str, arguments: dict) -> dict:
         "id": 1
     }
     try:
-        r = requests.post(XPOZ_BASE, headers=headers, json=payload, timeout=30)
+        r = get_http_client("xpoz").post(XPOZ_BASE, headers=headers, json=payload)
         r.encoding = 'utf-8'
         for line in r.text.split('\n'):
             if line.startswith('data: '):
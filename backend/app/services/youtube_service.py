@@ -6,14 +6,32 @@ Uses yt-dlp directly to discover channels and ingest video comments into Postgre
 
 import re
 import uuid
-import hashlib
+from collections.abc import Callable
 from datetime import datetime, timezone
 
 from sqlalchemy.orm import Session
 
 from app.models.post import Post
-from app.models.comment import Comment
 from app.models.social_connection import SocialConnection
+from app.services.comment_ingest_service import (
+    advance_listing_cursor,
+    bulk_upsert_comments,
+    comment_fetch_limit,
+    comment_text_hash,
+    needs_comment_refresh,
+    record_comment_fetch,
+    stop_at_watermark,
+)
+
+COMMENT_UPDATE_FIELDS = (
+    "author_name",
+    "like_count",
+    "reply_count",
+    "text_original",
+    "text_clean",
+    "text_hash",
+    "raw_payload",
+)
 
 
 # ---------------------------------------------------------------------------
@@ -29,10 +47,6 @@ def clean_text(text: str) -> str:
     return text
 
 
-def compute_hash(text: str) -> str:
-    return hashlib.sha256(text.encode("utf-8")).hexdigest()
-
-
 # ---------------------------------------------------------------------------
 # Public helpers
 # ---------------------------------------------------------------------------
@@ -108,8 +122,8 @@ def _get_video_info(video_id: str) -> dict:
         return {}
 
 
-def _fetch_comments(video_id: str, max_comments: int = 100) -> list[dict]:
-    """Fetch comments for a video using yt-dlp."""
+def _fetch_comments(video_id: str, max_comments: int = 100, sort: str = "top") -> list[dict]:
+    """Fetch comments for a video using yt-dlp (``sort`` is "top" or "new")."""
     import yt_dlp
 
     video_url = f"https://www.youtube.com/watch?v={video_id}"
@@ -121,7 +135,7 @@ def _fetch_comments(video_id: str, max_comments: int = 100) -> list[dict]:
         "extractor_args": {
             "youtube": {
                 "max_comments": [str(max_comments)],
-                "comment_sort": ["top"],
+                "comment_sort": [sort],
             }
         },
     }
@@ -159,8 +173,12 @@ async def ingest_youtube_channel(
     db: Session,
     connection_id: uuid.UUID,
     max_comments: int = 100,
+    on_post_ingested: Callable[[uuid.UUID], None] | None = None,
 ) -> dict:
-    """Ingest the latest video and its comments for a YouTube connection."""
+    """Ingest the latest video and its comments for a YouTube connection.
+
+    ``on_post_ingested`` is called with the post id once it is committed.
+    """
 
     # -- 1. Retrieve connection
     connection: SocialConnection | None = db.get(SocialConnection, connection_id)
@@ -203,6 +221,10 @@ async def ingest_youtube_channel(
         )
         .first()
     )
+    refresh_comments = needs_comment_refresh(existing_post, video_info.get("comment_count"))
+    fetch_limit = comment_fetch_limit(existing_post, video_info.get("comment_count"), max_comments)
+    full_fetch = fetch_limit == max_comments
+    previous_comment_count = existing_post.comment_count if existing_post else 0
 
     if existing_post:
         existing_post.content_text = title
@@ -238,64 +260,64 @@ async def ingest_youtube_channel(
 
     posts_fetched = 1
 
-    # -- 4. Fetch comments and save
-    comments_fetched = 0
+    # -- 4. Fetch comments and save (skipped while the video is unchanged;
+    #       past the watermark only the newest few are requested)
+    comment_rows = []
+    raw_comments = []
+    if refresh_comments:
+        raw_comments = _fetch_comments(
+            latest_video_id, fetch_limit, sort="top" if full_fetch else "new"
+        )
 
-    for raw_comment in _fetch_comments(latest_video_id, max_comments):
+    for raw_comment in raw_comments:
         text_original = raw_comment.get("text_original", "")
         text_cleaned = clean_text(text_original)
-        text_hash = compute_hash(text_cleaned)
 
         platform_comment_id = raw_comment.get("comment_id", "")
         if not platform_comment_id:
             continue
 
-        existing_comment = (
-            db.query(Comment)
-            .filter(
-                Comment.post_id == post.id,
-                Comment.platform_comment_id == platform_comment_id,
-            )
-            .first()
+        comment_rows.append({
+            "connection_id": connection_id,
+            "platform": "youtube",
+            "platform_comment_id": platform_comment_id,
+            "parent_comment_id": None,
+            "source_type": "comment",
+            "author_name": raw_comment.get("author_name"),
+            "author_username": raw_comment.get("author_channel_id"),
+            "author_profile_url": None,
+            "like_count": raw_comment.get("like_count", 0),
+            "reply_count": raw_comment.get("reply_count", 0),
+            "published_at": None,
+            "text_original": text_original,
+            "text_clean": text_cleaned,
+            "text_hash": comment_text_hash(text_cleaned),
+            "raw_payload": raw_comment.get("raw_payload"),
+        })
+
+    written = bulk_upsert_comments(
+        db,
+        post.id,
+        comment_rows if full_fetch else stop_at_watermark(post, comment_rows),
+        COMMENT_UPDATE_FIELDS,
+    )
+    comments_fetched = written["inserted"] + written["updated"]
+    if refresh_comments:
+        # Full fetches are sorted by likes: only "new" fetches move the id
+        record_comment_fetch(
+            post, comment_rows, full_fetch, previous_comment_count, newest_first=not full_fetch
         )
 
-        if existing_comment:
-            existing_comment.author_name = raw_comment.get("author_name")
-            existing_comment.like_count = raw_comment.get("like_count", 0)
-            existing_comment.reply_count = raw_comment.get("reply_count", 0)
-            existing_comment.text_original = text_original
-            existing_comment.text_clean = text_cleaned
-            existing_comment.text_hash = text_hash
-            existing_comment.raw_payload = raw_comment.get("raw_payload")
-        else:
-            comment = Comment(
-                post_id=post.id,
-                connection_id=connection_id,
-                platform="youtube",
-                platform_comment_id=platform_comment_id,
-                parent_comment_id=None,
-                source_type="comment",
-                author_name=raw_comment.get("author_name"),
-                author_username=raw_comment.get("author_channel_id"),
-                author_profile_url=None,
-                like_count=raw_comment.get("like_count", 0),
-                reply_count=raw_comment.get("reply_count", 0),
-                published_at=None,
-                text_original=text_original,
-                text_clean=text_cleaned,
-                text_hash=text_hash,
-                raw_payload=raw_comment.get("raw_payload"),
-                status="pending",
-            )
-            db.add(comment)
-        comments_fetched += 1
-
-    # -- 5. Update sync timestamp
+    # -- 5. Update sync cursor and timestamp
+    advance_listing_cursor(connection, [post], since=None)
     connection.last_sync_at = datetime.now(timezone.utc)
 
     db.commit()
+    if on_post_ingested:
+        on_post_ingested(post.id)
 
     return {
         "posts_fetched": posts_fetched,
+        "posts_skipped": 0 if refresh_comments else 1,
         "comments_fetched": comments_fetched,
     }
@@ -1,6 +1,16 @@
 from celery import Celery
+from kombu import Queue
+
 from app.core.config import settings
 
+# Each queue gets its own worker pool, sized and scaled independently:
+#   ingest       I/O bound (XPoz polls, yt-dlp)  -> --pool=threads, high concurrency
+#   analysis     LLM bound (Gemini calls)        -> --pool=threads, sized to the rate limit
+#   aggregation  DB bound (summaries, rollups)   -> prefork, ~CPU count
+INGEST_QUEUE = "ingest"
+ANALYSIS_QUEUE = "analysis"
+AGGREGATION_QUEUE = "aggregation"
+
 celery_app = Celery(
     "sentiment_worker",
     broker=settings.CELERY_BROKER_URL,
@@ -16,6 +26,33 @@ celery_app.conf.update(
     task_track_started=True,
     task_acks_late=True,
     worker_prefetch_multiplier=1,
+    task_queues=(
+        Queue(INGEST_QUEUE),
+        Queue(ANALYSIS_QUEUE),
+        Queue(AGGREGATION_QUEUE),
+    ),
+    task_default_queue=AGGREGATION_QUEUE,
+    task_routes={
+        "app.tasks.pipeline_tasks.task_ingest": {"queue": INGEST_QUEUE},
+        "app.tasks.pipeline_tasks.task_full_pipeline": {"queue": INGEST_QUEUE},
+        "app.tasks.pipeline_tasks.task_analyze": {"queue": ANALYSIS_QUEUE},
+        "app.tasks.pipeline_tasks.task_analyze_post": {"queue": ANALYSIS_QUEUE},
+        "app.tasks.pipeline_tasks.task_finalize_run": {"queue": AGGREGATION_QUEUE},
+        "app.tasks.pipeline_tasks.task_retry_failed_analyses": {"queue": AGGREGATION_QUEUE},
+        "app.tasks.pipeline_tasks.task_submit_batch_job": {"queue": AGGREGATION_QUEUE},
+        "app.tasks.pipeline_tasks.task_poll_batch_jobs": {"queue": AGGREGATION_QUEUE},
+    },
+    # Run by `celery beat` (one instance per deployment)
+    beat_schedule={
+        "retry-failed-analyses": {
+            "task": "app.tasks.pipeline_tasks.task_retry_failed_analyses",
+            "schedule": settings.ANALYSIS_SWEEP_INTERVAL,
+        },
+        "poll-batch-jobs": {
+            "task": "app.tasks.pipeline_tasks.task_poll_batch_jobs",
+            "schedule": settings.GEMINI_BATCH_POLL_INTERVAL,
+        },
+    },
 )
 
 # Auto-discover tasks
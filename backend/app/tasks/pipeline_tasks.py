@@ -8,11 +8,16 @@ import logging
 import uuid
 from datetime import datetime, timezone
 
+from sqlalchemy import select
+
 from app.tasks.celery_app import celery_app
 from app.db.session import SessionLocal
+from app.models.analysis_batch_job import AnalysisBatchJob
+from app.models.comment import Comment
 from app.models.pipeline_run import PipelineRun
 from app.models.post import Post
 from app.models.social_connection import SocialConnection
+from app.services.progress_service import publish_run_progress
 
 logger = logging.getLogger(__name__)
 
@@ -27,11 +32,13 @@ def _run_async(coro):
 
 
 @celery_app.task(bind=True)
-def task_ingest(self, connection_id: str, user_id: str, max_posts: int = 10, max_comments_per_post: int = 100, since_date: str | None = None) -> dict:
+def task_ingest(self, connection_id: str, user_id: str, max_posts: int = 10, max_comments_per_post: int = 100, since_date: str | None = None, on_post_ingested=None) -> dict:
     """Ingest data from a social media platform.
 
     Determines the platform from the SocialConnection record and
-    delegates to the appropriate service.
+    delegates to the appropriate service. ``on_post_ingested(post_id)`` is
+    called as soon as each post and its comments are committed (only when
+    called in-process, e.g. from task_full_pipeline).
     """
     db = SessionLocal()
     try:
@@ -57,7 +64,10 @@ def task_ingest(self, connection_id: str, user_id: str, max_posts: int = 10, max
                 from app.services.youtube_service import ingest_youtube_channel
 
                 result = _run_async(
-                    ingest_youtube_channel(db, conn_uuid, max_comments=max_comments_per_post)
+                    ingest_youtube_channel(
+                        db, conn_uuid, max_comments=max_comments_per_post,
+                        on_post_ingested=on_post_ingested,
+                    )
                 )
 
             elif connection.platform == "instagram":
@@ -66,14 +76,16 @@ def task_ingest(self, connection_id: str, user_id: str, max_posts: int = 10, max
 
                 since = date_type.fromisoformat(since_date) if since_date else None
                 result = ingest_instagram_profile(
-                    db, connection, max_posts=max_posts, max_comments_per_post=max_comments_per_post, since_date=since
+                    db, connection, max_posts=max_posts, max_comments_per_post=max_comments_per_post, since_date=since,
+                    on_post_ingested=on_post_ingested,
                 )
 
             elif connection.platform == "twitter":
                 from app.services.twitter_service import ingest_twitter_profile
 
                 result = ingest_twitter_profile(
-                    db, connection, max_posts=max_posts, max_comments_per_post=max_comments_per_post
+                    db, connection, max_posts=max_posts, max_comments_per_post=max_comments_per_post,
+                    on_post_ingested=on_post_ingested,
                 )
 
             else:
@@ -85,6 +97,7 @@ def task_ingest(self, connection_id: str, user_id: str, max_posts: int = 10, max
             run.status = "completed"
             run.ended_at = datetime.now(timezone.utc)
             db.commit()
+            publish_run_progress(run)
 
             return result
 
@@ -95,6 +108,7 @@ def task_ingest(self, connection_id: str, user_id: str, max_posts: int = 10, max
             run.notes = str(e)[:500]
             run.ended_at = datetime.now(timezone.utc)
             db.commit()
+            publish_run_progress(run)
             return {"error": str(e)}
 
     finally:
@@ -106,17 +120,21 @@ def task_analyze(self, post_id: str, user_id: str) -> dict:
     """Analyze all pending comments for a single post."""
     db = SessionLocal()
     try:
-        from app.services.analysis_service import (
-            analyze_post_comments,
-            generate_post_summary,
-        )
+        from app.services.analysis_service import analyze_post_comments
+
+        from app.services.rollup_service import refresh_rollups_since
 
         post_uuid = uuid.UUID(post_id)
+        started_at = datetime.now(timezone.utc)
 
+        # The post summary is updated incrementally by analyze_post_comments
         stats = analyze_post_comments(
-            db, post_uuid, batch_size=30, prompt_version="v1"
+            db, post_uuid, prompt_version="v1"
         )
-        generate_post_summary(db, post_uuid)
+
+        post = db.get(Post, post_uuid)
+        if post and stats.get("analyzed"):
+            refresh_rollups_since(db, post.connection_id, started_at)
 
         return stats
 
@@ -129,7 +147,13 @@ def task_analyze(self, post_id: str, user_id: str) -> dict:
 
 @celery_app.task(bind=True)
 def task_full_pipeline(self, connection_id: str, user_id: str, max_posts: int = 10, max_comments_per_post: int = 100, since_date: str | None = None) -> dict:
-    """Run the full pipeline: ingest + analyze for all posts."""
+    """Run the full pipeline: ingest, analyzing posts in parallel subtasks.
+
+    Each post is queued for analysis as soon as the ingest service has
+    persisted it, so scraping and LLM analysis overlap. The run is
+    finalized by whichever side (this task or the last subtask) observes
+    that ingest is over and every queued post is done.
+    """
     db = SessionLocal()
     try:
         conn_uuid = uuid.UUID(connection_id)
@@ -141,75 +165,233 @@ def task_full_pipeline(self, connection_id: str, user_id: str, max_posts: int =
             connection_id=conn_uuid,
             run_type="full",
             status="running",
+            notes=json.dumps({"step": "ingesting", "current": 0, "total": 0}),
         )
         db.add(run)
         db.commit()
+        run_id = run.id
+
+        queued: set[uuid.UUID] = set()
 
-        # Step 1: Ingest
-        ingest_result = task_ingest(connection_id, user_id, max_posts=max_posts, max_comments_per_post=max_comments_per_post, since_date=since_date)
+        def queue_post(post_id: uuid.UUID) -> None:
+            if post_id in queued or not _has_pending_comments(db, post_id):
+                return
+            queued.add(post_id)
+            _update_run_progress(db, run_id, queued=1)
+            task_analyze_post.delay(str(run_id), str(post_id))
+
+        # Step 1: Ingest, queueing each post for analysis once persisted
+        ingest_result = task_ingest(
+            connection_id, user_id, max_posts=max_posts, max_comments_per_post=max_comments_per_post,
+            since_date=since_date, on_post_ingested=queue_post,
+        )
         if "error" in ingest_result:
-            run.status = "failed"
-            run.notes = ingest_result["error"]
-            run.ended_at = datetime.now(timezone.utc)
-            db.commit()
+            _fail_run(db, run_id, ingest_result["error"])
             return ingest_result
 
-        run.posts_fetched = ingest_result.get("posts_fetched", 0)
-        run.comments_fetched = ingest_result.get("comments_fetched", 0)
-
-        # Step 2: Analyze each post
-        posts = (
-            db.query(Post)
-            .filter(Post.connection_id == conn_uuid)
-            .all()
+        # Step 2: Posts still holding pending comments from earlier runs;
+        # posts without pending comments (and their summaries) are unchanged
+        pending_posts = (
+            select(Comment.post_id)
+            .where(*_pending_filters(db, db.get(SocialConnection, conn_uuid)))
+            .distinct()
+        )
+        for post_id in db.scalars(
+            select(Post.id).where(
+                Post.connection_id == conn_uuid,
+                Post.id.in_(pending_posts),
+            )
+        ).all():
+            queue_post(post_id)
+
+        logger.info(f"Queued {len(queued)} posts for analysis on connection {connection_id}")
+        _update_run_progress(
+            db, run_id,
+            ingest_done=True,
+            posts_fetched=ingest_result.get("posts_fetched", 0),
+            comments_fetched=ingest_result.get("comments_fetched", 0),
         )
 
-        total_analyzed = 0
-        total_llm_calls = 0
-        total_errors = 0
-        total_cost = 0.0
+        return {
+            "run_id": str(run_id),
+            "posts_fetched": ingest_result.get("posts_fetched", 0),
+            "comments_fetched": ingest_result.get("comments_fetched", 0),
+            "posts_queued": len(queued),
+        }
 
-        from app.services.analysis_service import (
-            analyze_post_comments,
-            generate_post_summary,
-        )
+    except Exception as e:
+        logger.exception("Full pipeline failed for connection %s", connection_id)
+        return {"error": str(e)}
+    finally:
+        db.close()
 
-        total_posts = len(posts)
-        logger.info(f"Starting analysis for {total_posts} posts on connection {connection_id}")
-        
-        for idx, post in enumerate(posts, 1):
-            logger.info(f"Analyzing post {idx}/{total_posts}: {post.platform_post_id}")
-            # Update progress in notes
-            progress_info = {
-                "step": "analyzing",
-                "current": idx,
-                "total": total_posts,
-                "current_post": (post.content_text[:80] if post.content_text else post.platform_post_id),
-            }
-            run.notes = json.dumps(progress_info)
-            db.commit()
 
-            stats = analyze_post_comments(db, post.id)
-            total_analyzed += stats.get("analyzed", 0)
-            total_llm_calls += stats.get("llm_calls", 0)
-            total_errors += stats.get("errors", 0)
+def _pending_filters(db, connection: SocialConnection | None) -> list:
+    """Comments analyze_post_comments would send for analysis.
 
-            generate_post_summary(db, post.id)
-            
-            # Inform SSE continuously
-            run.comments_analyzed = total_analyzed
-            db.commit()
-            logger.info(f"Post {idx}/{total_posts} done. Total analyzed: {total_analyzed}")
-
-        # Update run
-        run.comments_analyzed = total_analyzed
-        run.llm_calls = total_llm_calls
-        run.errors_count = total_errors
-        run.total_cost_usd = total_cost
-        run.status = "completed" if total_errors == 0 else "partial"
+    The author's own comments stay "pending" when the connection ignores
+    them; they must not make a post look unfinished on every run.
+    """
+    from app.services.analysis_service import unanalyzed_filters
+
+    return [Comment.status == "pending", *unanalyzed_filters(db, "v1", connection)]
+
+
+def _has_pending_comments(db, post_id: uuid.UUID) -> bool:
+    post = db.get(Post, post_id)
+    if post is None:
+        return False
+    connection = db.get(SocialConnection, post.connection_id)
+    return db.query(
+        select(Comment.id)
+        .where(Comment.post_id == post_id, *_pending_filters(db, connection))
+        .exists()
+    ).scalar()
+
+
+def _run_progress(run: PipelineRun) -> dict:
+    """Progress of a full run, kept as JSON in ``notes``."""
+    try:
+        return json.loads(run.notes) if run.notes else {}
+    except (json.JSONDecodeError, TypeError):
+        return {}
+
+
+def _fail_run(db, run_id: uuid.UUID, error: str) -> None:
+    """Mark a full run failed, keeping its progress so far in ``notes``.
+
+    Posts queued before the failure still report their analysis counts,
+    but the run is not finalized afterwards.
+    """
+    run = (
+        db.query(PipelineRun)
+        .filter(PipelineRun.id == run_id)
+        .with_for_update()
+        .one()
+    )
+    progress = _run_progress(run)
+    progress.update({"step": "failed", "error": str(error)[:500]})
+    run.status = "failed"
+    run.ended_at = datetime.now(timezone.utc)
+    run.notes = json.dumps(progress)
+    db.commit()
+    publish_run_progress(run)
+
+
+def _update_run_progress(
+    db,
+    run_id: uuid.UUID,
+    queued: int = 0,
+    done_stats: dict | None = None,
+    ingest_done: bool = False,
+    partial_stats: dict | None = None,
+    **fields,
+) -> None:
+    """Apply one progress change to a full run and finalize it when complete.
+
+    ``done_stats`` finishes a post; ``partial_stats`` only adds counts of a
+    post still being analyzed (so progress moves between posts).
+
+    Runs under a row lock: the pipeline task (queueing posts, closing
+    ingest) and the post subtasks (finishing posts) update the same run
+    concurrently. Exactly one caller sees ingest done with every queued
+    post finished, and that caller enqueues task_finalize_run. A failed run
+    (see ``_fail_run``) keeps its status and step and is never finalized.
+    """
+    run = (
+        db.query(PipelineRun)
+        .filter(PipelineRun.id == run_id)
+        .with_for_update()
+        .one()
+    )
+    failed = run.status == "failed"
+    progress = _run_progress(run)
+    was_complete = progress.get("ingest_done") and progress.get("current", 0) >= progress.get("total", 0)
+
+    progress["total"] = progress.get("total", 0) + queued
+    if done_stats is not None:
+        progress["current"] = progress.get("current", 0) + 1
+    for stats in (done_stats, partial_stats):
+        if stats:
+            run.comments_analyzed = (run.comments_analyzed or 0) + stats.get("analyzed", 0)
+            run.llm_calls = (run.llm_calls or 0) + stats.get("llm_calls", 0)
+            run.errors_count = (run.errors_count or 0) + stats.get("errors", 0)
+    if ingest_done and not failed:
+        progress["ingest_done"] = True
+        progress["step"] = "analyzing"
+    for key, value in fields.items():
+        setattr(run, key, value)
+
+    complete = progress.get("ingest_done") and progress.get("current", 0) >= progress.get("total", 0)
+    run.notes = json.dumps(progress)
+    db.commit()
+    publish_run_progress(run)
+
+    if complete and not was_complete and not failed:
+        task_finalize_run.delay(str(run_id))
+
+
+@celery_app.task(bind=True)
+def task_analyze_post(self, run_id: str, post_id: str) -> dict:
+    """Analyze one post of a full pipeline run.
+
+    Never raises, so one failing post still counts towards completion.
+    """
+    db = SessionLocal()
+    try:
+        from app.services.analysis_service import analyze_post_comments
+
+        run_uuid = uuid.UUID(run_id)
+        reported = {"analyzed": 0, "llm_calls": 0, "errors": 0}
+
+        def unreported(stats: dict) -> dict:
+            delta = {key: stats.get(key, 0) - value for key, value in reported.items()}
+            for key, value in delta.items():
+                reported[key] += value
+            return delta
+
+        def report_progress(stats: dict) -> None:
+            # Counts of the batches stored so far; the rest goes with done_stats
+            _update_run_progress(db, run_uuid, partial_stats=unreported(stats))
+
+        try:
+            stats = analyze_post_comments(db, uuid.UUID(post_id), on_progress=report_progress)
+        except Exception as e:
+            logger.exception("Analysis failed for post %s", post_id)
+            db.rollback()
+            stats = {"analyzed": reported["analyzed"], "errors": reported["errors"] + 1,
+                     "llm_calls": reported["llm_calls"], "error": str(e)}
+
+        _update_run_progress(db, run_uuid, done_stats=unreported(stats))
+        return stats
+    finally:
+        db.close()
+
+
+@celery_app.task(bind=True)
+def task_finalize_run(self, run_id: str) -> dict:
+    """Completion step of a full run: close the PipelineRun and refresh caches.
+
+    The per-post stats were already added to the run by the subtasks.
+    """
+    db = SessionLocal()
+    try:
+        run = db.get(PipelineRun, uuid.UUID(run_id))
+        if run.status == "failed":
+            return {"error": _run_progress(run).get("error", "run failed")}
+        total_posts = _run_progress(run).get("total", 0)
+
+        run.total_cost_usd = 0.0
+        run.status = "completed" if not run.errors_count else "partial"
         run.ended_at = datetime.now(timezone.utc)
         run.notes = json.dumps({"step": "done", "current": total_posts, "total": total_posts})
         db.commit()
+        publish_run_progress(run)
+
+        # Daily trend rollups for the days this run ingested or analyzed
+        from app.services.rollup_service import refresh_rollups_since
+
+        refresh_rollups_since(db, run.connection_id, run.started_at)
 
         # Invalidate dashboard cache for this user
         try:
@@ -222,13 +404,91 @@ def task_full_pipeline(self, connection_id: str, user_id: str, max_posts: int =
         return {
             "posts_fetched": run.posts_fetched,
             "comments_fetched": run.comments_fetched,
-            "comments_analyzed": total_analyzed,
-            "llm_calls": total_llm_calls,
-            "errors": total_errors,
+            "comments_analyzed": run.comments_analyzed,
+            "llm_calls": run.llm_calls,
+            "errors": run.errors_count,
         }
 
     except Exception as e:
-        logger.exception("Full pipeline failed for connection %s", connection_id)
+        logger.exception("Finalizing pipeline run %s failed", run_id)
+        return {"error": str(e)}
+    finally:
+        db.close()
+
+
+@celery_app.task(bind=True)
+def task_retry_failed_analyses(self) -> dict:
+    """Periodic sweep (celery beat): re-analyze comments whose retry is due."""
+    db = SessionLocal()
+    try:
+        from app.services.analysis_service import requeue_failed_comments
+
+        post_ids = requeue_failed_comments(db)
+        db.commit()
+        if not post_ids:
+            return {"posts": 0}
+
+        owners = dict(
+            db.query(Post.id, SocialConnection.user_id)
+            .join(SocialConnection, SocialConnection.id == Post.connection_id)
+            .filter(Post.id.in_(post_ids))
+            .all()
+        )
+        for post_id in post_ids:
+            task_analyze.delay(str(post_id), str(owners.get(post_id, "")))
+        logger.info("Retry sweep queued %d posts", len(post_ids))
+        return {"posts": len(post_ids)}
+    finally:
+        db.close()
+
+
+@celery_app.task(bind=True)
+def task_submit_batch_job(self, connection_id: str, user_id: str, prompt_version: str | None = None) -> dict:
+    """Backfill: submit a connection's unanalyzed comments as a Gemini batch job."""
+    db = SessionLocal()
+    try:
+        from app.services.batch_prediction_service import submit_batch_job
+
+        job = submit_batch_job(db, uuid.UUID(connection_id), uuid.UUID(user_id), prompt_version)
+        if job is None:
+            return {"comments": 0}
+        return {"job_id": str(job.id), "requests": job.request_count, "comments": job.comment_count}
+    except Exception as e:
+        logger.exception("Submitting batch job failed for connection %s", connection_id)
+        db.rollback()
         return {"error": str(e)}
     finally:
         db.close()
+
+
+@celery_app.task(bind=True)
+def task_poll_batch_jobs(self) -> dict:
+    """Periodic poll (celery beat): store the results of finished batch jobs."""
+    db = SessionLocal()
+    try:
+        from app.services.batch_prediction_service import poll_batch_job
+
+        # "ingesting" jobs are included so abandoned claims are picked up again
+        jobs = (
+            db.query(AnalysisBatchJob)
+            .filter(AnalysisBatchJob.status.in_(("submitted", "ingesting")))
+            .all()
+        )
+        statuses = {}
+        for job in jobs:
+            try:
+                statuses[str(job.id)] = poll_batch_job(db, job)
+            except Exception:
+                logger.exception("Polling batch job %s failed", job.gemini_batch_name)
+                db.rollback()
+
+        if "completed" in statuses.values():
+            try:
+                from app.core.cache import invalidate_pattern
+                invalidate_pattern("dashboard_summary")
+                invalidate_pattern("dashboard_trends")
+            except Exception:
+                pass
+        return statuses
+    finally:
+        db.close()
@@ -0,0 +1,217 @@
+"""
+Benchmark: dashboard summary queries, legacy per-metric queries vs the
+consolidated grouped scan used by ``_build_dashboard_summary``.
+
+Seeds a database with one user, a few connections and N comments (default
+1,000,000, ~80% analyzed) and reports statement count and latency of each
+path.
+
+Usage (from backend/):
+    python -m benchmarks.bench_dashboard_summary --comments 1000000
+    python -m benchmarks.bench_dashboard_summary --db postgresql://... --comments 1000000
+
+The default database is a SQLite file in the system temp dir; it is reused
+on later runs when it already holds the requested number of comments.
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from sqlalchemy import create_engine, event, func, insert, update  # noqa: E402
+from sqlalchemy.orm import Session  # noqa: E402
+
+from app.db.session import Base  # noqa: E402
+from app.models import (  # noqa: E402
+    Comment,
+    CommentAnalysis,
+    Post,
+    SocialConnection,
+    User,
+)
+from app.routers.dashboard import _build_dashboard_summary  # noqa: E402
+
+N_CONNECTIONS = 4
+N_POSTS = 2000
+INSERT_CHUNK = 20_000
+
+
+def seed(db: Session, n_comments: int) -> uuid.UUID:
+    rng = random.Random(42)
+    now = datetime.now(timezone.utc)
+    user = User(id=uuid.uuid4(), email="bench@example.com", password_hash="x", name="Bench")
+    db.add(user)
+    connections = [
+        SocialConnection(
+            id=uuid.uuid4(), user_id=user.id, platform="youtube",
+            username=f"@bench{i}", status="active",
+        )
+        for i in range(N_CONNECTIONS)
+    ]
+    db.add_all(connections)
+    db.flush()
+
+    posts = [
+        {
+            "id": uuid.uuid4(),
+            "connection_id": connections[i % N_CONNECTIONS].id,
+            "platform": "youtube",
+            "platform_post_id": f"post_{i}",
+            "post_type": "video",
+            "published_at": now - timedelta(days=i % 365),
+        }
+        for i in range(N_POSTS)
+    ]
+    db.execute(insert(Post), posts)
+
+    for start in range(0, n_comments, INSERT_CHUNK):
+        comments, analyses, pointers = [], [], []
+        for i in range(start, min(start + INSERT_CHUNK, n_comments)):
+            post = posts[i % N_POSTS]
+            comment_id = uuid.uuid4()
+            analyzed = rng.random() < 0.8
+            comments.append({
+                "id": comment_id,
+                "post_id": post["id"],
+                "connection_id": post["connection_id"],
+                "platform": "youtube",
+                "platform_comment_id": f"c{i}",
+                "like_count": rng.randint(0, 50),
+                "published_at": post["published_at"],
+                "text_original": "comentario",
+                "text_clean": "comentario",
+                "status": "processed" if analyzed else "pending",
+            })
+            if analyzed:
+                analysis_id = uuid.uuid4()
+                analyses.append({
+                    "id": analysis_id,
+                    "comment_id": comment_id,
+                    "model": "bench",
+                    "prompt_version": "v1",
+                    "score_0_10": rng.uniform(0, 10),
+                    "polarity": rng.uniform(-1, 1),
+                    "confidence": 0.9,
+                })
+                pointers.append({"id": comment_id, "latest_analysis_id": analysis_id})
+        db.execute(insert(Comment), comments)
+        db.execute(insert(CommentAnalysis), analyses)
+        db.execute(update(Comment), pointers)
+        db.commit()
+        print(f"  seeded {min(start + INSERT_CHUNK, n_comments):,} comments", end="\r")
+    print()
+    return user.id
+
+
+def legacy_summary(db: Session, user_id: str) -> dict:
+    """The per-metric query sequence the summary used before consolidation."""
+    conn_ids = [
+        c.id for c in db.query(SocialConnection)
+        .filter(SocialConnection.user_id == uuid.UUID(user_id)).all()
+    ]
+    in_conns = Comment.connection_id.in_(conn_ids)
+    latest = (Comment, Comment.latest_analysis_id == CommentAnalysis.id)
+
+    result = {
+        "total_posts": db.query(func.count(Post.id)).filter(Post.connection_id.in_(conn_ids)).scalar(),
+        "total_comments": db.query(func.count(Comment.id)).filter(in_conns).scalar(),
+        "total_analyzed": db.query(func.count(Comment.id)).filter(in_conns, Comment.status == "processed").scalar(),
+    }
+    db.query(Post.connection_id, func.count(Post.id)).filter(
+        Post.connection_id.in_(conn_ids)).group_by(Post.connection_id).all()
+    db.query(Comment.connection_id, func.count(Comment.id)).filter(
+        in_conns, Comment.status == "processed").group_by(Comment.connection_id).all()
+    avg = db.query(func.avg(CommentAnalysis.score_0_10), func.avg(CommentAnalysis.polarity)).join(
+        *latest).filter(in_conns).first()
+    result["avg_score"] = round(avg[0], 2) if avg[0] else None
+    for name, condition in (
+        ("negative", CommentAnalysis.score_0_10 < 4),
+        ("neutral", CommentAnalysis.score_0_10.between(4, 6)),
+        ("positive", CommentAnalysis.score_0_10 > 6),
+    ):
+        result[name] = db.query(func.count(CommentAnalysis.id)).join(*latest).filter(
+            in_conns, condition).scalar()
+    db.query(Post).filter(Post.connection_id.in_(conn_ids)).order_by(
+        Post.published_at.desc().nullslast()).limit(10).all()
+    return result
+
+
+def measure(engine, fn, repeat: int) -> tuple[int, list[float], object]:
+    statements = []
+    listener = lambda *args: statements.append(args[2])  # noqa: E731
+    timings = []
+    result = None
+    for _ in range(repeat):
+        statements.clear()
+        with Session(engine) as db:
+            event.listen(engine, "before_cursor_execute", listener)
+            started = time.perf_counter()
+            try:
+                result = fn(db)
+            finally:
+                event.remove(engine, "before_cursor_execute", listener)
+            timings.append(time.perf_counter() - started)
+    return len(statements), timings, result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--comments", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--db", default=None, help="SQLAlchemy URL (default: SQLite file in temp dir)")
+    args = parser.parse_args()
+
+    url = args.db or "sqlite:///" + os.path.join(
+        tempfile.gettempdir(), f"sentimenta_bench_{args.comments}.db"
+    )
+    engine = create_engine(url)
+    Base.metadata.create_all(engine)
+
+    with Session(engine) as db:
+        user = db.query(User).filter(User.email == "bench@example.com").first()
+        existing = db.query(func.count(Comment.id)).scalar()
+        if user is None or existing != args.comments:
+            if user is not None:
+                sys.exit(f"{url} holds {existing:,} comments; use another --db or delete it")
+            print(f"Seeding {args.comments:,} comments into {url} ...")
+            started = time.perf_counter()
+            user_id = str(seed(db, args.comments))
+            print(f"Seeded in {time.perf_counter() - started:.1f}s")
+        else:
+            user_id = str(user.id)
+
+    consolidated = _build_dashboard_summary.__wrapped__
+    rows = [
+        ("legacy per-metric", lambda db: legacy_summary(db, user_id)),
+        ("consolidated", lambda db: consolidated(user_id, db)),
+    ]
+    print(f"\n{'path':<20}{'queries':>9}{'median ms':>12}{'min ms':>10}")
+    results = {}
+    for name, fn in rows:
+        n_statements, timings, results[name] = measure(engine, fn, args.repeat)
+        print(
+            f"{name:<20}{n_statements:>9}"
+            f"{statistics.median(timings) * 1000:>12.1f}{min(timings) * 1000:>10.1f}"
+        )
+
+    legacy, new = results["legacy per-metric"], results["consolidated"]
+    assert legacy["total_comments"] == new["total_comments"]
+    assert legacy["total_analyzed"] == new["total_analyzed"]
+    assert legacy["avg_score"] == new["avg_score"]
+    assert [legacy[k] for k in ("negative", "neutral", "positive")] == [
+        new["sentiment_distribution"][k] for k in ("negative", "neutral", "positive")
+    ]
+
+
+if __name__ == "__main__":
+    main()
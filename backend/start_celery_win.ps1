@@ -3,7 +3,9 @@
 
 param(
     [string]$Pool = "solo",
-    [string]$LogLevel = "info"
+    [string]$LogLevel = "info",
+    # ingest, analysis, aggregation (vírgula separa); vazio = todas
+    [string]$Queues = ""
 )
 
 Write-Host "🚀 Iniciando Celery Worker (Windows Mode)" -ForegroundColor Green
@@ -24,4 +26,8 @@ try {
 
 # Inicia o worker
 $env:PYTHONPATH = "."
-celery -A app.tasks.celery_app worker --loglevel=$LogLevel --pool=$Pool
+if ($Queues) {
+    celery -A app.tasks.celery_app worker --loglevel=$LogLevel --pool=$Pool -Q $Queues
+} else {
+    celery -A app.tasks.celery_app worker --loglevel=$LogLevel --pool=$Pool
+}
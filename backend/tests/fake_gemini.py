@@ -0,0 +1,269 @@
+"""
+Minimal fake of the Gemini REST API for tests.
+
+Runs a threaded HTTP server on localhost that answers ``generateContent``
+calls with a well-formed sentiment payload (compact ``{"r": [...]}`` rows)
+for every comment id found in the prompt, after an optional artificial
+latency. ``streamGenerateContent`` calls get the same payload as SSE events
+of ``stream_chunk_chars`` characters, ``stream_delay`` seconds apart; with
+``stall_after`` the stream hangs after that many events. ``cachedContents``
+are kept in ``caches`` and prepended to the prompts that reference them.
+
+Batch prediction is faked too: job files uploaded through the resumable
+Files API are kept in ``files``, ``batchGenerateContent`` answers every
+line of the input file (see ``batch_output_line``) and the batch reports
+``batch_final_state`` after ``batch_pending_polls`` polls.
+"""
+
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from app.services.llm_client import COMPACT_FIELDS
+
+# Comment lines of the compact prompt: "<n>\t<text>"
+_ID_PATTERN = re.compile(r"^(\d+)\t", re.MULTILINE)
+
+
+def _prompt_of(body: dict) -> str:
+    return "".join(
+        part.get("text", "")
+        for content in body.get("contents", [])
+        for part in content.get("parts", [])
+    )
+
+
+def _result_text(items: list[dict]) -> str:
+    return json.dumps({"r": [
+        [int(item["comment_id"])] + [item[key] for key in COMPACT_FIELDS[1:]]
+        for item in items
+    ]}, separators=(",", ":"))
+
+
+class FakeGemini:
+    """Threaded fake Gemini server. Use as a context manager."""
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        stream_chunk_chars: int = 40,
+        stream_delay: float = 0.0,
+        stall_after: int | None = None,
+        batch_pending_polls: int = 0,
+        batch_final_state: str = "BATCH_STATE_SUCCEEDED",
+    ):
+        self.latency = latency
+        self.stream_chunk_chars = stream_chunk_chars
+        self.stream_delay = stream_delay
+        self.stall_after = stall_after
+        self.requests: list[dict] = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.connections = 0
+        self.caches: dict[str, str] = {}
+        self.batch_pending_polls = batch_pending_polls
+        self.batch_final_state = batch_final_state
+        self.files: dict[str, bytes] = {}
+        self.batches: dict[str, dict] = {}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler_class())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def status_for(self, prompt: str) -> int:
+        """HTTP status to answer ``prompt`` with (override to inject errors)."""
+        return 200
+
+    def batch_output_line(self, key: str, request: dict) -> dict | None:
+        """Line of the results file for one request (None leaves it out)."""
+        prompt = _prompt_of(request)
+        status = self.status_for(prompt)
+        if status != 200:
+            return {"key": key, "error": {"code": status, "message": "fake error"}}
+        text = _result_text(self.build_items(prompt))
+        return {"key": key, "response": {
+            "candidates": [{"content": {"parts": [{"text": text}]}}],
+            "usageMetadata": {"promptTokenCount": len(prompt) // 4, "candidatesTokenCount": len(text) // 4},
+        }}
+
+    def _run_batch(self, name: str) -> str:
+        """Answers every line of the batch input; returns the results file name."""
+        lines = []
+        for raw in self.files[self.batches[name]["input"]].splitlines():
+            if raw.strip():
+                line = json.loads(raw)
+                output = self.batch_output_line(line["key"], line["request"])
+                if output is not None:
+                    lines.append(json.dumps(output))
+        output_name = f"files/{name.split('/')[1]}-results"
+        self.files[output_name] = ("\n".join(lines) + "\n").encode("utf-8")
+        return output_name
+
+    def build_items(self, prompt: str) -> list[dict]:
+        return [
+            {
+                "comment_id": comment_id,
+                "score_0_10": 8,
+                "polarity": 0.6,
+                "intensity": 0.5,
+                "emotions": ["alegria"],
+                "sarcasm": False,
+                "topics": ["teste"],
+                "summary_pt": "Comentario positivo",
+                "confidence": 0.9,
+            }
+            for comment_id in _ID_PATTERN.findall(prompt)
+        ]
+
+    def _handler_class(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # Keep-alive, so tests can see connection reuse
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                with fake._lock:
+                    fake.connections += 1
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                path = self.path.split("?")[0]
+                name = path[1:]
+                if name in fake.batches:
+                    with fake._lock:
+                        batch = fake.batches[name]
+                        batch["polls"] += 1
+                        state = "BATCH_STATE_RUNNING"
+                        if batch["polls"] > fake.batch_pending_polls:
+                            state = fake.batch_final_state
+                        if state == "BATCH_STATE_SUCCEEDED" and "output" not in batch:
+                            batch["output"] = fake._run_batch(name)
+                    data = {"name": name, "metadata": {"state": state}}
+                    if state == "BATCH_STATE_SUCCEEDED":
+                        data["done"] = True
+                        data["response"] = {"responsesFile": batch["output"]}
+                    self._send_json(200, data)
+                    return
+                if path.startswith("/download/v1beta/") and path.endswith(":download"):
+                    data = fake.files.get(path[len("/download/v1beta/"):-len(":download")])
+                    if data is None:
+                        self._send_json(404, {"error": {"code": 404}})
+                        return
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/octet-stream")
+                    self.send_header("Content-Length", str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+                    return
+                self._send_json(404, {"error": {"code": 404}})
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                raw = self.rfile.read(length)
+                path = self.path.split("?")[0]
+                if path.startswith("/upload-session/"):
+                    with fake._lock:
+                        name = f"files/{len(fake.files) + 1}"
+                        fake.files[name] = raw
+                    self._send_json(200, {"file": {"name": name, "sizeBytes": str(len(raw))}})
+                    return
+                body = json.loads(raw or b"{}")
+                if path.startswith("/upload/v1beta/files"):
+                    session = f"{fake.base_url}/upload-session/{len(fake.files) + 1}"
+                    self._send_json(200, {}, {"X-Goog-Upload-URL": session})
+                    return
+                if path.endswith(":batchGenerateContent"):
+                    with fake._lock:
+                        name = f"batches/{len(fake.batches) + 1}"
+                        fake.batches[name] = {"input": body["batch"]["input_config"]["file_name"], "polls": 0}
+                        fake.requests.append({"path": self.path, "body": body, "ids": [], "status": 200})
+                    self._send_json(200, {"name": name, "metadata": {"state": "BATCH_STATE_PENDING"}})
+                    return
+                prompt = _prompt_of(body)
+                if self.path.startswith("/cachedContents"):
+                    with fake._lock:
+                        name = f"cachedContents/{len(fake.caches) + 1}"
+                        fake.caches[name] = prompt
+                    self._send_json(200, {"name": name, "usageMetadata": {"totalTokenCount": len(prompt) // 4}})
+                    return
+                cached = body.get("cachedContent")
+                if cached:
+                    prompt = fake.caches.get(cached, "") + prompt
+
+                with fake._lock:
+                    fake.in_flight += 1
+                    fake.max_in_flight = max(fake.max_in_flight, fake.in_flight)
+                if fake.latency:
+                    time.sleep(fake.latency)
+                status = fake.status_for(prompt)
+                if cached and cached not in fake.caches:
+                    status = 404
+                items = fake.build_items(prompt) if status == 200 else []
+                with fake._lock:
+                    fake.in_flight -= 1
+                    fake.requests.append({
+                        "path": self.path,
+                        "body": body,
+                        "ids": [item["comment_id"] for item in items],
+                        "status": status,
+                    })
+                if status != 200:
+                    self._send_json(status, {"error": {"code": status}})
+                    return
+
+                if ":streamGenerateContent" in self.path:
+                    self._stream(_result_text(items))
+                    return
+
+                self._send_json(200, {
+                    "candidates": [{"content": {"parts": [{"text": _result_text(items)}]}}]
+                })
+
+            def _send_json(self, status, data, headers=None):
+                payload = json.dumps(data).encode("utf-8")
+                self.send_response(status)
+                for header, value in (headers or {}).items():
+                    self.send_header(header, value)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _stream(self, text):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                self.close_connection = True
+                size = fake.stream_chunk_chars
+                pieces = [text[i:i + size] for i in range(0, len(text), size)]
+                for n, piece in enumerate(pieces):
+                    if fake.stall_after is not None and n >= fake.stall_after:
+                        time.sleep(1.0)
+                        return
+                    event = {"candidates": [{"content": {"parts": [{"text": piece}]}}]}
+                    if n == len(pieces) - 1:
+                        event["usageMetadata"] = {"totalTokenCount": len(text) // 4}
+                    self.wfile.write(f"data: {json.dumps(event)}\r\n\r\n".encode("utf-8"))
+                    if fake.stream_delay:
+                        time.sleep(fake.stream_delay)
+
+        return Handler
@@ -0,0 +1,388 @@
+"""Tests for the comment analysis service."""
+
+import hashlib
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import event
+from sqlalchemy.dialects import postgresql
+
+from app.core.config import settings
+from app.models.analysis import CommentAnalysis, PostAnalysisSummary
+from app.models.comment import Comment
+from app.models.post import Post
+from app.services import analysis_service, llm_client
+from tests.fake_gemini import FakeGemini
+
+
+def _create_post_with_comments(
+    db, connection, n_comments: int = 0, prefix: str = "p", texts: list[str] | None = None
+) -> Post:
+    post = Post(
+        id=uuid.uuid4(),
+        connection_id=connection.id,
+        platform="youtube",
+        platform_post_id=f"{prefix}_video",
+        post_type="video",
+        content_text="Video de teste",
+        content_clean="video de teste",
+        published_at=datetime.now(timezone.utc),
+    )
+    db.add(post)
+    db.flush()
+    texts = texts or [f"comentario {prefix} {i}" for i in range(n_comments)]
+    for i, text in enumerate(texts):
+        db.add(Comment(
+            post_id=post.id,
+            connection_id=connection.id,
+            platform="youtube",
+            platform_comment_id=f"{prefix}_c{i}",
+            text_original=text,
+            text_clean=text,
+            text_hash=hashlib.sha256(text.encode("utf-8")).hexdigest(),
+            like_count=i,
+            status="pending",
+        ))
+    db.commit()
+    return post
+
+
+def test_concurrent_batches_cut_wall_clock_time(db, test_connection, monkeypatch):
+    sequential_post = _create_post_with_comments(db, test_connection, 8, prefix="seq")
+    concurrent_post = _create_post_with_comments(db, test_connection, 8, prefix="conc")
+
+    with FakeGemini(latency=0.3) as fake:
+        monkeypatch.setattr(llm_client, "GEMINI_BASE_URL", fake.base_url)
+
+        started = time.perf_counter()
+        sequential_stats = analysis_service.analyze_post_comments(
+            db, sequential_post.id, batch_size=2, max_concurrency=1
+        )
+        sequential_elapsed = time.perf_counter() - started
+        assert fake.max_in_flight == 1
+
+        started = time.perf_counter()
+        concurrent_stats = analysis_service.analyze_post_comments(
+            db, concurrent_post.id, batch_size=2, max_concurrency=4
+        )
+        concurrent_elapsed = time.perf_counter() - started
+
+    assert sequential_stats["llm_calls"] == concurrent_stats["llm_calls"] == 4
+    assert sequential_stats["analyzed"] == concurrent_stats["analyzed"] == 8
+    assert fake.max_in_flight == 4
+    assert concurrent_elapsed < sequential_elapsed / 2
+
+    assert db.query(CommentAnalysis).count() == 16
+    assert db.query(Comment).filter(Comment.status == "processed").count() == 16
+
+
+def test_identical_texts_are_analyzed_once_across_posts(db, test_connection, monkeypatch):
+    first_post = _create_post_with_comments(
+        db, test_connection, prefix="a",
+        texts=["Lindo demais!", "Lindo demais!", "top de linha", "Lindo demais!"],
+    )
+    second_post = _create_post_with_comments(
+        db, test_connection, prefix="b", texts=["Lindo demais!", "top de linha", "nunca visto"]
+    )
+
+    with FakeGemini() as fake:
+        monkeypatch.setattr(llm_client, "GEMINI_BASE_URL", fake.base_url)
+
+        first_stats = analysis_service.analyze_post_comments(db, first_post.id)
+        assert first_stats["llm_calls"] == 1
+        assert first_stats["analyzed"] == 4
+        assert first_stats["cache_hits"] == 0
+        # Only the two unique texts reached the LLM
+        assert len(fake.requests[0]["ids"]) == 2
+
+        second_stats = analysis_service.analyze_post_comments(db, second_post.id)
+        assert second_stats["cache_hits"] == 2
+        assert second_stats["llm_calls"] == 1
+        assert len(fake.requests[1]["ids"]) == 1
+
+    assert db.query(CommentAnalysis).count() == 7
+    assert db.query(Comment).filter(Comment.status == "processed").count() == 7
+
+
+def _llm_result(comment_id, confidence=0.9) -> dict:
+    return {
+        "comment_id": str(comment_id),
+        "score_0_10": 7.0,
+        "polarity": 0.4,
+        "intensity": 0.3,
+        "emotions": ["alegria"],
+        "topics": [],
+        "sarcasm": False,
+        "summary_pt": "ok" if confidence else "Erro na análise",
+        "confidence": confidence,
+    }
+
+
+def test_storing_results_uses_constant_statements(db, test_connection):
+    post = _create_post_with_comments(db, test_connection, 100, prefix="bulk")
+    comment_ids = [c.id for c in db.query(Comment.id).filter(Comment.post_id == post.id)]
+    stats = {"analyzed": 0, "errors": 0}
+
+    def statements_for(results) -> int:
+        statements = []
+
+        def count(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        engine = db.get_bind()
+        event.listen(engine, "before_cursor_execute", count)
+        try:
+            analysis_service.store_analysis_results(db, results, "v1", stats)
+            db.flush()
+        finally:
+            event.remove(engine, "before_cursor_execute", count)
+        return len(statements)
+
+    small = statements_for([_llm_result(cid) for cid in comment_ids[:10]])
+    # 90 new rows, 10 re-analyzed rows and 5 failures
+    large = statements_for(
+        [_llm_result(cid) for cid in comment_ids[5:]]
+        + [_llm_result(cid, confidence=0) for cid in comment_ids[:5]]
+    )
+    db.commit()
+
+    assert small <= 4
+    assert large <= 6
+    assert db.query(CommentAnalysis).count() == 100
+    assert db.query(Comment).filter(Comment.status == "processed").count() == 95
+    failed = db.query(Comment).filter(Comment.status == "error").all()
+    assert len(failed) == 5
+    assert all(c.last_error == "Erro na análise" for c in failed)
+
+
+def test_post_summary_aggregates(db, test_connection):
+    post = _create_post_with_comments(db, test_connection, 4, prefix="sum")
+    comments = db.query(Comment).filter(Comment.post_id == post.id).order_by(Comment.like_count).all()
+    # log2(likes + 2) weights 1, 2, 3, 4
+    for comment, likes in zip(comments, [0, 2, 6, 14]):
+        comment.like_count = likes
+    for comment, score, emotions in zip(
+        comments,
+        [2.0, 5.0, 8.0, None],
+        [["raiva"], ["neutro"], ["alegria", "surpresa"], None],
+    ):
+        db.add(CommentAnalysis(
+            comment_id=comment.id,
+            model=settings.GEMINI_MODEL,
+            prompt_version="v1",
+            score_0_10=score,
+            emotions=emotions,
+            topics=["produto"] if score else [],
+            confidence=0.8 if score else 0.0,
+        ))
+    db.commit()
+
+    summary = analysis_service.generate_post_summary(db, post.id)
+
+    assert summary.total_comments == 4
+    assert summary.total_analyzed == 4
+    assert summary.avg_score == 5.0
+    assert summary.weighted_score == 6.0
+    assert summary.avg_confidence == 0.6
+    assert summary.sentiment_distribution == {"negative": 1, "neutral": 1, "positive": 1}
+    assert summary.emotions_distribution == {"raiva": 1, "neutro": 1, "alegria": 1, "surpresa": 1}
+    assert summary.topics_frequency == {"produto": 3}
+
+
+def test_post_summary_statement_compiles_for_postgres(test_connection):
+    statement = analysis_service._summary_statement(uuid.uuid4(), "v1", test_connection, True)
+    sql = str(statement.compile(dialect=postgresql.dialect()))
+
+    assert sql.count("json_array_elements_text") == 2
+    assert "WITH post_analyses AS" in sql
+
+
+class _VariedGemini(FakeGemini):
+    """Fake whose scores, emotions and topics vary per comment."""
+
+    def build_items(self, prompt):
+        items = super().build_items(prompt)
+        for i, item in enumerate(items):
+            item["score_0_10"] = (3 * i + 1) % 11
+            item["emotions"] = [["raiva"], ["alegria", "surpresa"], ["neutro"]][i % 3]
+            item["topics"] = ["produto"] if i % 2 else ["preco", "entrega"]
+        return items
+
+
+def test_post_summary_is_updated_incrementally(db, test_connection, monkeypatch):
+    post = _create_post_with_comments(db, test_connection, 5, prefix="inc")
+
+    with _VariedGemini() as fake:
+        monkeypatch.setattr(llm_client, "GEMINI_BASE_URL", fake.base_url)
+        analysis_service.analyze_post_comments(db, post.id, batch_size=2)
+
+        for i in range(5, 9):
+            text = f"comentario novo {i}"
+            db.add(Comment(
+                post_id=post.id,
+                connection_id=test_connection.id,
+                platform="youtube",
+                platform_comment_id=f"inc_c{i}",
+                text_original=text,
+                text_clean=text,
+                like_count=3 * i,
+                status="pending",
+            ))
+        db.commit()
+
+        rebuilds = []
+        original_rebuild = analysis_service.generate_post_summary
+        monkeypatch.setattr(
+            analysis_service, "generate_post_summary",
+            lambda *args, **kwargs: rebuilds.append(args) or original_rebuild(*args, **kwargs),
+        )
+        stats = analysis_service.analyze_post_comments(db, post.id, batch_size=3)
+
+    assert stats["analyzed"] == 4
+    assert rebuilds == []
+
+    summary = db.query(PostAnalysisSummary).filter(PostAnalysisSummary.post_id == post.id).one()
+    incremental = {
+        field: getattr(summary, field)
+        for field in (
+            "total_comments", "total_analyzed", "avg_score", "avg_polarity",
+            "avg_intensity", "avg_confidence", "weighted_score",
+            "emotions_distribution", "topics_frequency", "sentiment_distribution",
+        )
+    }
+
+    rebuilt = original_rebuild(db, post.id)
+    assert incremental["total_analyzed"] == 9
+    assert incremental == {field: getattr(rebuilt, field) for field in incremental}
+
+
+def test_replacing_a_scored_analysis_rebuilds_the_summary(db, test_connection, monkeypatch):
+    post = _create_post_with_comments(db, test_connection, 3, prefix="rep")
+    with _VariedGemini() as fake:
+        monkeypatch.setattr(llm_client, "GEMINI_BASE_URL", fake.base_url)
+        analysis_service.analyze_post_comments(db, post.id)
+
+    # Likes changed since the analysis was added to the running totals
+    comment = db.query(Comment).filter_by(platform_comment_id="rep_c1").one()
+    comment.like_count = 500
+    db.commit()
+
+    delta = analysis_service._empty_totals("v1")
+    analysis_service.store_analysis_results(
+        db,
+        [{"comment_id": str(comment.id), "score_0_10": 1.0, "polarity": -0.8, "confidence": 0.9}],
+        "v1",
+        {"analyzed": 0, "errors": 0},
+        summary_delta=delta,
+    )
+    summary = analysis_service._apply_summary_delta(db, post, test_connection, delta)
+
+    fields = ("total_analyzed", "avg_score", "weighted_score", "sentiment_distribution")
+    updated = {field: getattr(summary, field) for field in fields}
+    rebuilt = analysis_service.generate_post_summary(db, post.id)
+    assert updated == {field: getattr(rebuilt, field) for field in fields}
+
+
+class _ForgetfulGemini(FakeGemini):
+    """Fake that leaves the last comment out of every multi-comment answer."""
+
+    def build_items(self, prompt):
+        items = super().build_items(prompt)
+        return items[:-1] if len(items) > 1 else items
+
+
+class _PoisonGemini(FakeGemini):
+    """Fake that rejects any request containing the poison comment."""
+
+    def status_for(self, prompt):
+        return 400 if "veneno" in prompt else 200
+
+
+def test_missing_ids_are_requested_again(db, test_connection, monkeypatch):
+    post = _create_post_with_comments(db, test_connection, 6, prefix="miss")
+
+    with _ForgetfulGemini() as fake:
+        monkeypatch.setattr(llm_client, "GEMINI_BASE_URL", fake.base_url)
+        stats = analysis_service.analyze_post_comments(db, post.id, batch_size=3, max_concurrency=1)
+
+    assert stats["errors"] == 0
+    assert stats["analyzed"] == 6
+    assert stats["retried"] >= 2
+    assert db.query(Comment).filter(Comment.status == "processed").count() == 6
+    # Each comment is sent at most LLM_MAX_COMMENT_ATTEMPTS times
+    sent = Counter(cid for request in fake.requests for cid in request["ids"])
+    assert max(sent.values()) <= settings.LLM_MAX_COMMENT_ATTEMPTS
+
+
+def test_failing_batch_is_bisected_down_to_the_poison_comment(db, test_connection, monkeypatch):
+    texts = [f"comentario {i}" for i in range(7)] + ["veneno"]
+    post = _create_post_with_comments(db, test_connection, prefix="poison", texts=texts)
+
+    with _PoisonGemini() as fake:
+        monkeypatch.setattr(llm_client, "GEMINI_BASE_URL", fake.base_url)
+        stats = analysis_service.analyze_post_comments(db, post.id, batch_size=8, max_concurrency=1)
+
+    # 8 -> 4 + 4 -> 2 + 2 -> 1 + 1, without retrying the same failing batch
+    assert stats["llm_calls"] == 7
+    assert stats["errors"] == 1
+    failed = db.query(Comment).filter(Comment.status == "error").one()
+    assert failed.text_clean == "veneno"
+    assert failed.analysis_attempts == 1
+    assert failed.next_retry_at is not None
+    assert db.query(Comment).filter(Comment.status == "processed").count() == 7
+
+
+def test_sweeper_requeues_due_errors_with_backoff(db, test_connection, monkeypatch):
+    post = _create_post_with_comments(db, test_connection, prefix="sweep", texts=["veneno"])
+
+    with _PoisonGemini() as fake:
+        monkeypatch.setattr(llm_client, "GEMINI_BASE_URL", fake.base_url)
+        analysis_service.analyze_post_comments(db, post.id)
+        comment = db.query(Comment).filter(Comment.post_id == post.id).one()
+        first_retry = comment.next_retry_at.replace(tzinfo=timezone.utc)
+
+        # Not due yet
+        assert analysis_service.requeue_failed_comments(db) == []
+        assert analysis_service.requeue_failed_comments(db, now=first_retry) == [post.id]
+        db.commit()
+        db.refresh(comment)
+        assert comment.status == "pending"
+
+        analysis_service.analyze_post_comments(db, post.id)
+        db.refresh(comment)
+        assert comment.analysis_attempts == 2
+        second_retry = comment.next_retry_at.replace(tzinfo=timezone.utc)
+        assert second_retry - first_retry > timedelta(seconds=settings.ANALYSIS_RETRY_BASE_DELAY)
+
+    with FakeGemini() as fake:
+        monkeypatch.setattr(llm_client, "GEMINI_BASE_URL", fake.base_url)
+        analysis_service.requeue_failed_comments(db, now=second_retry)
+        db.commit()
+        analysis_service.analyze_post_comments(db, post.id)
+
+    db.refresh(comment)
+    assert comment.status == "processed"
+    assert comment.analysis_attempts == 0
+    assert comment.next_retry_at is None
+
+
+def test_streamed_results_are_stored_while_the_batch_runs(db, test_connection, monkeypatch):
+    post = _create_post_with_comments(db, test_connection, 10, prefix="stream")
+    monkeypatch.setattr(analysis_service, "STREAM_FLUSH_INTERVAL", 0.05)
+    progress = []
+
+    with FakeGemini(stream_chunk_chars=40, stream_delay=0.05) as fake:
+        monkeypatch.setattr(llm_client, "GEMINI_BASE_URL", fake.base_url)
+        stats = analysis_service.analyze_post_comments(
+            db, post.id, stream=True, on_progress=lambda s: progress.append(s["analyzed"]),
+        )
+
+    assert stats["llm_calls"] == 1
+    assert stats["analyzed"] == 10
+    # Several commits during the single call, not one at its end
+    assert len(progress) > 2
+    assert progress[0] < 10
+    assert progress == sorted(progress)
+    assert db.query(Comment).filter(Comment.status == "processed").count() == 10
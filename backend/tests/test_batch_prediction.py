@@ -0,0 +1,158 @@
+"""Tests for offline batch prediction (JSONL job file + Gemini batch job)."""
+
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.models.analysis import CommentAnalysis, PostAnalysisSummary
+from app.models.analysis_batch_job import AnalysisBatchJob
+from app.models.comment import Comment
+from app.services import batch_prediction_service, llm_client
+from app.services.batch_prediction_service import poll_batch_job, submit_batch_job
+from tests.fake_gemini import FakeGemini
+from tests.test_analysis_service import _create_post_with_comments
+
+
+@pytest.fixture
+def fake_gemini(monkeypatch):
+    def start(fake_class=FakeGemini, **kwargs):
+        fake = fake_class(**kwargs).__enter__()
+        monkeypatch.setattr(llm_client, "GEMINI_BASE_URL", fake.base_url)
+        monkeypatch.setattr(batch_prediction_service, "GEMINI_UPLOAD_URL", f"{fake.base_url}/upload/v1beta/files")
+        monkeypatch.setattr(batch_prediction_service, "GEMINI_DOWNLOAD_URL", f"{fake.base_url}/download/v1beta")
+        started.append(fake)
+        return fake
+
+    started = []
+    yield start
+    for fake in started:
+        fake.__exit__(None, None, None)
+
+
+def _job_lines(fake: FakeGemini) -> list[dict]:
+    return [json.loads(line) for line in fake.files["files/1"].splitlines()]
+
+
+def test_backfill_runs_through_a_batch_job(db, test_connection, fake_gemini, monkeypatch):
+    monkeypatch.setattr(batch_prediction_service.settings, "LLM_OUTPUT_TOKEN_BUDGET", 240)
+    first = _create_post_with_comments(db, test_connection, 5, prefix="a")
+    second = _create_post_with_comments(
+        db, test_connection, prefix="b", texts=["igual", "igual", "outro"]
+    )
+    fake = fake_gemini(batch_pending_polls=1)
+
+    job = submit_batch_job(db, test_connection.id, test_connection.user_id)
+
+    # 5 comments / 4 per request on the first post, one request for the second
+    lines = _job_lines(fake)
+    assert [line["key"] for line in lines] == ["1", "2", "3"]
+    assert "generationConfig" in lines[0]["request"]
+    assert job.request_count == 3
+    assert job.comment_count == 8
+    assert not any(":generateContent" in r["path"] for r in fake.requests)
+    assert {c.status for c in db.query(Comment).all()} == {"batched"}
+
+    assert poll_batch_job(db, job) == "submitted"
+    assert job.gemini_state == "BATCH_STATE_RUNNING"
+
+    assert poll_batch_job(db, job) == "completed"
+    assert job.comments_analyzed == 8
+    assert job.errors_count == 0
+    assert job.total_cost_usd > 0
+    assert {c.status for c in db.query(Comment).all()} == {"processed"}
+    assert db.query(CommentAnalysis).count() == 8
+    for post in (first, second):
+        summary = db.query(PostAnalysisSummary).filter_by(post_id=post.id).one()
+        assert summary.total_analyzed == len(post.comments)
+
+    # Usage is counted once per text sent, not once per duplicate comment
+    costs = sorted(
+        cost
+        for (cost,) in db.query(CommentAnalysis.cost_estimate_usd)
+        .join(Comment, Comment.id == CommentAnalysis.comment_id)
+        .filter(Comment.post_id == second.id, Comment.text_clean == "igual")
+    )
+    assert costs[0] == 0 and costs[1] > 0
+    total = sum(cost for (cost,) in db.query(CommentAnalysis.cost_estimate_usd))
+    assert total == pytest.approx(job.total_cost_usd)
+
+
+def test_failed_batch_job_releases_comments(db, test_connection, fake_gemini):
+    _create_post_with_comments(db, test_connection, 3, prefix="f")
+    fake_gemini(batch_final_state="BATCH_STATE_EXPIRED")
+
+    job = submit_batch_job(db, test_connection.id, test_connection.user_id)
+    assert poll_batch_job(db, job) == "failed"
+
+    assert {c.status for c in db.query(Comment).all()} == {"pending"}
+    assert db.query(CommentAnalysis).count() == 0
+
+
+def test_unanswered_requests_are_stored_as_retryable_errors(db, test_connection, fake_gemini):
+    class DroppingGemini(FakeGemini):
+        def batch_output_line(self, key, request):
+            if key == "2":
+                return None
+            if key == "3":
+                return {"key": key, "error": {"code": 400, "message": "blocked"}}
+            return super().batch_output_line(key, request)
+
+    _create_post_with_comments(db, test_connection, 1, prefix="x")
+    _create_post_with_comments(db, test_connection, 1, prefix="y")
+    _create_post_with_comments(db, test_connection, 1, prefix="z")
+    fake_gemini(DroppingGemini)
+
+    job = submit_batch_job(db, test_connection.id, test_connection.user_id)
+    assert poll_batch_job(db, job) == "completed"
+
+    assert job.errors_count == 2
+    statuses = sorted(c.status for c in db.query(Comment).all())
+    assert statuses == ["error", "error", "processed"]
+    assert all(c.next_retry_at is not None for c in db.query(Comment).filter_by(status="error"))
+
+
+def test_batched_comments_are_not_submitted_twice(db, test_connection, fake_gemini):
+    _create_post_with_comments(db, test_connection, 2, prefix="t")
+    fake_gemini()
+
+    assert submit_batch_job(db, test_connection.id, test_connection.user_id) is not None
+    assert submit_batch_job(db, test_connection.id, test_connection.user_id) is None
+    assert db.query(AnalysisBatchJob).count() == 1
+
+
+def test_abandoned_ingestion_is_reclaimed_after_the_lease(db, test_connection, fake_gemini):
+    _create_post_with_comments(db, test_connection, 2, prefix="l")
+    fake_gemini()
+    job = submit_batch_job(db, test_connection.id, test_connection.user_id)
+
+    # A worker claimed the job and died while ingesting
+    claimed_at = datetime.now(timezone.utc)
+    job.status = "ingesting"
+    job.claimed_at = claimed_at
+    db.commit()
+
+    assert poll_batch_job(db, job, now=claimed_at + timedelta(minutes=5)) == "ingesting"
+    assert {c.status for c in db.query(Comment).all()} == {"batched"}
+
+    later = claimed_at + batch_prediction_service.INGEST_LEASE + timedelta(minutes=1)
+    assert poll_batch_job(db, job, now=later) == "completed"
+    assert {c.status for c in db.query(Comment).all()} == {"processed"}
+
+
+def test_ingestion_gives_up_after_max_attempts(db, test_connection, fake_gemini, monkeypatch):
+    def broken_ingest(db, llm, job, responses_file):
+        raise ValueError("corrupt results file")
+
+    _create_post_with_comments(db, test_connection, 2, prefix="m")
+    fake_gemini()
+    monkeypatch.setattr(batch_prediction_service, "_ingest_results", broken_ingest)
+    job = submit_batch_job(db, test_connection.id, test_connection.user_id)
+
+    for _ in range(batch_prediction_service.MAX_INGEST_ATTEMPTS - 1):
+        assert poll_batch_job(db, job) == "submitted"
+    assert poll_batch_job(db, job) == "failed"
+
+    assert job.ingest_attempts == batch_prediction_service.MAX_INGEST_ATTEMPTS
+    assert "corrupt results file" in job.error
+    assert {c.status for c in db.query(Comment).all()} == {"pending"}
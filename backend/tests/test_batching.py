@@ -0,0 +1,76 @@
+"""Tests for token-budget batching of comment analysis."""
+
+from collections import deque
+
+from app.core.config import settings
+from app.models.comment import Comment
+from app.services import analysis_service, batching, llm_client
+from app.services.batching import BatchTuner, estimate_text_tokens, next_batch
+from app.services.llm_client import OUTPUT_TOKENS_PER_COMMENT
+from tests.fake_gemini import FakeGemini
+from tests.test_analysis_service import _create_post_with_comments
+
+
+def _pack(texts, input_budget, output_budget, max_items=None) -> list[int]:
+    queue = deque(texts)
+    sizes = []
+    while queue:
+        sizes.append(len(next_batch(queue, lambda text: text, input_budget, output_budget, max_items)))
+    return sizes
+
+
+def test_batches_fill_the_token_budgets():
+    short = ["👍"] * 30
+    long = ["reclamação " * 200] * 4
+
+    assert estimate_text_tokens("👍") < estimate_text_tokens("reclamação " * 200)
+    # Short comments are limited by the output budget only
+    assert _pack(short, 10_000, 20 * OUTPUT_TOKENS_PER_COMMENT) == [20, 10]
+    # Long ones by the input budget; an oversized comment still goes alone
+    assert _pack(long, 1200, 10_000) == [2, 2]
+    assert _pack(long, 100, 10_000) == [1, 1, 1, 1]
+    assert _pack(short, 10_000, 10_000, max_items=8) == [8, 8, 8, 6]
+
+
+def test_tuner_shrinks_on_failures_and_slow_batches():
+    tuner = BatchTuner(latency_target=10)
+    full = tuner.budgets()
+
+    tuner.record(items=50, failed=3, latency=5)
+    assert tuner.budgets()[0] == full[0] // 2
+    tuner.record(items=25, failed=0, latency=30)
+    assert tuner.scale == 0.375
+
+    for _ in range(10):
+        tuner.record(items=40, failed=0, latency=2)
+    assert tuner.budgets() == full
+    assert tuner.stats["failed_batches"] == 1 and tuner.stats["slow_batches"] == 1
+
+
+class _TruncatingGemini(FakeGemini):
+    """Drops every item past the 10th, like a truncated response."""
+
+    def __init__(self):
+        super().__init__()
+        self.batch_sizes = []
+
+    def build_items(self, prompt):
+        items = super().build_items(prompt)
+        self.batch_sizes.append(len(items))
+        return items[:10]
+
+
+def test_analysis_packs_by_budget_and_backs_off_after_truncation(db, test_connection, monkeypatch):
+    monkeypatch.setattr(batching, "_tuners", {})
+    monkeypatch.setattr(settings, "LLM_OUTPUT_TOKEN_BUDGET", 40 * OUTPUT_TOKENS_PER_COMMENT)
+    post = _create_post_with_comments(db, test_connection, 60, prefix="pack")
+
+    with _TruncatingGemini() as fake:
+        monkeypatch.setattr(llm_client, "GEMINI_BASE_URL", fake.base_url)
+        stats = analysis_service.analyze_post_comments(db, post.id, max_concurrency=1)
+
+    # 40 comments in the first request; after its truncated reply, 20 per request
+    assert fake.batch_sizes[:2] == [40, 20]
+    # The truncated items are requested again instead of stored as errors
+    assert stats["errors"] == 0
+    assert db.query(Comment).filter(Comment.status == "processed").count() == 60
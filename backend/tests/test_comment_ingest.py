@@ -0,0 +1,126 @@
+"""Tests for the bulk comment upsert shared by the ingest services."""
+
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import event
+
+from app.models.comment import Comment
+from app.services.comment_ingest_service import (
+    WATERMARK_MARGIN,
+    advance_comment_watermark,
+    bulk_upsert_comments,
+    comment_fetch_limit,
+    needs_comment_refresh,
+    stop_at_watermark,
+)
+
+
+def _rows(connection, n: int, text: str = "comentario") -> list[dict]:
+    return [
+        {
+            "connection_id": connection.id,
+            "platform": "youtube",
+            "platform_comment_id": f"c{i}",
+            "text_original": f"{text} {i}",
+            "text_clean": f"{text} {i}",
+            "like_count": i,
+        }
+        for i in range(n)
+    ]
+
+
+def test_bulk_upsert_uses_constant_statements(db, test_post, test_connection):
+    first_rows = _rows(test_connection, 500)
+    second_rows = _rows(test_connection, 510, text="editado")
+    post_id = test_post.id
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    engine = db.get_bind()
+    event.listen(engine, "before_cursor_execute", count)
+    try:
+        first = bulk_upsert_comments(db, post_id, first_rows, ("like_count", "text_clean"))
+        db.commit()
+        first_statements = len(statements)
+
+        statements.clear()
+        second = bulk_upsert_comments(db, post_id, second_rows, ("like_count", "text_clean"))
+        db.commit()
+        second_statements = len(statements)
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+
+    assert first == {"inserted": 500, "updated": 0}
+    assert second == {"inserted": 10, "updated": 500}
+    # One SELECT for existing ids plus one INSERT and/or UPDATE
+    assert first_statements <= 3
+    assert second_statements <= 4
+
+    assert db.query(Comment).filter(Comment.post_id == post_id).count() == 510
+    updated = db.query(Comment).filter(Comment.platform_comment_id == "c7").one()
+    assert updated.text_clean == "editado 7"
+    assert updated.text_original == "comentario 7"
+    assert updated.status == "pending"
+
+
+def test_bulk_upsert_collapses_repeated_ids(db, test_post, test_connection):
+    rows = _rows(test_connection, 2) + [{**_rows(test_connection, 1)[0], "like_count": 99}]
+
+    written = bulk_upsert_comments(db, test_post.id, rows, ("like_count",))
+    db.commit()
+
+    assert written == {"inserted": 2, "updated": 0}
+    assert db.query(Comment).filter(Comment.platform_comment_id == "c0").one().like_count == 99
+
+
+def test_needs_comment_refresh_policy(test_post):
+    now = datetime.now(timezone.utc)
+    test_post.comment_count = 10
+    test_post.published_at = now - timedelta(days=30)
+    test_post.comments_fetched_at = now - timedelta(hours=2)
+
+    assert needs_comment_refresh(None, 3, now)
+    assert needs_comment_refresh(test_post, 11, now)
+    assert not needs_comment_refresh(test_post, 10, now)
+
+    # Hot posts are re-checked hourly even without a count change
+    test_post.published_at = now - timedelta(hours=5)
+    assert needs_comment_refresh(test_post, 10, now)
+    test_post.comments_fetched_at = now - timedelta(minutes=10)
+    assert not needs_comment_refresh(test_post, 10, now)
+
+    # Safety net for old, static posts
+    test_post.published_at = now - timedelta(days=300)
+    test_post.comments_fetched_at = now - timedelta(days=8)
+    assert needs_comment_refresh(test_post, 10, now)
+
+
+def test_comment_watermark_limits_and_stops(test_post, test_connection):
+    now = datetime.now(timezone.utc)
+    test_post.comment_count = 10
+
+    # No watermark yet: the whole window
+    assert comment_fetch_limit(test_post, 12, 100, now) == 100
+
+    fetched = list(reversed(_rows(test_connection, 10)))  # newest first
+    advance_comment_watermark(test_post, fetched, full=True, now=now)
+    assert test_post.comment_watermark["last_comment_id"] == "c9"
+
+    # After a full fetch only the new comments (plus a margin) are requested
+    assert comment_fetch_limit(test_post, 12, 100, now) == 2 + WATERMARK_MARGIN
+    assert comment_fetch_limit(test_post, 9, 100, now) == WATERMARK_MARGIN
+    assert comment_fetch_limit(test_post, 12, 100, now + timedelta(days=8)) == 100
+
+    newer = [{"platform_comment_id": "c11"}, {"platform_comment_id": "c10"}]
+    assert stop_at_watermark(test_post, newer + fetched[:5]) == newer
+
+    advance_comment_watermark(test_post, newer, full=False, now=now)
+    assert test_post.comment_watermark["last_comment_id"] == "c11"
+    assert test_post.comment_watermark["full_at"] == now.isoformat()
+
+    # A fetch sorted by likes does not start with the newest comment
+    top = [{"platform_comment_id": "c3"}, {"platform_comment_id": "c12"}]
+    advance_comment_watermark(test_post, top, full=True, now=now, newest_first=False)
+    assert test_post.comment_watermark["last_comment_id"] == "c11"
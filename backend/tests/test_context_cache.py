@@ -0,0 +1,106 @@
+"""Tests for Gemini context caching of the prompt prefix."""
+
+import uuid
+
+import pytest
+
+from app.models.comment import Comment
+from app.services import analysis_service, context_cache, llm_client
+from app.services.context_cache import ContextCache
+from app.services.llm_client import LLMClient
+from tests.fake_gemini import FakeGemini
+from tests.test_analysis_service import _create_post_with_comments
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    monkeypatch.setattr(context_cache, "get_redis", lambda: None)
+    instance = ContextCache(ttl=600, min_tokens=0)
+    monkeypatch.setattr(context_cache, "_context_cache", instance)
+    return instance
+
+
+def test_prefix_is_registered_once_until_invalidated(cache):
+    created = []
+
+    def create():
+        created.append(1)
+        return f"cachedContents/{len(created)}"
+
+    assert cache.resolve("m", "prefixo", create) == "cachedContents/1"
+    assert cache.resolve("m", "prefixo", create) == "cachedContents/1"
+    assert cache.resolve("other", "prefixo", create) == "cachedContents/2"
+
+    cache.invalidate("m", "prefixo")
+    assert cache.resolve("m", "prefixo", create) == "cachedContents/3"
+    assert cache.stats["hits"] == 1
+
+
+def test_name_is_kept_locally_when_redis_rejects_writes(monkeypatch):
+    class ReadOnlyRedis:
+        def get(self, key):
+            return None
+
+        def set(self, *args, **kwargs):
+            raise ConnectionError("read only")
+
+    monkeypatch.setattr(context_cache, "get_redis", lambda: ReadOnlyRedis())
+    cache = ContextCache(ttl=600, min_tokens=0)
+    created = []
+
+    def create():
+        created.append(1)
+        return "cachedContents/1"
+
+    assert cache.resolve("m", "prefixo", create) == "cachedContents/1"
+    assert cache.resolve("m", "prefixo", create) == "cachedContents/1"
+    assert len(created) == 1
+    # Creation locks are dropped once the name is known
+    assert cache._creating == {}
+
+
+def test_small_prefixes_are_not_cached(monkeypatch):
+    monkeypatch.setattr(context_cache, "get_redis", lambda: None)
+    cache = ContextCache(min_tokens=1024)
+
+    assert cache.resolve("m", "curto", lambda: pytest.fail("should not create")) is None
+    assert cache.stats["skipped"] == 1
+
+
+def test_post_batches_reference_the_cached_prefix(db, test_connection, cache, monkeypatch):
+    test_connection.persona = "Marca de cosmeticos veganos, tom descontraido"
+    post = _create_post_with_comments(db, test_connection, 6, prefix="cache")
+
+    with FakeGemini() as fake:
+        monkeypatch.setattr(llm_client, "GEMINI_BASE_URL", fake.base_url)
+        stats = analysis_service.analyze_post_comments(db, post.id, batch_size=2, max_concurrency=1)
+
+    generate = [r for r in fake.requests if ":generateContent" in r["path"]]
+    assert len(fake.caches) == 1
+    assert "veganos" in next(iter(fake.caches.values()))
+    assert len(generate) == 3
+    for request in generate:
+        assert request["body"]["cachedContent"] == "cachedContents/1"
+        sent = request["body"]["contents"][0]["parts"][0]["text"]
+        assert "veganos" not in sent
+        assert "REGRAS DE ANÁLISE" not in sent
+    assert stats["errors"] == 0
+    assert db.query(Comment).filter(Comment.status == "processed").count() == 6
+
+
+def test_expired_cache_falls_back_to_the_full_prompt(cache, monkeypatch):
+    comments = [{"comment_id": str(uuid.uuid4()), "text_clean": "Amei"}]
+    context = {"persona": "Loja de roupas"}
+
+    with FakeGemini() as fake:
+        monkeypatch.setattr(llm_client, "GEMINI_BASE_URL", fake.base_url)
+        client = LLMClient(api_key="test")
+        list(client.analyze_comments(comments, context=context, cache_context=True))
+        # Gemini dropped the cache before our TTL
+        fake.caches.clear()
+        results = list(client.analyze_comments(comments, context=context, cache_context=True))
+
+    assert results[0]["score_0_10"] == 8
+    assert cache.stats["invalidated"] == 1
+    # The retry went out without the cache reference
+    assert "cachedContent" not in fake.requests[-1]["body"]
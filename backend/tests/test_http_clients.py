@@ -0,0 +1,48 @@
+"""Tests for the shared pooled HTTP clients."""
+
+import asyncio
+
+from app.core import http
+from app.services import analysis_service, llm_client
+from tests.fake_gemini import FakeGemini
+from tests.test_analysis_service import _create_post_with_comments
+
+
+def test_sync_clients_are_shared_per_profile_and_process(monkeypatch):
+    monkeypatch.setattr(http, "_clients", {})
+    gemini = http.get_http_client("gemini")
+
+    assert http.get_http_client("gemini") is gemini
+    assert http.get_http_client("media") is not gemini
+    assert http.get_http_client("media").follow_redirects
+
+    # A forked worker gets fresh clients
+    monkeypatch.setattr(http, "_clients_pid", -1)
+    assert http.get_http_client("gemini") is not gemini
+
+
+def test_async_clients_are_kept_per_event_loop():
+    async def pair():
+        first = http.get_async_http_client("instagram_graph")
+        async with http.shared_async_client("instagram_graph") as second:
+            assert second is first
+        assert not first.is_closed
+        await http.aclose_http_clients()
+        return first
+
+    first = asyncio.run(pair())
+    assert first.is_closed
+    assert asyncio.run(pair()) is not first
+
+
+def test_analysis_batches_reuse_one_connection(db, test_connection, monkeypatch):
+    monkeypatch.setattr(http, "_clients", {})
+    post = _create_post_with_comments(db, test_connection, 6, prefix="pool")
+
+    with FakeGemini() as fake:
+        monkeypatch.setattr(llm_client, "GEMINI_BASE_URL", fake.base_url)
+        stats = analysis_service.analyze_post_comments(db, post.id, batch_size=1, max_concurrency=1)
+        http.close_http_clients()
+
+    assert stats["llm_calls"] == 6
+    assert fake.connections == 1
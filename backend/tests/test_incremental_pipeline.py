@@ -7,6 +7,7 @@ from app.models.comment import Comment
 from app.models.post import Post
 from app.models.social_connection import SocialConnection
 from app.services import analysis_service
+from app.services.comment_ingest_service import WATERMARK_MARGIN, comment_text_hash
 from app.services.instagram_ingest_service import ingest_instagram_profile
 
 
@@ -194,7 +195,7 @@ def test_analyze_post_comments_skips_existing_analysis(db, test_connection, monk
             self.api_key = api_key
             self.model = model
 
-        def analyze_comments(self, comments_payload, prompt_version):
+        def analyze_comments(self, comments_payload, prompt_version, context=None):
             for item in comments_payload:
                 captured_comment_ids.append(item["comment_id"])
                 yield {
@@ -240,3 +241,127 @@ def test_analyze_post_comments_skips_existing_analysis(db, test_connection, monk
         .count()
     )
     assert analyses_for_existing == 1
+
+
+def test_instagram_resync_skips_unchanged_posts(db, test_user, monkeypatch):
+    user, _ = test_user
+    connection = _create_instagram_connection(db, user.id)
+    old = "2026-01-01T10:00:00+00:00"
+    listing = [
+        {"platform_post_id": f"P{i}", "timestamp": old, "comment_count": 1, "like_count": 0}
+        for i in range(5)
+    ]
+    fetched = []
+
+    def fake_comments(post_id, max_comments):
+        fetched.append(post_id)
+        return [{"platform_comment_id": f"{post_id}_c", "text": "oi", "username": "u"}]
+
+    monkeypatch.setattr(
+        "app.services.instagram_ingest_service.fetch_recent_posts",
+        lambda username, max_posts, since_date: listing,
+    )
+    monkeypatch.setattr("app.services.instagram_ingest_service.fetch_post_comments", fake_comments)
+
+    ingest_instagram_profile(db, connection)
+    assert len(fetched) == 5
+
+    # Only P2 gained a comment since the last sync
+    fetched.clear()
+    listing[2] = {**listing[2], "comment_count": 2}
+    stats = ingest_instagram_profile(db, connection)
+
+    assert fetched == ["P2"]
+    assert stats["posts_skipped"] == 4
+    assert stats["posts_updated"] == 5
+
+
+def test_instagram_resync_uses_watermarks(db, test_user, monkeypatch):
+    user, _ = test_user
+    connection = _create_instagram_connection(db, user.id)
+    listing = [
+        {"platform_post_id": "NEW", "timestamp": "2026-03-10T10:00:00+00:00", "comment_count": 5},
+        {"platform_post_id": "OLD", "timestamp": "2026-01-01T10:00:00+00:00", "comment_count": 5},
+    ]
+    calls = {"since": [], "limits": {}}
+
+    def fake_posts(username, max_posts, since_date):
+        calls["since"].append(since_date)
+        return listing
+
+    def fake_comments(post_id, max_comments):
+        calls["limits"][post_id] = max_comments
+        return [{"platform_comment_id": f"{post_id}_c{i}", "text": "oi", "username": "u"} for i in range(5)]
+
+    monkeypatch.setattr("app.services.instagram_ingest_service.fetch_recent_posts", fake_posts)
+    monkeypatch.setattr("app.services.instagram_ingest_service.fetch_post_comments", fake_comments)
+
+    ingest_instagram_profile(db, connection, max_comments_per_post=100)
+    assert calls["since"] == [None]
+    assert calls["limits"] == {"NEW": 100, "OLD": 100}
+    assert connection.sync_cursor["newest_post_id"] == "NEW"
+
+    # NEW gained two comments; OLD is past the listing cursor
+    calls["limits"].clear()
+    listing[0] = {**listing[0], "comment_count": 7}
+    stats = ingest_instagram_profile(db, connection, max_comments_per_post=100)
+
+    assert calls["since"][1] == datetime(2026, 3, 8, 10, 0, tzinfo=timezone.utc)
+    assert calls["limits"] == {"NEW": 2 + WATERMARK_MARGIN}
+    assert stats["posts_updated"] == 1
+
+
+def test_failed_comment_fetch_is_retried_next_sync(db, test_user, monkeypatch):
+    user, _ = test_user
+    connection = _create_instagram_connection(db, user.id)
+    listing = [{"platform_post_id": "P", "timestamp": "2026-01-01T10:00:00+00:00", "comment_count": 1}]
+    replies = [[{"platform_comment_id": "P_c0", "text": "oi", "username": "u"}]]
+    fetched = []
+
+    def fake_comments(post_id, max_comments):
+        fetched.append(post_id)
+        return replies[-1]
+
+    monkeypatch.setattr(
+        "app.services.instagram_ingest_service.fetch_recent_posts",
+        lambda username, max_posts, since_date: listing,
+    )
+    monkeypatch.setattr("app.services.instagram_ingest_service.fetch_post_comments", fake_comments)
+    ingest_instagram_profile(db, connection)
+    post = db.query(Post).filter_by(platform_post_id="P").one()
+    fetched_at = post.comments_fetched_at
+
+    # The post gained a comment but the fetch failed (the scraper returns [])
+    listing[0] = {**listing[0], "comment_count": 2}
+    replies.append([])
+    ingest_instagram_profile(db, connection)
+
+    assert post.comment_count == 1
+    assert post.comments_fetched_at == fetched_at
+
+    replies.append([{"platform_comment_id": f"P_c{i}", "text": "oi", "username": "u"} for i in range(2)])
+    ingest_instagram_profile(db, connection)
+
+    assert fetched == ["P", "P", "P"]
+    assert post.comment_count == 2
+    assert db.query(Comment).filter_by(post_id=post.id).count() == 2
+
+
+def test_ingested_comments_hash_their_clean_text(db, test_user, monkeypatch):
+    user, _ = test_user
+    connection = _create_instagram_connection(db, user.id)
+    monkeypatch.setattr(
+        "app.services.instagram_ingest_service.fetch_recent_posts",
+        lambda username, max_posts, since_date: [
+            {"platform_post_id": "P", "timestamp": "2026-01-01T10:00:00+00:00", "comment_count": 1}
+        ],
+    )
+    monkeypatch.setattr(
+        "app.services.instagram_ingest_service.fetch_post_comments",
+        lambda post_id, max_comments: [{"platform_comment_id": "C", "text": "  Adorei!  ", "username": "u"}],
+    )
+    ingest_instagram_profile(db, connection)
+
+    comment = db.query(Comment).filter_by(platform_comment_id="C").one()
+    # Same key every platform (and the analysis fallback) derives from text_clean
+    assert comment.text_hash == comment_text_hash(comment.text_clean)
@@ -0,0 +1,169 @@
+"""Tests for the Gemini sentiment client: wire protocol and response parsing."""
+
+import json
+import time
+import uuid
+
+import httpx
+import pytest
+
+from app.services import llm_client, rate_limiter
+from app.services.llm_client import RESPONSE_SCHEMA, LLMClient
+from app.services.rate_limiter import GeminiRateLimiter
+from app.services.llm_response_parser import ResultArrayParser
+from tests.fake_gemini import FakeGemini
+
+
+def _response(payload: dict | str) -> dict:
+    content = payload if isinstance(payload, str) else json.dumps(payload)
+    return {"choices": [{"message": {"content": content}}]}
+
+
+def test_prompt_uses_short_ids_and_results_map_back(monkeypatch):
+    comments = [
+        {"comment_id": str(uuid.uuid4()), "text_clean": "Amei!\nDe verdade"},
+        {"comment_id": str(uuid.uuid4()), "text_clean": "Caro demais"},
+    ]
+
+    with FakeGemini() as fake:
+        monkeypatch.setattr(llm_client, "GEMINI_BASE_URL", fake.base_url)
+        results = list(LLMClient(api_key="test").analyze_comments(comments))
+
+    body = fake.requests[0]["body"]
+    assert body["generationConfig"]["responseJsonSchema"] == RESPONSE_SCHEMA
+    prompt = body["contents"][0]["parts"][0]["text"]
+    assert "1\tAmei! De verdade\n2\tCaro demais" in prompt
+    assert all(c["comment_id"] not in prompt for c in comments)
+    assert [r["comment_id"] for r in results] == [c["comment_id"] for c in comments]
+    assert results[0]["score_0_10"] == 8
+    assert results[0]["sarcasm"] is False
+
+
+def test_compact_rows_are_validated():
+    client = LLMClient(api_key="test")
+    ids = ["a", "b", "c"]
+    response = _response({"r": [
+        [2, 14, -3, 0.5, ["raiva"], 1, ["preco"], "Reclama do preco", 0.8],
+        [9, 5, 0, 0, [], 0, [], "id fora do batch", 0.9],
+        [1, 5],
+    ]})
+
+    results = {r["comment_id"]: r for r in client._parse_response(response, ids)}
+
+    # Same clamping as the verbose format
+    assert results["b"]["score_0_10"] == 10
+    assert results["b"]["polarity"] == -1.0
+    assert results["b"]["sarcasm"] is True
+    # Truncated row and unknown id leave the comments unanalyzed
+    assert results["a"]["confidence"] == 0.0
+    assert results["c"]["score_0_10"] is None
+
+
+def test_legacy_items_format_is_still_accepted():
+    client = LLMClient(api_key="test")
+    response = _response({"items": [
+        {"comment_id": 1, "score_0_10": 7, "confidence": 0.7},
+        {"comment_id": "uuid-b", "score_0_10": 3, "confidence": 0.6},
+    ]})
+
+    results = {r["comment_id"]: r for r in client._parse_response(response, ["uuid-a", "uuid-b"])}
+
+    assert results["uuid-a"]["score_0_10"] == 7
+    assert results["uuid-b"]["score_0_10"] == 3
+
+
+def test_truncated_response_keeps_complete_rows():
+    client = LLMClient(api_key="test")
+    content = (
+        '```json\n{"r":[[1,8,0.6,0.5,["alegria"],0,[],"Gostou",0.9],'
+        '[2,"x",0,0,[],0,[],"score invalido",0.9],'
+        '[3,2,-0.7,0.8,["raiva"],0,["preco"],"Achou caro",0.8],'
+        '[4,5,0,0.1,["neutro"],0,[],"Pergu'
+    )
+
+    results = {r["comment_id"]: r for r in client._parse_response(_response(content), ["a", "b", "c", "d"])}
+
+    assert results["a"]["score_0_10"] == 8
+    assert results["c"]["score_0_10"] == 2
+    assert results["b"]["confidence"] == 0.0
+    assert results["d"]["summary_pt"] == "Não analisado (resposta truncada)"
+
+
+def test_parser_yields_elements_as_chunks_arrive():
+    parser = ResultArrayParser()
+    text = '{"r":[[1,"a"],{"comment_id":2},[3,"c"]]}'
+
+    seen = [parser.feed(text[i:i + 7]) for i in range(0, len(text), 7)]
+
+    assert [e for chunk in seen for e in chunk] == [[1, "a"], {"comment_id": 2}, [3, "c"]]
+    # Each element is handed out by the chunk that completes it
+    assert seen[1] == [[1, "a"]]
+    assert parser.complete
+
+
+def test_parser_skips_a_malformed_element():
+    parser = ResultArrayParser()
+
+    elements = parser.feed('{"r":[[1,"a"],[2,oops],[3,"c"]]}')
+    elements += parser.close()
+
+    assert elements == [[1, "a"], [3, "c"]]
+    assert parser.skipped == 1
+
+
+def _comments(n: int) -> list[dict]:
+    return [{"comment_id": str(uuid.uuid4()), "text_clean": f"comentario {i}"} for i in range(n)]
+
+
+def test_streaming_yields_results_before_the_response_ends(monkeypatch):
+    comments = _comments(5)
+
+    with FakeGemini(stream_chunk_chars=30, stream_delay=0.05) as fake:
+        monkeypatch.setattr(llm_client, "GEMINI_BASE_URL", fake.base_url)
+        started = time.perf_counter()
+        arrivals = []
+        for result in LLMClient(api_key="test").analyze_comments(comments, stream=True):
+            arrivals.append((time.perf_counter() - started, result))
+        total = time.perf_counter() - started
+
+    assert ":streamGenerateContent" in fake.requests[0]["path"]
+    assert [r["comment_id"] for _, r in arrivals] == [c["comment_id"] for c in comments]
+    assert all(r["score_0_10"] == 8 for _, r in arrivals)
+    assert arrivals[0][0] < total - 0.2
+
+
+def test_stalled_stream_only_loses_unfinished_items(monkeypatch):
+    comments = _comments(6)
+    monkeypatch.setattr(llm_client, "STREAM_STALL_TIMEOUT", 0.3)
+
+    # Each row is ~80 characters: the stream hangs after ~2.5 rows
+    with FakeGemini(stream_chunk_chars=50, stall_after=4) as fake:
+        monkeypatch.setattr(llm_client, "GEMINI_BASE_URL", fake.base_url)
+        results = list(LLMClient(api_key="test").analyze_comments(comments, stream=True))
+
+    analyzed = [r for r in results if r.get("error") is None]
+    missing = [r for r in results if r.get("error") == "missing"]
+    assert len(fake.requests) == 1
+    assert [r["comment_id"] for r in analyzed] == [c["comment_id"] for c in comments[:len(analyzed)]]
+    assert 1 <= len(analyzed) < 6
+    assert len(analyzed) + len(missing) == 6
+    assert missing[0]["summary_pt"] == "Não analisado (stream interrompido)"
+
+
+def test_refused_call_returns_its_token_reservation(monkeypatch):
+    class RefusingGemini(FakeGemini):
+        def status_for(self, prompt):
+            return 400
+
+    monkeypatch.setattr(rate_limiter, "get_redis", lambda: None)
+    payload = {"contents": [{"parts": [{"text": "oi"}]}]}
+
+    with RefusingGemini() as fake:
+        monkeypatch.setattr(llm_client, "GEMINI_BASE_URL", fake.base_url)
+        client = LLMClient(api_key="test")
+        client.limiter = GeminiRateLimiter(rpm=100, tpm=1000)
+        with pytest.raises(httpx.HTTPStatusError):
+            client._post_generate(payload, 800, timeout=5)
+
+    # Nothing was processed, so the 800 reserved tokens are free again
+    client.limiter.acquire(client.model, 800, max_wait=0.01)
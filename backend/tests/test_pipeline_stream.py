@@ -0,0 +1,122 @@
+"""Tests for the pipeline progress SSE stream."""
+
+import json
+import threading
+import time
+import uuid
+
+import fakeredis
+import fakeredis.aioredis
+import pytest
+from redis.asyncio.client import PubSub
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+from app.models.pipeline_run import PipelineRun
+from app.routers import pipeline
+from app.services import progress_service
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    server = fakeredis.FakeServer()
+    sync_client = fakeredis.FakeRedis(server=server, decode_responses=True)
+    monkeypatch.setattr(progress_service, "get_redis", lambda: sync_client)
+    monkeypatch.setattr(
+        progress_service,
+        "get_async_redis",
+        lambda: fakeredis.aioredis.FakeRedis(server=server, decode_responses=True),
+    )
+    return sync_client
+
+
+def _read_events(response) -> list[tuple[str, dict, float]]:
+    events, event = [], None
+    for line in response.iter_lines():
+        if line.startswith("event:"):
+            event = line.split(":", 1)[1].strip()
+        elif line.startswith("data:") and event:
+            events.append((event, json.loads(line.split(":", 1)[1]), time.perf_counter()))
+    return events
+
+
+def test_stream_pushes_published_events(client, auth_headers, db, test_user, test_connection, fake_redis):
+    user, _ = test_user
+    run = PipelineRun(
+        id=uuid.uuid4(), user_id=user.id, connection_id=test_connection.id,
+        run_type="full", status="running",
+    )
+    db.add(run)
+    db.commit()
+
+    published_at = {}
+
+    def worker():
+        # Wait for the SSE endpoint to subscribe
+        channel = progress_service.run_channel(run.id)
+        while not fake_redis.pubsub_numsub(channel)[0][1]:
+            time.sleep(0.01)
+        time.sleep(0.2)
+        run.notes = json.dumps({"step": "analyzing", "current": 1, "total": 2})
+        run.comments_analyzed = 7
+        db.commit()
+        published_at["progress"] = time.perf_counter()
+        progress_service.publish_run_progress(run)
+
+        run.status = "completed"
+        db.commit()
+        progress_service.publish_run_progress(run)
+
+    thread = threading.Thread(target=worker)
+    thread.start()
+    with client.stream("GET", f"/api/v1/pipeline/runs/{run.id}/stream", headers=auth_headers) as response:
+        assert response.status_code == 200
+        events = _read_events(response)
+    thread.join()
+
+    assert [name for name, _, _ in events] == ["progress", "progress", "progress", "complete"]
+    assert events[0][1]["status"] == "running"
+    assert events[1][1]["comments_analyzed"] == 7
+    assert events[1][1]["step"] == "analyzing"
+    assert events[-1][1]["status"] == "completed"
+    # Pushed on publish rather than on the next 2s poll
+    assert events[1][2] - published_at["progress"] < 0.5
+
+
+def test_stream_reports_unknown_run(client, auth_headers, fake_redis):
+    with client.stream("GET", f"/api/v1/pipeline/runs/{uuid.uuid4()}/stream", headers=auth_headers) as response:
+        events = _read_events(response)
+
+    assert [name for name, _, _ in events] == ["error"]
+
+
+def test_stream_falls_back_to_polling_when_redis_drops(
+    client, auth_headers, db, test_user, test_connection, fake_redis, monkeypatch
+):
+    user, _ = test_user
+    run = PipelineRun(
+        id=uuid.uuid4(), user_id=user.id, connection_id=test_connection.id,
+        run_type="full", status="running",
+    )
+    db.add(run)
+    db.commit()
+
+    async def dropped(self, *args, **kwargs):
+        raise RedisConnectionError("Connection closed by server.")
+
+    monkeypatch.setattr(PubSub, "get_message", dropped)
+    monkeypatch.setattr(pipeline, "STREAM_POLL_SECONDS", 0.05)
+
+    def worker():
+        time.sleep(0.2)
+        run.status = "completed"
+        db.commit()
+
+    thread = threading.Thread(target=worker)
+    thread.start()
+    with client.stream("GET", f"/api/v1/pipeline/runs/{run.id}/stream", headers=auth_headers) as response:
+        events = _read_events(response)
+    thread.join()
+
+    assert events[0][0] == "progress"
+    assert events[-1][0] == "complete"
+    assert events[-1][1]["status"] == "completed"
@@ -0,0 +1,190 @@
+"""Tests for the Celery pipeline tasks (run eagerly)."""
+
+import json
+
+import pytest
+
+from app.models.comment import Comment
+from app.models.pipeline_run import PipelineRun
+from app.services import llm_client
+from app.tasks import pipeline_tasks
+from app.tasks.celery_app import celery_app
+from tests.conftest import TestSessionLocal
+from tests.fake_gemini import FakeGemini
+from tests.test_analysis_service import _create_post_with_comments
+
+
+@pytest.fixture
+def eager_celery(monkeypatch):
+    monkeypatch.setattr(celery_app.conf, "task_always_eager", True)
+    monkeypatch.setattr(pipeline_tasks, "SessionLocal", TestSessionLocal)
+    monkeypatch.setattr(pipeline_tasks, "publish_run_progress", lambda run: None)
+
+
+def test_full_pipeline_fans_out_posts_and_finalizes_run(db, test_user, test_connection, eager_celery, monkeypatch):
+    user, _ = test_user
+    posts = [
+        _create_post_with_comments(db, test_connection, 3, prefix=f"fan{i}")
+        for i in range(3)
+    ]
+    monkeypatch.setattr(
+        pipeline_tasks, "task_ingest",
+        lambda *args, **kwargs: {"posts_fetched": 3, "comments_fetched": 9},
+    )
+
+    analyzed_posts = []
+    original_task = pipeline_tasks.task_analyze_post.run
+    monkeypatch.setattr(
+        pipeline_tasks.task_analyze_post, "run",
+        lambda run_id, post_id: analyzed_posts.append(post_id) or original_task(run_id, post_id),
+    )
+
+    with FakeGemini() as fake:
+        monkeypatch.setattr(llm_client, "GEMINI_BASE_URL", fake.base_url)
+        result = pipeline_tasks.task_full_pipeline(str(test_connection.id), str(user.id))
+
+    assert result["posts_queued"] == 3
+    assert sorted(analyzed_posts) == sorted(str(p.id) for p in posts)
+
+    db.expire_all()
+    run = db.query(PipelineRun).filter(PipelineRun.run_type == "full").one()
+    assert run.status == "completed"
+    assert run.comments_analyzed == 9
+    assert run.llm_calls == 3
+    assert json.loads(run.notes) == {"step": "done", "current": 3, "total": 3}
+    assert db.query(Comment).filter(Comment.status == "processed").count() == 9
+
+
+def test_failing_post_does_not_fail_the_run(db, test_user, test_connection, eager_celery, monkeypatch):
+    user, _ = test_user
+    _create_post_with_comments(db, test_connection, 2, prefix="ok")
+    _create_post_with_comments(db, test_connection, 2, prefix="bad")
+    monkeypatch.setattr(
+        pipeline_tasks, "task_ingest",
+        lambda *args, **kwargs: {"posts_fetched": 2, "comments_fetched": 4},
+    )
+
+    def flaky_analyze(db, post_id, **kwargs):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr("app.services.analysis_service.analyze_post_comments", flaky_analyze)
+    pipeline_tasks.task_full_pipeline(str(test_connection.id), str(user.id))
+
+    db.expire_all()
+    run = db.query(PipelineRun).filter(PipelineRun.run_type == "full").one()
+    assert run.status == "partial"
+    assert run.errors_count == 2
+    assert json.loads(run.notes)["current"] == 2
+
+
+def test_posts_are_analyzed_while_ingest_is_still_running(db, test_user, test_connection, eager_celery, monkeypatch):
+    user, _ = test_user
+    events = []
+
+    def streaming_ingest(*args, on_post_ingested=None, **kwargs):
+        for i in range(3):
+            post = _create_post_with_comments(db, test_connection, 2, prefix=f"stream{i}")
+            events.append(("ingested", str(post.id)))
+            on_post_ingested(post.id)
+        return {"posts_fetched": 3, "comments_fetched": 6}
+
+    monkeypatch.setattr(pipeline_tasks, "task_ingest", streaming_ingest)
+    original_task = pipeline_tasks.task_analyze_post.run
+    monkeypatch.setattr(
+        pipeline_tasks.task_analyze_post, "run",
+        lambda run_id, post_id: events.append(("analyzed", post_id)) or original_task(run_id, post_id),
+    )
+
+    with FakeGemini() as fake:
+        monkeypatch.setattr(llm_client, "GEMINI_BASE_URL", fake.base_url)
+        result = pipeline_tasks.task_full_pipeline(str(test_connection.id), str(user.id))
+
+    assert result["posts_queued"] == 3
+    # Each post is handed to analysis before the next one is scraped
+    assert [kind for kind, _ in events] == ["ingested", "analyzed"] * 3
+
+    db.expire_all()
+    run = db.query(PipelineRun).filter(PipelineRun.run_type == "full").one()
+    assert run.status == "completed"
+    assert run.comments_analyzed == 6
+    assert run.posts_fetched == 3
+
+
+def test_failed_ingest_keeps_the_run_failed(db, test_user, test_connection, eager_celery, monkeypatch):
+    user, _ = test_user
+    queued = []
+
+    def failing_ingest(*args, on_post_ingested=None, **kwargs):
+        post = _create_post_with_comments(db, test_connection, 2, prefix="partial")
+        on_post_ingested(post.id)
+        return {"error": "XPoz quota exceeded"}
+
+    monkeypatch.setattr(pipeline_tasks, "task_ingest", failing_ingest)
+    monkeypatch.setattr(
+        pipeline_tasks.task_analyze_post, "delay", lambda *args: queued.append(args)
+    )
+    monkeypatch.setattr(
+        pipeline_tasks.task_finalize_run, "delay", lambda *args: pytest.fail("finalized a failed run")
+    )
+    pipeline_tasks.task_full_pipeline(str(test_connection.id), str(user.id))
+
+    # The post queued before the failure finishes afterwards
+    with FakeGemini() as fake:
+        monkeypatch.setattr(llm_client, "GEMINI_BASE_URL", fake.base_url)
+        for args in queued:
+            pipeline_tasks.task_analyze_post.run(*args)
+
+    db.expire_all()
+    run = db.query(PipelineRun).filter(PipelineRun.run_type == "full").one()
+    assert run.status == "failed"
+    assert run.comments_analyzed == 2
+    progress = json.loads(run.notes)
+    assert progress["step"] == "failed"
+    assert progress["error"] == "XPoz quota exceeded"
+    assert progress["current"] == progress["total"] == 1
+
+
+def test_ignored_author_comments_do_not_requeue_the_post(db, test_user, test_connection, eager_celery, monkeypatch):
+    user, _ = test_user
+    post = _create_post_with_comments(db, test_connection, 2, prefix="own")
+    test_connection.ignore_author_comments = True
+    db.add(Comment(
+        post_id=post.id,
+        connection_id=test_connection.id,
+        platform="youtube",
+        platform_comment_id="own_reply",
+        author_username=test_connection.username,
+        text_original="Obrigado pessoal!",
+        text_clean="Obrigado pessoal!",
+        status="pending",
+    ))
+    db.commit()
+    monkeypatch.setattr(
+        pipeline_tasks, "task_ingest",
+        lambda *args, **kwargs: {"posts_fetched": 0, "comments_fetched": 0},
+    )
+
+    with FakeGemini() as fake:
+        monkeypatch.setattr(llm_client, "GEMINI_BASE_URL", fake.base_url)
+        first = pipeline_tasks.task_full_pipeline(str(test_connection.id), str(user.id))
+        second = pipeline_tasks.task_full_pipeline(str(test_connection.id), str(user.id))
+
+    assert first["posts_queued"] == 1
+    # Only the author's reply is left "pending"
+    assert second["posts_queued"] == 0
+
+
+@pytest.mark.parametrize(
+    ("task", "queue"),
+    [
+        (pipeline_tasks.task_ingest, "ingest"),
+        (pipeline_tasks.task_full_pipeline, "ingest"),
+        (pipeline_tasks.task_analyze, "analysis"),
+        (pipeline_tasks.task_analyze_post, "analysis"),
+        (pipeline_tasks.task_finalize_run, "aggregation"),
+        (pipeline_tasks.task_retry_failed_analyses, "aggregation"),
+    ],
+)
+def test_tasks_are_routed_to_their_queue(task, queue):
+    route = celery_app.amqp.router.route({}, task.name)
+    assert route["queue"].name == queue
@@ -1,5 +1,24 @@
 """Tests for posts and dashboard endpoints."""
 
+from sqlalchemy import event
+
+from app.routers import dashboard
+from app.services import analysis_service
+
+
+def _store_scores(db, comments, score, prompt_version):
+    stats = {"analyzed": 0, "errors": 0}
+    analysis_service.store_analysis_results(
+        db,
+        [
+            {"comment_id": str(c.id), "score_0_10": score, "polarity": 0.0, "confidence": 0.9}
+            for c in comments
+        ],
+        prompt_version,
+        stats,
+    )
+    db.commit()
+
 
 def test_list_posts_empty(client, auth_headers):
     res = client.get("/api/v1/posts/", headers=auth_headers)
@@ -25,6 +44,16 @@ def test_post_detail(client, auth_headers, test_post, test_comments):
     assert data["summary"] is None  # No analysis yet
 
 
+def test_post_detail_uses_latest_analysis(client, auth_headers, db, test_post, test_comments):
+    _store_scores(db, test_comments, 2.0, "v1")
+    _store_scores(db, test_comments[:2], 9.0, "v2")
+
+    res = client.get(f"/api/v1/posts/{test_post.id}", headers=auth_headers)
+    assert res.status_code == 200
+    scores = sorted(a["score_0_10"] for a in res.json()["analysis"])
+    assert scores == [2.0, 2.0, 2.0, 9.0, 9.0]
+
+
 def test_post_detail_not_found(client, auth_headers):
     res = client.get(
         "/api/v1/posts/00000000-0000-0000-0000-000000000000",
@@ -60,3 +89,36 @@ def test_dashboard_summary_with_data(client, auth_headers, test_post, test_comme
 def test_dashboard_require_auth(client):
     res = client.get("/api/v1/dashboard/summary")
     assert res.status_code == 401
+
+
+def test_dashboard_summary_counts_latest_analysis_once(client, auth_headers, db, test_post, test_comments):
+    _store_scores(db, test_comments, 2.0, "v1")
+    _store_scores(db, test_comments, 8.0, "v2")
+
+    res = client.get("/api/v1/dashboard/summary", headers=auth_headers)
+    assert res.status_code == 200
+    data = res.json()
+    assert data["avg_score"] == 8.0
+    assert data["sentiment_distribution"] == {"negative": 0, "neutral": 0, "positive": 5}
+
+
+def test_dashboard_summary_uses_constant_queries(db, test_user, test_post, test_comments):
+    user, _ = test_user
+    user_id = str(user.id)
+    _store_scores(db, test_comments[:3], 8.0, "v1")
+
+    statements = []
+    engine = db.get_bind()
+    listener = lambda *args: statements.append(args[2])
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        data = dashboard._build_dashboard_summary.__wrapped__(user_id, db)
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+
+    # connections, post counts, comment aggregates, recent posts
+    assert len(statements) <= 4
+    assert data["total_comments"] == 5
+    assert data["total_analyzed"] == 3
+    assert data["avg_score"] == 8.0
+    assert data["connections"][0]["total_analyzed"] == 3
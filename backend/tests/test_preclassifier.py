@@ -0,0 +1,86 @@
+"""Tests for the local pre-classifier of trivial comments."""
+
+import pytest
+
+from app.models.analysis import CommentAnalysis, PostAnalysisSummary
+from app.models.comment import Comment
+from app.services import analysis_service, llm_client
+from app.services.preclassifier import LOCAL_MODEL, preclassify
+from tests.fake_gemini import FakeGemini
+from tests.test_analysis_service import _create_post_with_comments
+
+
+@pytest.mark.parametrize(
+    "text, score, emotions",
+    [
+        ("lindooo", 9.0, ["alegria"]),
+        ("Top!!", 9.0, ["alegria"]),
+        ("👏🏽👏🏽 ❤️", 9.0, ["alegria"]),
+        ("@maria lindo", 9.0, ["alegria"]),
+        ("péssimo", 1.0, ["raiva"]),
+        ("😡😡", 0.5, ["raiva"]),
+        ("kkkkkk", 8.0, ["alegria"]),
+        ("Preço?", 5.0, ["neutro"]),
+        ("@maria @joao.silva", 5.0, ["neutro"]),
+        ("", 5.0, ["neutro"]),
+    ],
+)
+def test_trivial_comments_are_scored_locally(text, score, emotions):
+    result = preclassify(text)
+
+    assert result["score_0_10"] == score
+    assert result["emotions"] == emotions
+    assert result["confidence"] > 0
+    assert result["sarcasm"] is False
+
+
+@pytest.mark.parametrize(
+    "text",
+    ["lindo mas caro", "😍😡", "😭", "👨‍👩‍👧", "@maria olha isso", "100", "claro"],
+)
+def test_ambiguous_comments_are_left_for_the_llm(text):
+    assert preclassify(text) is None
+
+
+def test_only_ambiguous_comments_reach_gemini(db, test_connection, monkeypatch):
+    post = _create_post_with_comments(
+        db, test_connection, prefix="pre",
+        texts=["lindo", "👏👏", "@amiga", "", "Chegou quebrado, quero reembolso"],
+    )
+
+    with FakeGemini() as fake:
+        monkeypatch.setattr(llm_client, "GEMINI_BASE_URL", fake.base_url)
+        stats = analysis_service.analyze_post_comments(db, post.id)
+
+    assert stats["local"] == 4
+    assert stats["analyzed"] == 5
+    assert stats["llm_calls"] == 1
+    assert len(fake.requests) == 1
+    assert len(fake.requests[0]["ids"]) == 1
+
+    models = sorted(model for (model,) in db.query(CommentAnalysis.model).all())
+    assert models == sorted([LOCAL_MODEL] * 4 + [analysis_service.settings.GEMINI_MODEL])
+    assert db.query(Comment).filter(Comment.latest_analysis_id.is_(None)).count() == 0
+    summary = db.query(PostAnalysisSummary).filter_by(post_id=post.id).one()
+    assert summary.total_analyzed == 5
+
+
+def test_local_result_replaces_earlier_llm_error(db, test_connection):
+    post = _create_post_with_comments(db, test_connection, prefix="err", texts=["top"])
+    comment = db.query(Comment).filter_by(post_id=post.id).one()
+    stats = {"analyzed": 0, "errors": 0}
+    analysis_service.store_analysis_results(
+        db,
+        [{"comment_id": str(comment.id), "confidence": 0.0, "summary_pt": "Erro na análise"}],
+        "v1",
+        stats,
+    )
+    comment.status = "pending"
+    db.commit()
+
+    analysis_service.analyze_post_comments(db, post.id)
+
+    rows = db.query(CommentAnalysis).filter_by(comment_id=comment.id).all()
+    assert [row.model for row in rows] == [LOCAL_MODEL]
+    assert rows[0].confidence > 0
+    assert comment.status == "processed"
@@ -0,0 +1,109 @@
+"""Tests for the shared Gemini rate limiter."""
+
+import time
+
+import fakeredis
+import pytest
+
+from app.core.config import settings
+from app.routers import pipeline
+from app.services import rate_limiter
+from app.services.rate_limiter import GeminiRateLimiter, RateLimitTimeout
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    client = fakeredis.FakeRedis(decode_responses=True)
+    monkeypatch.setattr(rate_limiter, "get_redis", lambda: client)
+    return client
+
+
+def test_workers_share_the_request_bucket(fake_redis):
+    worker_a = GeminiRateLimiter(rpm=3, tpm=10_000)
+    worker_b = GeminiRateLimiter(rpm=3, tpm=10_000)
+
+    worker_a.acquire("m", 10)
+    worker_a.acquire("m", 10)
+    worker_b.acquire("m", 10)
+    with pytest.raises(RateLimitTimeout):
+        worker_b.acquire("m", 10, max_wait=0.01)
+
+    metrics = worker_a.metrics()
+    assert metrics["backend"] == "redis"
+    assert metrics["process"]["requests"] == 2
+    assert metrics["cluster"]["requests"] == 3
+
+
+def test_token_bucket_is_settled_with_real_usage(fake_redis):
+    limiter = GeminiRateLimiter(rpm=100, tpm=1000)
+    limiter.acquire("m", 800)
+    with pytest.raises(RateLimitTimeout):
+        limiter.acquire("m", 300, max_wait=0.01)
+
+    # The call used far less than reserved
+    limiter.record_usage("m", 800, 400)
+    limiter.acquire("m", 300, max_wait=0.01)
+
+
+def test_rate_limited_response_pauses_every_worker(fake_redis):
+    worker_a = GeminiRateLimiter(rpm=100, tpm=10_000)
+    worker_b = GeminiRateLimiter(rpm=100, tpm=10_000)
+
+    worker_a.report_rate_limited("m", 0.3)
+    started = time.monotonic()
+    worker_b.acquire("m", 10)
+
+    assert time.monotonic() - started >= 0.25
+    metrics = worker_b.metrics()
+    assert metrics["process"]["throttled"] == 1
+    assert metrics["cluster"]["throttled"] == 1
+    assert metrics["cluster"]["rate_limited"] == 1
+    assert metrics["cluster"]["wait_seconds"] >= 0.25
+    # Other models keep their own quota
+    assert worker_b.acquire("other", 10) < 0.05
+
+
+def test_falls_back_to_local_buckets_without_redis(monkeypatch):
+    monkeypatch.setattr(rate_limiter, "get_redis", lambda: None)
+    limiter = GeminiRateLimiter(rpm=2, tpm=10_000)
+
+    limiter.acquire("m", 10)
+    limiter.acquire("m", 10)
+    with pytest.raises(RateLimitTimeout):
+        limiter.acquire("m", 10, max_wait=0.01)
+
+    metrics = limiter.metrics()
+    assert metrics["backend"] == "local"
+    assert metrics["cluster"] is None
+    assert metrics["process"]["local_fallback"] >= 3
+
+
+def test_rate_limit_endpoint_hides_cluster_counters(client, auth_headers, fake_redis, monkeypatch):
+    limiter = GeminiRateLimiter(rpm=100, tpm=10_000)
+    limiter.acquire("m", 10)
+    monkeypatch.setattr(pipeline, "get_gemini_limiter", lambda: limiter)
+
+    res = client.get("/api/v1/pipeline/llm-rate-limit", headers=auth_headers)
+
+    assert res.status_code == 200
+    assert res.json()["process"]["requests"] == 1
+    assert "cluster" not in res.json()
+
+
+def test_failed_report_returns_its_token_reservation(monkeypatch, fake_redis):
+    from app.services import report_service
+    from tests.fake_gemini import FakeGemini
+
+    class FailingGemini(FakeGemini):
+        def status_for(self, prompt):
+            return 500
+
+    limiter = GeminiRateLimiter(rpm=100, tpm=report_service.MAX_OUTPUT_TOKENS + 1000)
+    monkeypatch.setattr(report_service, "get_gemini_limiter", lambda: limiter)
+    with FailingGemini() as fake:
+        monkeypatch.setattr(report_service, "GEMINI_BASE_URL", fake.base_url)
+        report = report_service.generate_health_report({"platforms": []})
+
+    assert report.startswith("**Relatório indisponível")
+    # The failed call consumed nothing: the whole budget is available again
+    limiter.acquire(settings.GEMINI_MODEL, report_service.MAX_OUTPUT_TOKENS + 1000, max_wait=0.01)
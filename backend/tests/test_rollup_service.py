@@ -0,0 +1,125 @@
+"""Tests for the daily trend rollups."""
+
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy.dialects import postgresql
+
+from app.models.comment import Comment
+from app.models.daily_stats import ConnectionDailyStats
+from app.services import analysis_service, rollup_service
+from app.services.comment_ingest_service import bulk_upsert_comments
+
+
+def _add_comments(db, post, connection, published_days_ago: list[int], prefix: str = "r") -> list[Comment]:
+    today = datetime.now(timezone.utc).replace(hour=12, minute=0, second=0, microsecond=0)
+    comments = []
+    for i, days_ago in enumerate(published_days_ago):
+        comment = Comment(
+            id=uuid.uuid4(),
+            post_id=post.id,
+            connection_id=connection.id,
+            platform="youtube",
+            platform_comment_id=f"{prefix}_{i}",
+            like_count=i,
+            published_at=today - timedelta(days=days_ago),
+            text_original=f"comentario {prefix} {i}",
+            text_clean=f"comentario {prefix} {i}",
+            status="pending",
+        )
+        db.add(comment)
+        comments.append(comment)
+    db.commit()
+    return comments
+
+
+def _analyze(db, comments, scores):
+    analysis_service.store_analysis_results(
+        db,
+        [
+            {
+                "comment_id": str(c.id),
+                "score_0_10": score,
+                "emotions": ["alegria"] if score > 6 else ["raiva"],
+                "topics": ["produto"],
+                "confidence": 0.9,
+            }
+            for c, score in zip(comments, scores)
+        ],
+        "v1",
+        {"analyzed": 0, "errors": 0},
+    )
+    db.commit()
+
+
+def test_trends_are_served_from_daily_rollups(client, auth_headers, db, test_post, test_connection):
+    # Two comments on each of three days in the same week window
+    comments = _add_comments(db, test_post, test_connection, [1, 1, 2, 2, 3, 3])
+    _analyze(db, comments[:4], [9, 2, 5, 8])
+    rollup_service.refresh_daily_rollups(db, test_connection.id)
+
+    assert db.query(ConnectionDailyStats).count() == 3
+
+    res = client.get("/api/v1/dashboard/trends?granularity=day&days=7", headers=auth_headers)
+    assert res.status_code == 200
+    points = res.json()["data_points"]
+    assert [p["total_comments"] for p in points] == [2, 2, 2]
+    assert points[-1]["avg_score"] == 5.5
+    assert points[-1]["positive"] == 1 and points[-1]["negative"] == 1
+    assert points[0]["avg_score"] is None
+
+    res = client.get("/api/v1/dashboard/trends-detailed?granularity=month&days=7", headers=auth_headers)
+    assert res.status_code == 200
+    points = res.json()["data_points"]
+    assert sum(p["total_comments"] for p in points) == 6
+    assert sum(p["emotions"].get("alegria", 0) for p in points) == 2
+    assert sum(p["topics"].get("produto", 0) for p in points) == 4
+
+
+def test_refresh_since_only_touches_changed_days(db, test_post, test_connection):
+    old = _add_comments(db, test_post, test_connection, [10, 20], prefix="old")
+    _analyze(db, old, [8, 8])
+    rollup_service.refresh_daily_rollups(db, test_connection.id)
+    untouched = {row.day: row.updated_at for row in db.query(ConnectionDailyStats).all()}
+
+    since = datetime.now(timezone.utc)
+    new = _add_comments(db, test_post, test_connection, [1], prefix="new")
+    _analyze(db, new, [3])
+
+    assert rollup_service.refresh_rollups_since(db, test_connection.id, since) == 1
+
+    rows = {row.day: row for row in db.query(ConnectionDailyStats).all()}
+    assert len(rows) == 3
+    for day, updated_at in untouched.items():
+        assert rows[day].updated_at == updated_at
+    new_day = (datetime.now(timezone.utc) - timedelta(days=1)).date()
+    assert rows[new_day].negative == 1
+    assert rows[new_day].emotions == {"raiva": 1}
+
+
+def test_refetched_comments_refresh_their_likes(db, test_post, test_connection):
+    comments = _add_comments(db, test_post, test_connection, [5, 5], prefix="likes")
+    rollup_service.refresh_daily_rollups(db, test_connection.id)
+    day = (datetime.now(timezone.utc) - timedelta(days=5)).date()
+    assert db.query(ConnectionDailyStats).filter_by(day=day).one().total_likes == 1
+
+    since = datetime.now(timezone.utc)
+    bulk_upsert_comments(
+        db, test_post.id,
+        [{"platform_comment_id": c.platform_comment_id, "like_count": 40} for c in comments],
+        ("like_count",),
+    )
+    test_post.comments_fetched_at = datetime.now(timezone.utc)
+    db.commit()
+
+    assert rollup_service.refresh_rollups_since(db, test_connection.id, since) == 1
+    db.expire_all()
+    assert db.query(ConnectionDailyStats).filter_by(day=day).one().total_likes == 80
+
+
+def test_rollup_upsert_compiles_for_postgres():
+    statement = rollup_service._upsert_statement("postgresql")
+    sql = str(statement.compile(dialect=postgresql.dialect()))
+
+    assert "ON CONFLICT (connection_id, day) DO UPDATE" in sql
+    assert "total_likes = excluded.total_likes" in sql
@@ -160,17 +160,53 @@ stderr_logfile=/var/log/sentimenta-api-error.log
 user=root
 stopwaitsecs=10
 
-[program:sentimenta-celery]
-command=${APP_DIR}/backend/.venv/bin/celery -A app.tasks.celery_app worker --loglevel=info --concurrency=2
+[program:sentimenta-celery-ingest]
+command=${APP_DIR}/backend/.venv/bin/celery -A app.tasks.celery_app worker --loglevel=info -Q ingest --pool=threads --concurrency=16 -n ingest@%%h
 directory=${APP_DIR}/backend
 environment=PATH="${APP_DIR}/backend/.venv/bin"
 autostart=true
 autorestart=true
-stdout_logfile=/var/log/sentimenta-celery.log
-stderr_logfile=/var/log/sentimenta-celery-error.log
+stdout_logfile=/var/log/sentimenta-celery-ingest.log
+stderr_logfile=/var/log/sentimenta-celery-ingest-error.log
 user=root
 stopwaitsecs=30
 
+[program:sentimenta-celery-analysis]
+command=${APP_DIR}/backend/.venv/bin/celery -A app.tasks.celery_app worker --loglevel=info -Q analysis --pool=threads --concurrency=8 -n analysis@%%h
+directory=${APP_DIR}/backend
+environment=PATH="${APP_DIR}/backend/.venv/bin"
+autostart=true
+autorestart=true
+stdout_logfile=/var/log/sentimenta-celery-analysis.log
+stderr_logfile=/var/log/sentimenta-celery-analysis-error.log
+user=root
+stopwaitsecs=30
+
+[program:sentimenta-celery-aggregation]
+command=${APP_DIR}/backend/.venv/bin/celery -A app.tasks.celery_app worker --loglevel=info -Q aggregation --concurrency=2 -n aggregation@%%h
+directory=${APP_DIR}/backend
+environment=PATH="${APP_DIR}/backend/.venv/bin"
+autostart=true
+autorestart=true
+stdout_logfile=/var/log/sentimenta-celery-aggregation.log
+stderr_logfile=/var/log/sentimenta-celery-aggregation-error.log
+user=root
+stopwaitsecs=30
+
+[program:sentimenta-celery-beat]
+command=${APP_DIR}/backend/.venv/bin/celery -A app.tasks.celery_app beat --loglevel=info --schedule=/tmp/sentimenta-celerybeat-schedule
+directory=${APP_DIR}/backend
+environment=PATH="${APP_DIR}/backend/.venv/bin"
+autostart=true
+autorestart=true
+stdout_logfile=/var/log/sentimenta-celery-beat.log
+stderr_logfile=/var/log/sentimenta-celery-beat-error.log
+user=root
+stopwaitsecs=10
+
+[group:sentimenta-celery]
+programs=sentimenta-celery-ingest,sentimenta-celery-analysis,sentimenta-celery-aggregation,sentimenta-celery-beat
+
 [program:sentimenta-web]
 command=/usr/bin/node_modules/.bin/next start --port 3000
 directory=${APP_DIR}/frontend
@@ -185,7 +221,7 @@ EOF
 
 supervisorctl reread
 supervisorctl update
-supervisorctl start sentimenta-api sentimenta-celery sentimenta-web || true
+supervisorctl start sentimenta-api sentimenta-celery:* sentimenta-web || true
 
 # ─── 10. Nginx ────────────────────────────────────────────────
 
@@ -241,7 +277,7 @@ echo "🌐 Buildando frontend web..."
 cd frontend && npm run build && cd ..
 
 echo "🔁 Reiniciando serviços..."
-supervisorctl restart sentimenta-api sentimenta-celery sentimenta-web
+supervisorctl restart sentimenta-api sentimenta-celery:* sentimenta-web
 
 echo "✅ Deploy concluído!"
 DEPLOY
@@ -263,7 +299,7 @@ echo " → Health:     http://${DOMAIN}/health"
 echo ""
 echo " → Logs API:    tail -f /var/log/sentimenta-api.log"
 echo " → Logs Web:    tail -f /var/log/sentimenta-web.log"
-echo " → Logs Celery: tail -f /var/log/sentimenta-celery.log"
+echo " → Logs Celery: tail -f /var/log/sentimenta-celery-*.log"
 echo " → Status:      supervisorctl status"
 echo ""
 echo " Para atualizar: /opt/sentimenta/scripts/deploy.sh"